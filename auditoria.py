@@ -0,0 +1,224 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from flask import g, has_request_context, request
+from sqlalchemy import event, insert, inspect, select
+from sqlalchemy.orm import Session
+
+from banco import engine
+from models import Auditoria, Ingrediente, Produto
+from paginacao import paginar
+
+# Eventos esperando gravação; com a fila cheia quem registra grava na hora
+TAMANHO_FILA = int(os.environ.get('SMARTSELL_AUDITORIA_FILA', 10000))
+# Eventos por INSERT
+TAMANHO_LOTE = int(os.environ.get('SMARTSELL_AUDITORIA_LOTE', 500))
+# Segundos que um evento pode esperar na fila antes de ser gravado
+INTERVALO_GRAVACAO = float(os.environ.get('SMARTSELL_AUDITORIA_INTERVALO', 1))
+# Na saída do processo, quanto tempo esperar a gravação do que restou
+TEMPO_ENCERRAMENTO = 10
+TENTATIVAS_GRAVACAO = 3
+
+# Colunas auditadas em qualquer flush do ORM: modelo -> (entidade, campos)
+CAMPOS_AUDITADOS = {
+    Ingrediente: ('ingrediente', ('quantidade_estoque',)),
+    Produto: ('produto', ('preco',)),
+}
+
+COLUNAS_AUDITORIA = ('id', 'momento', 'usuario_id', 'usuario_email', 'entidade', 'entidade_id', 'campo',
+                     'valor_anterior', 'valor_novo', 'origem')
+
+logger = logging.getLogger('smartsell.auditoria')
+
+# Posto na fila por encerrar(): a thread grava o que resta e termina
+_FIM = object()
+
+
+class RegistroAuditoria:
+    """Grava a trilha de auditoria em lotes, numa thread em segundo plano.
+
+    Os endpoints só põem o evento numa fila em memória, depois do commit da
+    alteração; a thread junta o que chegou em até `intervalo` segundos e grava
+    num único INSERT (executemany) e commit. Se a fila encher, quem registra
+    grava o próprio evento na hora: fica mais lento, mas nada é descartado.
+    O que estiver na fila é gravado na saída do processo (atexit); só um
+    processo morto sem aviso (SIGKILL) perde os eventos dos últimos
+    `intervalo` segundos.
+    """
+
+    def __init__(self, engine=engine, tamanho_fila=TAMANHO_FILA, tamanho_lote=TAMANHO_LOTE,
+                 intervalo=INTERVALO_GRAVACAO):
+        self.engine = engine
+        self.tamanho_fila = tamanho_fila
+        self.tamanho_lote = tamanho_lote
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._fila = None
+        self._thread = None
+        self._pid = None
+
+    def _obter_fila(self):
+        # Como no pool de senhas: a thread criada antes de um fork não
+        # existe no processo filho
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                if self._pid != os.getpid():
+                    atexit.register(self.encerrar)
+                self._fila = queue.Queue(self.tamanho_fila)
+                self._thread = threading.Thread(target=self._executar, args=(self._fila,),
+                                                name='auditoria', daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+            return self._fila
+
+    def registrar(self, entidade, entidade_id, campo, anterior, novo, origem=None):
+        """Enfileira uma alteração; quem alterou vem do usuário da requisição (g.usuario).
+
+        Sem `origem`, vale o nome do endpoint da requisição.
+        """
+        if anterior == novo:
+            return
+        usuario = None
+        if has_request_context():
+            usuario = g.get('usuario')
+            if origem is None and request.endpoint:
+                origem = request.endpoint.rsplit('.', 1)[-1]
+        evento = {
+            "momento": datetime.utcnow(),
+            "usuario_id": usuario.id if usuario else None,
+            "usuario_email": usuario.email if usuario else None,
+            "entidade": entidade,
+            "entidade_id": entidade_id,
+            "campo": campo,
+            "valor_anterior": anterior,
+            "valor_novo": novo,
+            "origem": origem,
+        }
+        try:
+            self._obter_fila().put_nowait(evento)
+        except queue.Full:
+            logger.warning("Fila da auditoria cheia; gravando o evento na própria requisição.")
+            self._gravar([evento])
+
+    def _proximo_lote(self, fila, encerrar):
+        """Junta eventos por até `intervalo` segundos (encerrando, só os que já estão na fila)."""
+        lote = []
+        prazo = time.monotonic() + self.intervalo
+        while len(lote) < self.tamanho_lote:
+            restante = prazo - time.monotonic()
+            try:
+                if encerrar or restante <= 0:
+                    evento = fila.get_nowait()
+                else:
+                    evento = fila.get(timeout=restante)
+            except queue.Empty:
+                break
+            if evento is _FIM:
+                # Daqui em diante só esvazia a fila, sem esperar mais nada
+                fila.task_done()
+                encerrar = True
+            else:
+                lote.append(evento)
+        return lote, encerrar
+
+    def _executar(self, fila):
+        encerrar = False
+        while True:
+            lote, encerrar = self._proximo_lote(fila, encerrar)
+            if lote:
+                self._gravar_com_tentativas(lote)
+                for _ in lote:
+                    fila.task_done()
+            if encerrar and fila.empty():
+                return
+
+    def _gravar_com_tentativas(self, lote):
+        for tentativa in range(1, TENTATIVAS_GRAVACAO + 1):
+            try:
+                self._gravar(lote)
+                return
+            except Exception:
+                if tentativa == TENTATIVAS_GRAVACAO:
+                    logger.exception("Não foi possível gravar %d eventos da auditoria.", len(lote))
+                else:
+                    time.sleep(tentativa * 0.5)
+
+    def _gravar(self, eventos):
+        with self.engine.begin() as conexao:
+            conexao.execute(insert(Auditoria), eventos)
+
+    def encerrar(self, timeout=TEMPO_ENCERRAMENTO):
+        """Grava o que está na fila e para a thread (chamado na saída do processo)."""
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                return
+            thread, fila = self._thread, self._fila
+        try:
+            # O marcador acorda a thread, que está esperando o próximo evento
+            fila.put(_FIM, timeout=timeout)
+        except queue.Full:
+            pass
+        thread.join(timeout)
+        if thread.is_alive():
+            logger.error("A auditoria não terminou de gravar em %s s; %d eventos ficaram pendentes.",
+                         timeout, fila.unfinished_tasks)
+
+
+registro_auditoria = RegistroAuditoria()
+
+
+# Alterações feitas por objetos do ORM (save(), edições) são coletadas no
+# flush e só entram na fila depois do commit; escritas em massa (INSERT com
+# lista, UPDATE executemany) chamam registro_auditoria.registrar por conta
+# própria
+@event.listens_for(Session, 'after_flush')
+def _coletar_alteracoes(session, flush_context):
+    for obj in list(session.new) + list(session.dirty):
+        auditado = CAMPOS_AUDITADOS.get(type(obj))
+        if auditado is None:
+            continue
+        entidade, campos = auditado
+        estado = inspect(obj)
+        for campo in campos:
+            historico = estado.attrs[campo].history
+            if not historico.added:
+                continue
+            anterior = historico.deleted[0] if historico.deleted else None
+            session.info.setdefault('auditoria', []).append(
+                (entidade, obj.id, campo, anterior, historico.added[0])
+            )
+
+
+@event.listens_for(Session, 'after_commit')
+def _enfileirar_apos_commit(session):
+    for alteracao in session.info.pop('auditoria', ()):
+        registro_auditoria.registrar(*alteracao)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_alteracoes(session):
+    session.info.pop('auditoria', None)
+
+
+def consultar_auditoria(db_session, limite, cursor=None, entidade=None, entidade_id=None, usuario_id=None,
+                        campo=None, inicio=None, fim=None):
+    """Uma página da trilha, do evento mais recente ao mais antigo; devolve (eventos, próximo cursor)."""
+    consulta = select(*[getattr(Auditoria, coluna) for coluna in COLUNAS_AUDITORIA])
+    if entidade:
+        consulta = consulta.where(Auditoria.entidade == entidade)
+    if entidade_id is not None:
+        consulta = consulta.where(Auditoria.entidade_id == entidade_id)
+    if usuario_id is not None:
+        consulta = consulta.where(Auditoria.usuario_id == usuario_id)
+    if campo:
+        consulta = consulta.where(Auditoria.campo == campo)
+    if inicio:
+        consulta = consulta.where(Auditoria.momento >= inicio)
+    if fim:
+        consulta = consulta.where(Auditoria.momento < fim)
+    return paginar(db_session, consulta, [Auditoria.id], limite, cursor, decrescente=True)
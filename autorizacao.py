@@ -0,0 +1,149 @@
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from functools import wraps
+
+from flask import current_app, g, jsonify, request
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from sqlalchemy import select
+
+from banco import sessao_leitura
+from models import Usuario
+
+# Os dois nomes aparecem nos cadastros existentes
+PAPEIS_ADMIN = ('admin', 'administrador')
+# Quem muda a etapa dos pedidos na fila da cozinha
+PAPEIS_COZINHA = ('cozinha',) + PAPEIS_ADMIN
+
+CACHE_IDENTIDADES_TTL = float(os.environ.get('SMARTSELL_AUTH_CACHE_TTL', 60))
+CACHE_IDENTIDADES_MAX = int(os.environ.get('SMARTSELL_AUTH_CACHE_MAX', 1024))
+# Validade (s) dos tickets de ?ticket=, que vão na URL e acabam nos logs
+TICKET_TTL = int(os.environ.get('SMARTSELL_TICKET_TTL', 60))
+
+Identidade = namedtuple('Identidade', ['id', 'email', 'papel', 'status'])
+
+
+class CacheIdentidades:
+    """Cache LRU com TTL de email -> Identidade(id, papel, status).
+
+    Evita um SELECT em usuario a cada requisição autenticada. Quando
+    editar_usuario remove uma entrada, um contador em memória compartilhada
+    (criado antes do fork dos workers) é incrementado e os outros processos
+    descartam o cache inteiro na próxima consulta; o TTL continua valendo
+    para alterações feitas fora da API.
+    """
+
+    def __init__(self, ttl=CACHE_IDENTIDADES_TTL, tamanho_maximo=CACHE_IDENTIDADES_MAX):
+        self.ttl = ttl
+        self.tamanho_maximo = tamanho_maximo
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()
+        self._geracao = multiprocessing.Value('q', 0)
+        self._geracao_local = 0
+
+    def obter(self, email, carregar):
+        agora = time.monotonic()
+        with self._lock:
+            geracao = self._geracao.value
+            if geracao != self._geracao_local:
+                self._entradas.clear()
+                self._geracao_local = geracao
+            entrada = self._entradas.get(email)
+            if entrada is not None and entrada[1] > agora:
+                self._entradas.move_to_end(email)
+                return entrada[0]
+
+        identidade = carregar(email)
+        if identidade is None:
+            return None
+
+        with self._lock:
+            # Não guarda o que foi lido antes de uma edição de usuário
+            if self._geracao.value != geracao:
+                return identidade
+            self._entradas[email] = (identidade, agora + self.ttl)
+            self._entradas.move_to_end(email)
+            while len(self._entradas) > self.tamanho_maximo:
+                self._entradas.popitem(last=False)
+        return identidade
+
+    def remover(self, *emails):
+        with self._geracao.get_lock():
+            self._geracao.value += 1
+            geracao = self._geracao.value
+        with self._lock:
+            for email in emails:
+                self._entradas.pop(email, None)
+            # Este processo já tirou as entradas afetadas; só descarta o
+            # resto se outro processo também mudou algo nesse meio tempo
+            if geracao == self._geracao_local + 1:
+                self._geracao_local = geracao
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+
+
+cache_identidades = CacheIdentidades()
+
+
+def carregar_identidade(email):
+    linha = sessao_leitura().execute(
+        select(Usuario.id, Usuario.email, Usuario.papel, Usuario.status).where(Usuario.email == email)
+    ).first()
+    return Identidade(*linha) if linha else None
+
+
+def _assinador_ticket(finalidade):
+    # O salt separa as finalidades: um ticket não vale em outro endpoint, e
+    # não é um JWT, então também não passa em verify_jwt_in_request
+    return URLSafeTimedSerializer(current_app.config['JWT_SECRET_KEY'], salt=f'smartsell-ticket-{finalidade}')
+
+
+def gerar_ticket(finalidade, email):
+    """Ticket assinado e de vida curta (TICKET_TTL) para usar na URL no lugar do JWT."""
+    return _assinador_ticket(finalidade).dumps(email)
+
+
+def ler_ticket(finalidade, ticket, ttl=None):
+    """Email do ticket, ou None se ele for inválido, de outra finalidade ou tiver expirado."""
+    try:
+        return _assinador_ticket(finalidade).loads(ticket, max_age=TICKET_TTL if ttl is None else ttl)
+    except BadSignature:
+        return None
+
+
+def papel_requerido(*papeis, ticket=None):
+    """Exige um JWT válido de usuário ativo e, se informados, um dos papéis.
+
+    A identidade fica em `g.usuario` para o endpoint. Com `ticket`, sem o
+    cabeçalho Authorization aceita também ?ticket= gerado por gerar_ticket
+    para essa finalidade (o EventSource do navegador não envia cabeçalhos,
+    e um JWT na URL ficaria nos logs de acesso).
+    """
+    def decorador(funcao):
+        @wraps(funcao)
+        def verificar(*args, **kwargs):
+            if ticket and 'Authorization' not in request.headers and request.args.get('ticket'):
+                email = ler_ticket(ticket, request.args['ticket'])
+                if email is None:
+                    return jsonify({"msg": "Ticket inválido ou expirado."}), 401
+            else:
+                verify_jwt_in_request()
+                email = get_jwt_identity()
+            identidade = cache_identidades.obter(email, carregar_identidade)
+            if identidade is None or identidade.status is False:
+                return jsonify({"msg": "Usuário inativo ou inexistente."}), 401
+            if papeis and identidade.papel not in papeis:
+                return jsonify({"msg": "Acesso não permitido para o seu papel."}), 403
+            g.usuario = identidade
+            return funcao(*args, **kwargs)
+        return verificar
+    return decorador
+
+
+def eh_admin():
+    return g.usuario.papel in PAPEIS_ADMIN
@@ -0,0 +1,96 @@
+import os
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker, scoped_session
+
+# Configuração do banco por variáveis de ambiente; os padrões servem para o
+# arquivo SQLite local usado em desenvolvimento.
+#
+# SQLite é o único banco suportado: WAL e BEGIN IMMEDIATE (bloquear_escrita),
+# a busca FTS5 do cardápio, a versão do schema em PRAGMA user_version
+# (migracoes.py), o UPSERT dos resumos (resumos._somar) e a ordem dos ids do
+# INSERT em lote (pedidos._inserir_pedidos) dependem dele.
+DATABASE_URL = os.environ.get('SMARTSELL_DATABASE_URL', 'sqlite:///SmartSell.sqlite3')
+POOL_SIZE = int(os.environ.get('SMARTSELL_DB_POOL_SIZE', 10))
+POOL_MAX_OVERFLOW = int(os.environ.get('SMARTSELL_DB_POOL_MAX_OVERFLOW', 10))
+POOL_TIMEOUT = int(os.environ.get('SMARTSELL_DB_POOL_TIMEOUT', 30))
+LEITURA_POOL_SIZE = int(os.environ.get('SMARTSELL_DB_LEITURA_POOL_SIZE', 20))
+BUSY_TIMEOUT_MS = int(os.environ.get('SMARTSELL_DB_BUSY_TIMEOUT_MS', 5000))
+CACHE_SIZE_KB = int(os.environ.get('SMARTSELL_DB_CACHE_SIZE_KB', 64000))
+MMAP_SIZE = int(os.environ.get('SMARTSELL_DB_MMAP_SIZE', 256 * 1024 * 1024))
+
+
+def _configurar_sqlite(engine, somente_leitura=False):
+    @event.listens_for(engine, 'connect')
+    def _pragmas(conexao_dbapi, registro):
+        cursor = conexao_dbapi.cursor()
+        # WAL: leitores não esperam o escritor e vice-versa. O modo fica
+        # gravado no arquivo, então só a conexão de escrita precisa pedir
+        if not somente_leitura:
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+        cursor.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        if somente_leitura:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+
+def criar_engine(url=DATABASE_URL, somente_leitura=False, pool_size=None):
+    """Cria a engine com pool explícito e, no SQLite em arquivo, os PRAGMAs de produção.
+
+    O driver sqlite3 só abre a transação (BEGIN) antes do primeiro
+    INSERT/UPDATE/DELETE, então as leituras que vêm antes não seguram lock e
+    o busy_timeout cobre a espera entre escritores.
+    """
+    if not url.startswith('sqlite'):
+        raise ValueError(f"Banco não suportado: {url.split(':', 1)[0]}. O SmartSell só roda sobre SQLite.")
+
+    # As conexões do pool são usadas por várias threads (uma por vez)
+    opcoes = {'connect_args': {'check_same_thread': False}}
+    sqlite_arquivo = ':memory:' not in url and url.rstrip('/') != 'sqlite:'
+    if sqlite_arquivo:
+        opcoes.update(
+            pool_size=pool_size or (LEITURA_POOL_SIZE if somente_leitura else POOL_SIZE),
+            max_overflow=POOL_MAX_OVERFLOW,
+            pool_timeout=POOL_TIMEOUT,
+        )
+
+    engine = create_engine(url, **opcoes)
+    if sqlite_arquivo:
+        _configurar_sqlite(engine, somente_leitura)
+    return engine
+
+
+engine = criar_engine()
+# Pool separado, só de leitura, para os GET: uma rajada de consultas não
+# ocupa as conexões de que os endpoints de escrita precisam
+engine_leitura = criar_engine(somente_leitura=True)
+
+local_session = sessionmaker(bind=engine)
+leitura_session = sessionmaker(bind=engine_leitura)
+
+# Sessões por requisição: criadas no primeiro uso dentro da requisição e
+# liberadas no teardown do Flask (ver main.py)
+sessao = scoped_session(local_session)
+sessao_leitura = scoped_session(leitura_session)
+
+
+def bloquear_escrita(db_session):
+    """Começa a transação da sessão já com o lock de escrita do SQLite (BEGIN IMMEDIATE).
+
+    Para ler e logo depois alterar as mesmas linhas sem que outro escritor
+    mexa nelas no meio: sem isso o driver só abre a transação no primeiro
+    UPDATE e a leitura anterior fica fora dela. Não faz nada se a transação
+    já está aberta.
+    """
+    conexao = db_session.connection()
+    if not conexao.connection.driver_connection.in_transaction:
+        conexao.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def encerrar_sessoes(exception=None):
+    sessao.remove()
+    sessao_leitura.remove()
@@ -0,0 +1,330 @@
+import argparse
+import gc
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+# Benchmark dos endpoints pelo test client do Flask, sobre uma cópia de um
+# banco gerado por gerar_dados.py. Mede latência (p50/p95/p99), vazão e
+# consultas SQL por requisição.
+#
+# A linha de base versionada (benchmark_base.json) guarda só as consultas
+# por requisição, que não dependem da máquina: qualquer consulta a mais é
+# regressão e o script sai com código 1. Latência muda de uma máquina para
+# outra, então a comparação do p50 é opcional (--latencia) e usa uma medida
+# salva na mesma máquina (benchmark_latencia.json, fora do git). O p95/p99
+# é só informativo: com poucas dezenas de amostras ele é a pior medida e
+# varia demais para reprovar uma mudança.
+#
+#   python benchmark.py                      # roda e compara as consultas com a base
+#   python benchmark.py --salvar-base        # grava a nova base de consultas
+#   python benchmark.py --salvar-latencia    # grava a latência medida nesta máquina
+#   python benchmark.py --latencia           # compara também o p50 com a latência salva
+#   python benchmark.py --escala grande --repeticoes 50
+
+ARQUIVO_BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_base.json')
+ARQUIVO_LATENCIA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_latencia.json')
+TOLERANCIA_LATENCIA = 0.5
+# Folga absoluta: em endpoints de fração de milissegundo o ruído passa dos 50%
+FOLGA_LATENCIA_MS = 1.0
+
+# corpo(i) devolve o JSON ou (texto, content_type); preparar() roda fora da
+# medição e pode devolver cabeçalhos extras; fator multiplica as repetições
+Cenario = namedtuple('Cenario', ['nome', 'metodo', 'caminho', 'corpo', 'preparar', 'fator'],
+                     defaults=(None, None, 1.0))
+
+
+def percentil(valores, p):
+    # Nearest-rank sobre a lista já ordenada
+    indice = max(0, min(len(valores) - 1, int(round(p / 100 * len(valores) + 0.5)) - 1))
+    return valores[indice]
+
+
+def montar_cenarios(escala, aleatorio, etag_cardapio):
+    from catalogo import cache_catalogo
+    from disponibilidade import motor_disponibilidade
+    from gerar_dados import EMAIL_ADMIN, SENHA_PADRAO
+
+    produtos = escala["produtos"]
+    ingredientes = escala["ingredientes"]
+    usuarios = escala["usuarios"]
+
+    def produto():
+        return aleatorio.randint(1, produtos)
+
+    def csv_contagem(i):
+        linhas = ["ingrediente_id,quantidade"]
+        linhas += [f"{aleatorio.randint(1, ingredientes)},1" for _ in range(100)]
+        return "\n".join(linhas) + "\n", 'text/csv'
+
+    def usuarios_lote(i):
+        linhas = [json.dumps({"nome": f"Lote {i}-{j}", "telefone": f"2{i:06d}{j:03d}",
+                              "email": f"lote{i}-{j}@bench.local", "senha": "senha123"}) for j in range(5)]
+        return "\n".join(linhas), 'application/x-ndjson'
+
+    def esfriar():
+        # Como um commit que não mexe no estoque: o cardápio é remontado do
+        # banco, mas o motor de disponibilidade continua carregado
+        motor_disponibilidade.atualizar_estoque({}, cache_catalogo.invalidar())
+
+    # Dia no meio do histórico gerado (os pedidos cobrem o último ano)
+    mes_passado = datetime.utcnow().date() - timedelta(days=30)
+
+    def item_cardapio(nome):
+        return {"nome": nome, "descricao": "Item do benchmark", "preco": 25.0, "categoria": "Pizza",
+                "ingredientes": [{"ingrediente_id": aleatorio.randint(1, ingredientes), "quantidade_necessaria": 0.1}
+                                 for _ in range(4)]}
+
+    return [
+        Cenario('login', 'POST', '/login', lambda i: {"email": EMAIL_ADMIN, "senha": SENHA_PADRAO}),
+        Cenario('cardapio', 'GET', '/cardapio'),
+        Cenario('cardapio_frio', 'GET', '/cardapio', preparar=esfriar, fator=0.2),
+        Cenario('cardapio_304', 'GET', '/cardapio', preparar=lambda: {"If-None-Match": etag_cardapio()}),
+        Cenario('cardapio_gzip', 'GET', '/cardapio', preparar=lambda: {"Accept-Encoding": "gzip"}),
+        Cenario('cardapio_pagina', 'GET', '/cardapio?limit=50&fields=id,nome,preco,disponivel'),
+        Cenario('cardapio_busca', 'GET', '/cardapio/busca?q=produto%201'),
+        Cenario('itens', 'GET', '/itens'),
+        Cenario('itens_pagina', 'GET', '/itens?limit=50&unidade=kg'),
+        Cenario('itens_frio', 'GET', '/itens', preparar=esfriar, fator=0.2),
+        Cenario('relatorio_diario', 'GET', '/relatorios/vendas/diario'),
+        Cenario('relatorio_horario', 'GET', '/relatorios/vendas/horario'),
+        Cenario('relatorio_produtos', 'GET', '/relatorios/vendas/produtos'),
+        Cenario('relatorio_produtos_gzip', 'GET', '/relatorios/vendas/produtos',
+                preparar=lambda: {"Accept-Encoding": "gzip"}),
+        Cenario('exportar_delta', 'GET', f'/exportar/pedidos?desde_id={escala["pedidos"] - 500}'),
+        Cenario('exportar_delta_csv', 'GET', f'/exportar/movimentos?formato=csv&desde_id={escala["pedidos"] - 500}'),
+        Cenario('saldo_caixa', 'GET', '/relatorios/caixa/saldo'),
+        Cenario('saldo_fechamento', 'GET', f'/relatorios/caixa/saldo?dia={mes_passado.isoformat()}'),
+        Cenario('pedido', 'POST', '/pedido', lambda i: {
+            "itens": [{"produto_id": produto(), "quantidade": 1} for _ in range(2)], "metodo_pagamento": "pix"}),
+        Cenario('historico_pedidos', 'GET', f'/pedidos/historico?limit=50&usuario_id={usuarios}'),
+        Cenario('pedido_status', 'PUT', '/pedido/1/status',
+                lambda i: {"status": ('pendente', 'em_preparo', 'pronto', 'entregue')[i % 4]}),
+        Cenario('pedidos_lote', 'POST', '/pedidos/lote', lambda i: [
+            {"usuario_id": aleatorio.randint(1, usuarios), "produto_id": produto(), "quantidade": 1}
+            for _ in range(20)], fator=0.5),
+        Cenario('cadastro_usuario', 'POST', '/cadastro/usuario', lambda i: {
+            "nome": f"Bench {i}", "telefone": f"3{i:09d}", "email": f"bench{i}@bench.local", "senha": "senha123"}),
+        Cenario('cadastro_usuarios_lote', 'POST', '/cadastro/usuarios/lote', usuarios_lote, fator=0.2),
+        Cenario('editar_usuario', 'PUT', f'/editar/usuario/{usuarios}', lambda i: {
+            "nome": f"Editado {i}", "telefone": f"4{i:09d}", "email": f"editado{i}@bench.local", "senha": "senha123"}),
+        Cenario('cadastro_ingrediente', 'POST', '/cadastro/ingrediente', lambda i: {
+            "nome": f"Ingrediente bench {i}", "unidade": "kg", "quantidade_estoque": 100}),
+        Cenario('editar_item', 'PUT', '/editar/item/id/1', lambda i: {"quantidade_estoque": 1_000_000 + i}),
+        Cenario('estoque_contagem', 'POST', '/estoque/contagem?modo=delta', csv_contagem, fator=0.5),
+        Cenario('auditoria', 'GET', '/auditoria?entidade=ingrediente&entidade_id=1&limit=50'),
+        Cenario('cadastro_item_cardapio', 'POST', '/cadastro/item/cardapio',
+                lambda i: item_cardapio(f"Item bench {i}")),
+        Cenario('cadastro_cardapio_lote', 'POST', '/cadastro/cardapio/lote',
+                lambda i: {"itens": [item_cardapio(f"Lote bench {i}-{j}") for j in range(10)]}, fator=0.5),
+    ]
+
+
+class ContadorConsultas:
+    """Conta os comandos SQL enviados ao banco pelas duas engines.
+
+    Só conta os da thread que faz as requisições: as gravações em segundo
+    plano (auditoria) não fazem parte do custo da requisição.
+    """
+
+    def __init__(self, *engines):
+        from sqlalchemy import event
+        self.total = 0
+        self._thread = threading.get_ident()
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', self._contar)
+
+    def _contar(self, *args):
+        if threading.get_ident() == self._thread:
+            self.total += 1
+
+
+def medir(cliente, cenario, repeticoes, aquecimento, cabecalhos, contador, sequencia):
+    latencias = []
+    consultas = 0
+    # Como no timeit: sem coletas do GC no meio das medidas
+    gc.collect()
+    gc.disable()
+    try:
+        for rodada in range(aquecimento + repeticoes):
+            extras = cenario.preparar() if cenario.preparar else None
+            numero = next(sequencia)
+            kwargs = {"headers": dict(cabecalhos, **(extras or {}))}
+            if cenario.corpo:
+                corpo = cenario.corpo(numero)
+                if isinstance(corpo, tuple):
+                    kwargs["data"], kwargs["content_type"] = corpo
+                else:
+                    kwargs["json"] = corpo
+
+            antes = contador.total
+            inicio = time.perf_counter()
+            resposta = cliente.open(cenario.caminho, method=cenario.metodo, **kwargs)
+            decorrido = time.perf_counter() - inicio
+            if resposta.status_code >= 400:
+                raise RuntimeError(f"{cenario.nome}: {resposta.status_code} {resposta.get_data(as_text=True)[:200]}")
+            if rodada >= aquecimento:
+                latencias.append(decorrido)
+                consultas += contador.total - antes
+    finally:
+        gc.enable()
+
+    latencias.sort()
+    return {
+        "p50_ms": round(percentil(latencias, 50) * 1000, 3),
+        "p95_ms": round(percentil(latencias, 95) * 1000, 3),
+        "p99_ms": round(percentil(latencias, 99) * 1000, 3),
+        "req_s": round(len(latencias) / sum(latencias), 1),
+        "consultas": round(consultas / len(latencias), 2),
+    }
+
+
+def executar(escala_nome, escala, banco, trabalho, repeticoes, aquecimento, semente):
+    # O banco de trabalho é uma cópia: os cenários de escrita não alteram o original
+    shutil.copyfile(banco, trabalho)
+    try:
+        from auditoria import registro_auditoria
+        from banco import engine, engine_leitura
+        from catalogo import cache_catalogo
+        from gerar_dados import EMAIL_ADMIN, SENHA_PADRAO
+        from main import app
+        from migracoes import migrar
+
+        # Bancos gerados antes de uma migração nova
+        migrar(engine)
+
+        cliente = app.test_client()
+        token = cliente.post('/login', json={"email": EMAIL_ADMIN, "senha": SENHA_PADRAO}).get_json()["access_token"]
+        cabecalhos = {"Authorization": f"Bearer {token}"}
+        contador = ContadorConsultas(engine, engine_leitura)
+        aleatorio = random.Random(semente)
+        sequencia = iter(range(1, 10 ** 9))
+
+        def etag_cardapio():
+            cliente.get('/cardapio')
+            return cache_catalogo.etag('cardapio')
+
+        resultados = {}
+        for cenario in montar_cenarios(escala, aleatorio, etag_cardapio):
+            vezes = max(10, int(repeticoes * cenario.fator))
+            resultados[cenario.nome] = medir(cliente, cenario, vezes, aquecimento, cabecalhos, contador, sequencia)
+            linha = resultados[cenario.nome]
+            print(f"{cenario.nome:24} p50 {linha['p50_ms']:9.2f}ms  p95 {linha['p95_ms']:9.2f}ms  "
+                  f"p99 {linha['p99_ms']:9.2f}ms  {linha['req_s']:8.1f} req/s  {linha['consultas']:6.2f} consultas/req")
+        # A auditoria pendente vai para a cópia antes de ela ser apagada
+        registro_auditoria.encerrar()
+        engine.dispose()
+        engine_leitura.dispose()
+    finally:
+        shutil.rmtree(os.path.dirname(trabalho), ignore_errors=True)
+
+    return {"escala": escala_nome, "dados": escala, "repeticoes": repeticoes, "cenarios": resultados}
+
+
+def base_consultas(resultado):
+    # Só o que não depende da máquina vai para a base versionada
+    return {"escala": resultado["escala"], "dados": resultado["dados"],
+            "cenarios": {nome: {"consultas": medida["consultas"]}
+                         for nome, medida in resultado["cenarios"].items()}}
+
+
+def comparar_consultas(atual, base):
+    """Devolve a lista de cenários que passaram a fazer mais consultas por requisição."""
+    regressoes = []
+    for nome, medida in atual["cenarios"].items():
+        referencia = base["cenarios"].get(nome)
+        if referencia is not None and medida["consultas"] > referencia["consultas"]:
+            regressoes.append(f"{nome}: {medida['consultas']} consultas/req (base {referencia['consultas']})")
+    return regressoes
+
+
+def comparar_latencia(atual, base, tolerancia, folga_ms=FOLGA_LATENCIA_MS):
+    """Devolve a lista de cenários com p50 acima da tolerância em relação à medida salva."""
+    regressoes = []
+    for nome, medida in atual["cenarios"].items():
+        referencia = base["cenarios"].get(nome)
+        if referencia is None:
+            continue
+        limite = referencia["p50_ms"] * (1 + tolerancia) + folga_ms
+        if medida["p50_ms"] > limite:
+            regressoes.append(f"{nome}: p50 {medida['p50_ms']}ms acima de {limite:.2f}ms "
+                              f"(base {referencia['p50_ms']}ms + {tolerancia:.0%} + {folga_ms}ms)")
+    return regressoes
+
+
+if __name__ == '__main__':
+    # banco.py lê a URL do ambiente na importação, então o banco de trabalho
+    # precisa estar definido antes de importar qualquer módulo do projeto
+    trabalho = os.path.join(tempfile.mkdtemp(prefix='smartsell-bench-'), 'bench.sqlite3')
+    os.environ['SMARTSELL_DATABASE_URL'] = f'sqlite:///{trabalho}'
+    os.environ.setdefault('SMARTSELL_HASH_PROCESSOS', '0')
+    from gerar_dados import ESCALAS, gerar
+
+    parser = argparse.ArgumentParser(description="Benchmark dos endpoints do SmartSell.")
+    parser.add_argument("--escala", choices=ESCALAS, default="pequena")
+    parser.add_argument("--banco", help="banco gerado por gerar_dados.py (padrão: bench_<escala>.sqlite3, criado se faltar)")
+    parser.add_argument("--repeticoes", type=int, default=50)
+    parser.add_argument("--aquecimento", type=int, default=3)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--base", default=ARQUIVO_BASE, help="arquivo JSON da linha de base (consultas/req)")
+    parser.add_argument("--salvar-base", action="store_true", help="grava as consultas/req como nova linha de base")
+    parser.add_argument("--latencia", nargs="?", const=ARQUIVO_LATENCIA, metavar="ARQUIVO",
+                        help="compara também o p50 com a latência salva nesta máquina "
+                             "(padrão: benchmark_latencia.json)")
+    parser.add_argument("--salvar-latencia", nargs="?", const=ARQUIVO_LATENCIA, metavar="ARQUIVO",
+                        help="grava a latência medida para comparações futuras com --latencia")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA_LATENCIA,
+                        help="aumento de p50 aceito com --latencia (0.5 = 50%%)")
+    parser.add_argument("--folga-ms", type=float, default=FOLGA_LATENCIA_MS,
+                        help="aumento absoluto de p50 sempre aceito com --latencia, em milissegundos")
+    args = parser.parse_args()
+
+    escala = ESCALAS[args.escala]
+    banco = args.banco or f"bench_{args.escala}.sqlite3"
+    if not os.path.exists(banco):
+        print(f"Gerando {banco} (escala {args.escala})...")
+        gerar(f"sqlite:///{banco}", semente=args.semente, **escala)
+
+    resultado = executar(args.escala, escala, banco, trabalho, args.repeticoes, args.aquecimento, args.semente)
+
+    def gravar(caminho, dados, descricao):
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            json.dump(dados, arquivo, indent=2, ensure_ascii=False)
+            arquivo.write("\n")
+        print(f"{descricao} gravada em {caminho}.")
+
+    def carregar(caminho, opcao):
+        if not os.path.exists(caminho):
+            print(f"Sem medida salva em {caminho}; rode com {opcao}.")
+            sys.exit(0)
+        with open(caminho, encoding='utf-8') as arquivo:
+            dados = json.load(arquivo)
+        if dados.get("escala") != resultado["escala"]:
+            print(f"{caminho} foi medido na escala {dados.get('escala')} e esta execução usou "
+                  f"{resultado['escala']}; nada a comparar.")
+            sys.exit(2)
+        return dados
+
+    if args.salvar_base or args.salvar_latencia:
+        if args.salvar_base:
+            gravar(args.base, base_consultas(resultado), "Linha de base")
+        if args.salvar_latencia:
+            gravar(args.salvar_latencia, resultado, "Latência")
+        sys.exit(0)
+
+    regressoes = comparar_consultas(resultado, carregar(args.base, "--salvar-base"))
+    if args.latencia:
+        regressoes += comparar_latencia(resultado, carregar(args.latencia, "--salvar-latencia"),
+                                        args.tolerancia, args.folga_ms)
+    for regressao in regressoes:
+        print(f"REGRESSÃO {regressao}")
+    if regressoes:
+        sys.exit(1)
+    print("Nenhuma regressão em relação à linha de base.")
@@ -0,0 +1,110 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update, delete, insert, func, case
+
+from models import Movimento, SaldoCaixa
+
+# Saldo do caixa sem somar a tabela de movimentos inteira: saldo_caixa guarda,
+# para o início (00:00 UTC) de cada dia com movimento, o saldo acumulado de
+# tudo o que entrou e saiu antes dele. O saldo em qualquer momento é o último
+# checkpoint anterior (uma busca pela chave primária) mais os movimentos desde
+# então, que nunca passam de um dia (índice em movimento.data).
+
+
+def _inicio_do_dia(momento):
+    return datetime.combine(momento.date(), datetime.min.time())
+
+
+def _valor(movimento):
+    if movimento.get("entrada"):
+        return movimento["valor_total"]
+    if movimento.get("saida"):
+        return -movimento["valor_total"]
+    return 0.0
+
+
+# Mesma regra de _valor, em SQL
+VALOR_MOVIMENTO = case(
+    (Movimento.entrada == True, Movimento.valor_total),
+    (Movimento.saida == True, -Movimento.valor_total),
+    else_=0.0
+)
+
+
+def saldo_em(db_session, momento=None, incluir_momento=True):
+    """Saldo do caixa em `momento` (padrão: agora), contando os movimentos com data até ele."""
+    momento = momento or datetime.utcnow()
+    checkpoint = db_session.execute(
+        select(SaldoCaixa.momento, SaldoCaixa.saldo)
+        .where(SaldoCaixa.momento <= momento)
+        .order_by(SaldoCaixa.momento.desc())
+        .limit(1)
+    ).first()
+
+    limite = Movimento.data <= momento if incluir_momento else Movimento.data < momento
+    cauda = select(func.sum(VALOR_MOVIMENTO)).where(limite)
+    saldo = 0.0
+    if checkpoint:
+        cauda = cauda.where(Movimento.data >= checkpoint.momento)
+        saldo = checkpoint.saldo
+    return round(saldo + (db_session.execute(cauda).scalar() or 0.0), 2)
+
+
+def saldo_fechamento(db_session, dia):
+    """Saldo no fim do dia `dia` (UTC): o checkpoint do dia seguinte, sem cauda quando ele existe."""
+    return saldo_em(db_session, datetime.combine(dia + timedelta(days=1), datetime.min.time()),
+                    incluir_momento=False)
+
+
+def registrar_movimentos(db_session, movimentos):
+    """Atualiza os checkpoints para movimentos que vão ser gravados nesta transação.
+
+    Chame antes de inserir os movimentos (dicts com data, valor_total,
+    entrada e saida). Cria o checkpoint dos dias que ainda não têm um e soma
+    o valor de cada dia nos checkpoints posteriores a ele. Num pedido do dia
+    isso é uma única consulta; só vendas sincronizadas com data antiga mexem
+    em checkpoints já gravados.
+    """
+    por_dia = {}
+    for movimento in movimentos:
+        dia = _inicio_do_dia(movimento["data"])
+        por_dia[dia] = por_dia.get(dia, 0.0) + _valor(movimento)
+    if not por_dia:
+        return
+
+    # Uma consulta responde as duas perguntas: quais dias já têm checkpoint
+    # e se existe algum depois de cada dia (num pedido de hoje, nenhum)
+    existentes = set(db_session.execute(
+        select(SaldoCaixa.momento).where(SaldoCaixa.momento >= min(por_dia))
+    ).scalars())
+    # Em ordem: o checkpoint de um dia novo parte do anterior, que pode ser
+    # um recém-criado aqui mesmo
+    for dia in sorted(set(por_dia) - existentes):
+        db_session.execute(insert(SaldoCaixa).values(
+            momento=dia, saldo=saldo_em(db_session, dia, incluir_momento=False)))
+        existentes.add(dia)
+
+    for dia, valor in por_dia.items():
+        if valor and any(momento > dia for momento in existentes):
+            db_session.execute(
+                update(SaldoCaixa)
+                .where(SaldoCaixa.momento > dia)
+                .values(saldo=SaldoCaixa.saldo + valor)
+            )
+
+
+def recalcular_checkpoints(conexao):
+    """Refaz todos os checkpoints a partir dos movimentos (migração ou correção), sem commit."""
+    # Mesmo formato em que o SQLAlchemy grava DateTime no SQLite
+    dia = func.strftime('%Y-%m-%d 00:00:00.000000', Movimento.data)
+    por_dia = (
+        select(dia.label("momento"), func.sum(VALOR_MOVIMENTO).label("total"))
+        .where(Movimento.data.isnot(None))
+        .group_by(dia)
+        .subquery()
+    )
+    # Saldo no início de cada dia = soma dos dias anteriores
+    anteriores = func.coalesce(func.sum(por_dia.c.total).over(order_by=por_dia.c.momento, rows=(None, -1)), 0.0)
+    conexao.execute(delete(SaldoCaixa))
+    conexao.execute(insert(SaldoCaixa).from_select(["momento", "saldo"], select(por_dia.c.momento, anteriores)))
+    return conexao.execute(select(func.count()).select_from(SaldoCaixa)).scalar()
@@ -0,0 +1,163 @@
+import re
+
+from sqlalchemy import select, insert, text
+
+from models import Produto, Ingrediente, ProdutoIngrediente
+from auditoria import registro_auditoria
+
+LIMITE_BUSCA_PADRAO = 20
+# Peso de cada coluna do índice no bm25: nome, descricao, categoria
+PESOS_BUSCA = (10.0, 1.0, 4.0)
+
+BUSCA = text(f"""
+    SELECT produto.id, produto.nome, produto.descricao, produto.preco, produto.categoria, produto.status
+    FROM produto_busca
+    JOIN produto ON produto.id = produto_busca.rowid
+    WHERE produto_busca MATCH :consulta AND produto.status = 1
+    ORDER BY bm25(produto_busca, {', '.join(map(str, PESOS_BUSCA))})
+    LIMIT :limite
+""")
+
+
+class ErroCardapio(ValueError):
+    def __init__(self, erros):
+        super().__init__(erros[0]["msg"])
+        self.erros = erros
+
+
+def validar_produto(data):
+    """Valida um item do cardápio vindo do JSON e devolve (produto, receita).
+
+    `receita` é uma lista de (ingrediente_id, quantidade_necessaria). Aceita
+    "ingrediente_id" em cada ingrediente e, por compatibilidade com os
+    clientes antigos, "produto_id" com o mesmo significado.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Cada item do cardápio deve ser um objeto JSON.")
+
+    nome = data.get("nome", "").strip() if data.get("nome") else ""
+    descricao = data.get("descricao", "").strip() if data.get("descricao") else ""
+    preco = data.get("preco")
+    categoria = data.get("categoria", "").strip() if data.get("categoria") else ""
+    ingredientes = data.get("ingredientes")
+
+    if not nome or preco is None or not categoria or not ingredientes:
+        raise ValueError("Todos os campos são obrigatórios.")
+
+    try:
+        preco = float(preco)
+    except (TypeError, ValueError):
+        raise ValueError("Preço inválido.")
+    if preco < 0:
+        raise ValueError("Preço inválido.")
+
+    if not isinstance(ingredientes, list):
+        raise ValueError("O campo 'ingredientes' deve ser uma lista de ingredientes.")
+
+    receita = []
+    for ingrediente in ingredientes:
+        if not isinstance(ingrediente, dict):
+            raise ValueError("Cada ingrediente deve ser um objeto com ingrediente_id e quantidade_necessaria.")
+
+        ingrediente_id = ingrediente.get("ingrediente_id", ingrediente.get("produto_id"))
+        quantidade = ingrediente.get("quantidade_necessaria")
+        if not ingrediente_id or quantidade is None:
+            raise ValueError("Cada ingrediente precisa de ingrediente_id e quantidade_necessaria.")
+        try:
+            receita.append((int(ingrediente_id), float(quantidade)))
+        except (TypeError, ValueError):
+            raise ValueError("ingrediente_id ou quantidade_necessaria inválidos.")
+
+    produto = {
+        "nome": nome,
+        "descricao": descricao,
+        "preco": preco,
+        "categoria": categoria,
+        "status": True
+    }
+    return produto, receita
+
+
+def cadastrar_produtos(db_session, itens):
+    """Cadastra vários itens do cardápio com as receitas numa única transação.
+
+    `itens` é uma lista de (produto, receita) já validados por
+    validar_produto. Nomes e ingredientes de todos os itens são conferidos
+    com uma consulta IN cada; se algum item tiver problema nada é gravado e
+    ErroCardapio é lançada com a lista de erros por índice.
+    """
+    erros = []
+    nomes = [produto["nome"] for produto, _ in itens]
+    ids_ingredientes = {ingrediente_id for _, receita in itens for ingrediente_id, _ in receita}
+
+    nomes_existentes = set(db_session.execute(
+        select(Produto.nome).where(Produto.nome.in_(nomes))
+    ).scalars())
+    ingredientes_existentes = set(db_session.execute(
+        select(Ingrediente.id).where(Ingrediente.id.in_(ids_ingredientes))
+    ).scalars()) if ids_ingredientes else set()
+
+    vistos = set()
+    for indice, (produto, receita) in enumerate(itens):
+        if produto["nome"] in nomes_existentes or produto["nome"] in vistos:
+            erros.append({"indice": indice, "msg": "Já existe um item com esse nome no cardápio."})
+        vistos.add(produto["nome"])
+        for ingrediente_id, _ in receita:
+            if ingrediente_id not in ingredientes_existentes:
+                erros.append({"indice": indice, "msg": f"Ingrediente com id {ingrediente_id} não encontrado."})
+                break
+
+    if erros:
+        raise ErroCardapio(erros)
+
+    try:
+        # Um único INSERT multi-linha; o RETURNING não garante a ordem das
+        # linhas, então os ids voltam para cada item pelo nome, que já foi
+        # conferido como único acima
+        ids_por_nome = dict(db_session.execute(
+            insert(Produto).returning(Produto.nome, Produto.id),
+            [produto for produto, _ in itens]
+        ).all())
+        ids = [ids_por_nome[produto["nome"]] for produto, _ in itens]
+        relacoes = [{
+            "produto_id": produto_id,
+            "ingrediente_id": ingrediente_id,
+            "quantidade_necessaria": quantidade
+        } for produto_id, (_, receita) in zip(ids, itens) for ingrediente_id, quantidade in receita]
+        db_session.execute(insert(ProdutoIngrediente), relacoes)
+        db_session.commit()
+    except Exception:
+        db_session.rollback()
+        raise
+
+    # O INSERT em lista não passa pelo flush, onde a auditoria acompanha o preço
+    for produto_id, (produto, _) in zip(ids, itens):
+        registro_auditoria.registrar('produto', produto_id, 'preco', None, produto["preco"])
+
+    return [dict(produto, id=produto_id) for produto_id, (produto, _) in zip(ids, itens)]
+
+
+def consulta_fts(termo):
+    """Converte o que o usuário digitou numa consulta FTS5: todas as palavras, cada uma como prefixo.
+
+    As palavras vão entre aspas, então operadores e caracteres especiais do
+    FTS5 digitados pelo usuário não causam erro de sintaxe.
+    """
+    palavras = re.findall(r"\w+", termo or "")
+    return " ".join(f'"{palavra}"*' for palavra in palavras)
+
+
+def buscar_produtos(db_session, termo, limite=LIMITE_BUSCA_PADRAO):
+    """Itens ativos do cardápio que casam com `termo`, do mais relevante ao menos."""
+    consulta = consulta_fts(termo)
+    if not consulta:
+        raise ValueError("Informe o que buscar em 'q'.")
+    linhas = db_session.execute(BUSCA, {"consulta": consulta, "limite": limite})
+    return [{
+        "id": linha.id,
+        "nome": linha.nome,
+        "descricao": linha.descricao,
+        "preco": linha.preco,
+        "categoria": linha.categoria,
+        "status": bool(linha.status)
+    } for linha in linhas]
@@ -0,0 +1,325 @@
+import json
+import multiprocessing
+import os
+import threading
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session, selectinload
+
+from models import Produto, ProdutoIngrediente, Ingrediente
+import compressao
+import disponibilidade
+from disponibilidade import motor_disponibilidade
+from paginacao import paginar
+
+# Tabelas que compõem o cardápio: qualquer escrita nelas invalida o cache
+MODELOS_CATALOGO = (Produto, ProdutoIngrediente, Ingrediente)
+# Colunas do ingrediente que só mudam a disponibilidade, não a parte fixa do
+# cardápio (produtos, receitas, nomes)
+COLUNAS_ESTOQUE = ('quantidade_estoque', 'status')
+# Últimas versões guardadas com os ingredientes que cada uma alterou, para os
+# outros processos acompanharem sem recarregar tudo (ver MotorDisponibilidade)
+HISTORICO_VERSOES = int(os.environ.get('SMARTSELL_CATALOGO_HISTORICO', 256))
+INGREDIENTES_POR_VERSAO = 128
+# Por versão: [versão, quantos ingredientes (-1: recarregar tudo), ids...]
+_TAMANHO_REGISTRO = 2 + INGREDIENTES_POR_VERSAO
+
+
+# Identifica esta instância do servidor: a versão recomeça do zero a cada
+# inicialização e a ETag não pode repetir uma emitida antes do restart. Com o
+# app pré-carregado no gunicorn, os workers herdam o mesmo valor do master
+_INSTANCIA = os.urandom(4).hex()
+
+
+class CacheCatalogo:
+    """Guarda em memória os JSON já serializados do catálogo (/cardapio, /itens).
+
+    Cada escrita em Produto, ProdutoIngrediente ou Ingrediente incrementa a
+    versão do catálogo; entradas de versões anteriores deixam de valer. A
+    versão fica em memória compartilhada: criada antes do fork dos workers,
+    uma escrita em qualquer processo invalida o cache de todos.
+
+    A parte fixa do cardápio (ver `estatico`) tem versão própria, que só
+    muda quando algo além do estoque é gravado: um pedido que baixa estoque
+    não faz o cardápio voltar ao banco, só remonta as porções disponíveis.
+
+    Cada versão nova também registra, num histórico circular em memória
+    compartilhada, os ingredientes que ela alterou (`ingredientes_alterados`).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versao = multiprocessing.Value('q', 0)
+        self._versao_estatica = multiprocessing.Value('q', 0, lock=False)
+        self._historico = multiprocessing.RawArray('q', HISTORICO_VERSOES * _TAMANHO_REGISTRO)
+        self._entradas = {}
+        self._estaticos = {}
+
+    @property
+    def versao(self):
+        return self._versao.value
+
+    @property
+    def versao_estatica(self):
+        return self._versao_estatica.value
+
+    def invalidar(self, apenas_estoque=False, ingredientes=()):
+        """Incrementa a versão e devolve a nova; com `apenas_estoque` a parte fixa continua valendo.
+
+        `ingredientes` são os ids cujo estoque a alteração gravou; None
+        quando a disponibilidade tem de ser recarregada inteira.
+        """
+        with self._versao.get_lock():
+            self._versao.value += 1
+            if not apenas_estoque:
+                self._versao_estatica.value += 1
+            versao = self._versao.value
+            # Registrado junto com o incremento: quem vê a versão nova acha o registro dela
+            inicio = (versao % HISTORICO_VERSOES) * _TAMANHO_REGISTRO
+            self._historico[inicio] = versao
+            if ingredientes is None or len(ingredientes) > INGREDIENTES_POR_VERSAO:
+                self._historico[inicio + 1] = -1
+            else:
+                self._historico[inicio + 1] = len(ingredientes)
+                self._historico[inicio + 2:inicio + 2 + len(ingredientes)] = list(ingredientes)
+        with self._lock:
+            self._entradas.clear()
+        return versao
+
+    def ingredientes_alterados(self, desde, ate):
+        """Ids de ingrediente gravados nas versões depois de `desde` até `ate`.
+
+        None se alguma dessas versões já saiu do histórico ou pediu recarga completa.
+        """
+        if ate - desde > HISTORICO_VERSOES:
+            return None
+        alterados = set()
+        with self._versao.get_lock():
+            for versao in range(desde + 1, ate + 1):
+                inicio = (versao % HISTORICO_VERSOES) * _TAMANHO_REGISTRO
+                quantidade = self._historico[inicio + 1]
+                if self._historico[inicio] != versao or quantidade < 0:
+                    return None
+                alterados.update(self._historico[inicio + 2:inicio + 2 + quantidade])
+        return alterados
+
+    def etag(self, nome, versao=None):
+        if versao is None:
+            versao = self.versao
+        return f"{nome}-{_INSTANCIA}-{versao}"
+
+    def estatico(self, nome, montar):
+        """Parte do recurso que não depende do estoque, montada só se algo além do estoque mudou."""
+        versao = self.versao_estatica
+        entrada = self._estaticos.get(nome)
+        if entrada is not None and entrada[0] == versao:
+            return entrada[1]
+
+        dados = montar()
+        with self._lock:
+            if self.versao_estatica == versao:
+                self._estaticos[nome] = (versao, dados)
+        return dados
+
+    def obter(self, nome, montar):
+        """Retorna (etag, status, corpo) do recurso, montando-o só se a versão mudou.
+
+        `montar` devolve (status, payload); o payload pode vir já serializado (bytes).
+        """
+        versao = self.versao
+        entrada = self._entradas.get(nome)
+        if entrada is not None and entrada[0] == versao:
+            return self.etag(nome, versao), entrada[1], entrada[2]
+
+        status, payload = montar()
+        corpo = payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+
+        # Só guarda se ninguém alterou o catálogo durante a montagem
+        with self._lock:
+            if self.versao == versao:
+                self._entradas[nome] = (versao, status, corpo, {})
+        return self.etag(nome, versao), status, corpo
+
+    def comprimido(self, nome, etag, corpo, codificacao):
+        """Versão comprimida de `corpo`, calculada uma vez por versão do catálogo e codificação."""
+        entrada = self._entradas.get(nome)
+        if entrada is None or self.etag(nome, entrada[0]) != etag:
+            return compressao.comprimir(corpo, codificacao)
+        comprimidos = entrada[3]
+        if codificacao not in comprimidos:
+            # Duas threads podem comprimir ao mesmo tempo; o resultado é o mesmo
+            comprimidos[codificacao] = compressao.comprimir(corpo, codificacao)
+        return comprimidos[codificacao]
+
+
+def montar_partes_cardapio(db_session):
+    """Cada produto ativo já serializado, em volta do lugar das porções: [(id, início, fim)]."""
+    # 1 consulta para os produtos + 1 para as receitas + 1 para os ingredientes
+    produtos_ativos = db_session.query(Produto).options(
+        selectinload(Produto.ingredientes_necessarios).selectinload(ProdutoIngrediente.ingrediente)
+    ).filter(Produto.status == True).all()
+
+    partes = []
+    for produto in produtos_ativos:
+        ingredientes = [{
+            "ingrediente_id": pi.ingrediente.id,
+            "nome": pi.ingrediente.nome,
+            "quantidade_necessaria": pi.quantidade_necessaria,
+            "unidade": pi.ingrediente.unidade
+        } for pi in produto.ingredientes_necessarios]
+        # Mesmo texto que json.dumps geraria para o item completo
+        partes.append((produto.id, json.dumps(produto.serialize())[:-1],
+                       f', "ingredientes": {json.dumps(ingredientes)}}}'))
+    return partes
+
+
+def montar_cardapio(db_session):
+    # Produtos e receitas só voltam ao banco quando mudam; as porções que dá
+    # para fazer agora vêm do motor de disponibilidade, em memória
+    partes = cache_catalogo.estatico('cardapio', lambda: montar_partes_cardapio(db_session))
+    porcoes = porcoes_disponiveis(db_session)
+
+    itens = []
+    for produto_id, inicio, fim in partes:
+        disponiveis = porcoes.get(produto_id)
+        itens.append(f'{inicio}, "porcoes_disponiveis": {json.dumps(disponiveis)}, '
+                     f'"disponivel": {json.dumps(disponiveis != 0)}{fim}')
+    return 200, f'{{"cardapio": [{", ".join(itens)}]}}'.encode('utf-8')
+
+
+def montar_itens(db_session):
+    ingredientes = db_session.execute(select(Ingrediente)).scalars().all()
+
+    if not ingredientes:
+        return 404, {"msg": "Nenhum ingredientes encontrado."}
+
+    return 200, {"produtos": [ingrediente.serialize() for ingrediente in ingredientes]}
+
+
+# Campos aceitos em ?fields= nas listagens paginadas; o padrão é o mesmo
+# formato da listagem completa
+CAMPOS_ITENS = ('id', 'nome', 'unidade', 'quantidade_estoque', 'status')
+CAMPOS_ITENS_PADRAO = ('id', 'nome', 'unidade', 'quantidade_estoque')
+COLUNAS_CARDAPIO = ('id', 'nome', 'descricao', 'preco', 'categoria', 'status')
+CAMPOS_CARDAPIO = COLUNAS_CARDAPIO + ('porcoes_disponiveis', 'disponivel', 'ingredientes')
+
+
+def pagina_itens(db_session, limite, cursor, campos, status=None, unidade=None):
+    """Uma página de ingredientes, só com as colunas de `campos`; devolve (itens, próximo cursor)."""
+    consulta = select(*[getattr(Ingrediente, campo) for campo in campos])
+    if status is not None:
+        consulta = consulta.where(Ingrediente.status == status)
+    if unidade:
+        consulta = consulta.where(Ingrediente.unidade == unidade)
+    return paginar(db_session, consulta, [Ingrediente.id], limite, cursor)
+
+
+def pagina_cardapio(db_session, limite, cursor, campos, categoria=None, status=True):
+    """Uma página do cardápio; receitas e porções só são buscadas se pedidas em `campos`."""
+    colunas = [campo for campo in COLUNAS_CARDAPIO if campo in campos or campo == 'id']
+    consulta = select(*[getattr(Produto, coluna) for coluna in colunas]).where(Produto.status == status)
+    if categoria:
+        consulta = consulta.where(Produto.categoria == categoria)
+    produtos, proximo = paginar(db_session, consulta, [Produto.id], limite, cursor)
+
+    receitas = {}
+    if 'ingredientes' in campos and produtos:
+        # Uma consulta para as receitas da página inteira
+        for linha in db_session.execute(
+                select(ProdutoIngrediente.produto_id, Ingrediente.id, Ingrediente.nome,
+                       ProdutoIngrediente.quantidade_necessaria, Ingrediente.unidade)
+                .join(Ingrediente, Ingrediente.id == ProdutoIngrediente.ingrediente_id)
+                .where(ProdutoIngrediente.produto_id.in_([produto['id'] for produto in produtos]))):
+            receitas.setdefault(linha.produto_id, []).append({
+                "ingrediente_id": linha.id,
+                "nome": linha.nome,
+                "quantidade_necessaria": linha.quantidade_necessaria,
+                "unidade": linha.unidade
+            })
+
+    porcoes = {}
+    if 'porcoes_disponiveis' in campos or 'disponivel' in campos:
+        porcoes = porcoes_disponiveis(db_session)
+
+    itens = []
+    for produto in produtos:
+        item = {campo: produto[campo] for campo in campos if campo in produto}
+        if 'porcoes_disponiveis' in campos:
+            item['porcoes_disponiveis'] = porcoes.get(produto['id'])
+        if 'disponivel' in campos:
+            item['disponivel'] = porcoes.get(produto['id']) != 0
+        if 'ingredientes' in campos:
+            item['ingredientes'] = receitas.get(produto['id'], [])
+        itens.append(item)
+    return itens, proximo
+
+
+cache_catalogo = CacheCatalogo()
+
+
+def porcoes_disponiveis(db_session):
+    """{produto_id: porções} na versão atual do catálogo, pelo motor de disponibilidade."""
+    return motor_disponibilidade.porcoes(db_session, cache_catalogo.versao, cache_catalogo.ingredientes_alterados)
+
+
+def _altera_catalogo(objetos):
+    return any(isinstance(obj, MODELOS_CATALOGO) for obj in objetos)
+
+
+def _altera_so_estoque(obj):
+    # Ingrediente editado só no estoque ou no status
+    return isinstance(obj, Ingrediente) and not any(
+        atributo.history.has_changes() for atributo in inspect(obj).attrs
+        if atributo.key not in COLUNAS_ESTOQUE)
+
+
+# Marca a sessão quando um flush grava algo do catálogo (save()/delete() ou
+# qualquer outro caminho que passe pelo ORM)
+@event.listens_for(Session, 'after_flush')
+def _marcar_alteracao(session, flush_context):
+    if (_altera_catalogo(session.new) or _altera_catalogo(session.dirty)
+            or _altera_catalogo(session.deleted)):
+        session.info['catalogo_alterado'] = True
+        if (_altera_catalogo(session.new) or _altera_catalogo(session.deleted)
+                or not all(_altera_so_estoque(obj) for obj in session.dirty if isinstance(obj, MODELOS_CATALOGO))):
+            session.info['cardapio_alterado'] = True
+        disponibilidade.coletar_alteracoes(session)
+
+
+# UPDATE/DELETE em massa não passam pelo flush
+@event.listens_for(Session, 'do_orm_execute')
+def _marcar_alteracao_em_massa(orm_execute_state):
+    if orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and issubclass(mapper.class_, MODELOS_CATALOGO):
+            orm_execute_state.session.info['catalogo_alterado'] = True
+            # Sem o estoque novo anotado pelo chamador, o motor recarrega tudo
+            # e o cardápio volta inteiro ao banco
+            if not orm_execute_state.execution_options.get('estoque_registrado'):
+                orm_execute_state.session.info['estoque_desconhecido'] = True
+                orm_execute_state.session.info['cardapio_alterado'] = True
+
+
+def marcar_catalogo_alterado(session, apenas_estoque=False):
+    # Para escritas feitas direto na Table (Core), que nenhum evento do ORM enxerga
+    session.info['catalogo_alterado'] = True
+    if not apenas_estoque:
+        session.info['cardapio_alterado'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidar_apos_commit(session):
+    if session.info.pop('catalogo_alterado', False):
+        apenas_estoque = not session.info.pop('cardapio_alterado', False)
+        estoque = disponibilidade.retirar_alteracoes(session)
+        # Os ingredientes vão para o histórico da versão: o motor de
+        # disponibilidade dos outros processos relê só esses
+        versao = cache_catalogo.invalidar(apenas_estoque, None if estoque is None else list(estoque))
+        disponibilidade.aplicar_alteracoes(estoque, versao)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_marcacao(session):
+    session.info.pop('catalogo_alterado', None)
+    session.info.pop('cardapio_alterado', None)
+    disponibilidade.descartar_alteracoes(session)
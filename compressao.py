@@ -0,0 +1,66 @@
+import gzip
+import os
+
+from flask import request
+
+try:
+    # Opcional (pip install brotli); sem ele só há gzip
+    import brotli
+except ImportError:
+    brotli = None
+
+# Respostas JSON menores que isto (em bytes) vão sem compressão
+TAMANHO_MINIMO = int(os.environ.get('SMARTSELL_COMPRESSAO_MINIMO', 1024))
+NIVEL_GZIP = int(os.environ.get('SMARTSELL_COMPRESSAO_NIVEL_GZIP', 6))
+NIVEL_BROTLI = int(os.environ.get('SMARTSELL_COMPRESSAO_NIVEL_BROTLI', 5))
+
+# Em ordem de preferência quando o cliente aceita mais de uma
+CODIFICACOES = ('br', 'gzip') if brotli else ('gzip',)
+
+
+def escolher_codificacao(requisicao=None):
+    """A melhor codificação que o cliente aceita (Accept-Encoding), ou None."""
+    aceitas = (requisicao or request).accept_encodings
+    melhor, qualidade_melhor = None, 0
+    for codificacao in CODIFICACOES:
+        qualidade = aceitas[codificacao]
+        if qualidade > qualidade_melhor:
+            melhor, qualidade_melhor = codificacao, qualidade
+    return melhor
+
+
+def comprimir(corpo, codificacao):
+    if codificacao == 'br':
+        return brotli.compress(corpo, quality=NIVEL_BROTLI)
+    # mtime=0: o mesmo corpo gera sempre os mesmos bytes
+    return gzip.compress(corpo, compresslevel=NIVEL_GZIP, mtime=0)
+
+
+def marcar_codificacao(resposta, codificacao, corpo):
+    resposta.set_data(corpo)
+    resposta.headers['Content-Encoding'] = codificacao
+    resposta.vary.add('Accept-Encoding')
+    # A ETag precisa mudar com a representação
+    etag, fraca = resposta.get_etag()
+    if etag:
+        resposta.set_etag(f"{etag}-{codificacao}", weak=fraca)
+
+
+def comprimir_resposta(resposta):
+    """after_request: comprime as respostas JSON grandes conforme o Accept-Encoding do cliente.
+
+    Respostas em streaming (eventos, exportações) e as que já vêm
+    comprimidas do cache do catálogo passam direto.
+    """
+    if (resposta.status_code != 200 or resposta.is_streamed or resposta.direct_passthrough
+            or resposta.mimetype != 'application/json' or 'Content-Encoding' in resposta.headers):
+        return resposta
+    # Mesmo sem compressão, a resposta depende do Accept-Encoding
+    resposta.vary.add('Accept-Encoding')
+    corpo = resposta.get_data()
+    if len(corpo) < TAMANHO_MINIMO:
+        return resposta
+    codificacao = escolher_codificacao(request)
+    if codificacao:
+        marcar_codificacao(resposta, codificacao, comprimir(corpo, codificacao))
+    return resposta
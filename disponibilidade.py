@@ -0,0 +1,195 @@
+import math
+import threading
+
+from sqlalchemy import select
+
+from models import Ingrediente, ProdutoIngrediente
+
+# Acima disso, acompanhar outro processo relendo ingrediente por ingrediente
+# custa mais que recarregar tudo
+MAXIMO_RELEITURA = 500
+
+
+class MotorDisponibilidade:
+    """Calcula quantas porções de cada produto dá para fazer com o estoque atual.
+
+    Mantém em memória o estoque, as receitas e o índice reverso
+    ingrediente -> produtos. Uma mudança de estoque só recalcula os produtos
+    que usam aquele ingrediente; mudanças de receita recarregam tudo na
+    próxima consulta (são raras).
+
+    O motor guarda a versão do catálogo (ver catalogo.CacheCatalogo) que ele
+    reflete. Se a versão pular mais de um passo, outro processo gravou no
+    catálogo: o motor pergunta a `alterados` quais ingredientes mudaram nas
+    versões que perdeu e relê só esses. Sem esse histórico (versões antigas
+    demais, receita alterada) os dados são recarregados do banco.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._carregado = False
+        self._geracao = 0
+        self._versao = None
+        self._estoque = {}
+        self._receitas = {}
+        self._usos = {}
+        self._porcoes = {}
+
+    def invalidar(self):
+        with self._lock:
+            self._geracao += 1
+            self._carregado = False
+
+    def porcoes(self, db_session, versao=None, alterados=None):
+        """Retorna {produto_id: porções}; produtos sem receita não aparecem (sem limite).
+
+        `alterados(desde, ate)` devolve os ids de ingrediente gravados entre
+        duas versões do catálogo, ou None se não souber.
+        """
+        if self._carregado and versao is not None and versao != self._versao and alterados is not None:
+            self._acompanhar(db_session, versao, alterados)
+        if not self._carregado or (versao is not None and versao != self._versao):
+            self._carregar(db_session, versao)
+        return self._porcoes
+
+    def atualizar_estoque(self, estoque, versao=None):
+        """Aplica {ingrediente_id: quantidade} e recalcula só os produtos afetados.
+
+        `versao` é a versão do catálogo criada por esta alteração.
+        """
+        with self._lock:
+            if not self._carregado:
+                # Uma carga em andamento pode ter lido o estoque antigo
+                self._geracao += 1
+                return
+            if versao is not None and self._versao != versao - 1:
+                # Outro processo (ou outra thread) gravou nesse meio tempo: a
+                # próxima consulta relê o que mudou desde a versão do motor,
+                # inclusive esta alteração
+                return
+            self._versao = versao
+            self._aplicar(estoque)
+
+    def _acompanhar(self, db_session, versao, alterados):
+        # Outro processo gravou no catálogo: relê só os ingredientes alterados
+        # nas versões que este motor ainda não viu
+        with self._lock:
+            desde, geracao = self._versao, self._geracao
+        if desde is None:
+            return
+        ids = alterados(desde, versao)
+        if ids is None or len(ids) > MAXIMO_RELEITURA:
+            return
+        # Ingrediente que não voltar da consulta foi excluído
+        estoque = dict.fromkeys(ids)
+        if ids:
+            estoque.update(
+                (ingrediente_id, quantidade if status is not False else 0)
+                for ingrediente_id, quantidade, status in db_session.execute(
+                    select(Ingrediente.id, Ingrediente.quantidade_estoque, Ingrediente.status)
+                    .where(Ingrediente.id.in_(ids))))
+        with self._lock:
+            if self._carregado and self._versao == desde and self._geracao == geracao:
+                self._versao = versao
+                self._aplicar(estoque)
+
+    def _aplicar(self, estoque):
+        # Chamado com o lock: grava o estoque e recalcula os produtos que o usam
+        afetados = set()
+        for ingrediente_id, quantidade in estoque.items():
+            if quantidade is None:
+                self._estoque.pop(ingrediente_id, None)
+            else:
+                self._estoque[ingrediente_id] = quantidade
+            afetados.update(self._usos.get(ingrediente_id, ()))
+
+        porcoes = dict(self._porcoes)
+        for produto_id in afetados:
+            porcoes[produto_id] = self._calcular(produto_id)
+        self._porcoes = porcoes
+
+    def _carregar(self, db_session, versao=None):
+        geracao = self._geracao
+        # Ingrediente inativo conta como estoque zerado
+        estoque = {
+            ingrediente_id: (quantidade if status is not False else 0)
+            for ingrediente_id, quantidade, status in db_session.execute(
+                select(Ingrediente.id, Ingrediente.quantidade_estoque, Ingrediente.status))
+        }
+        receitas, usos = {}, {}
+        for produto_id, ingrediente_id, necessaria in db_session.execute(
+                select(ProdutoIngrediente.produto_id, ProdutoIngrediente.ingrediente_id,
+                       ProdutoIngrediente.quantidade_necessaria)):
+            receita = receitas.setdefault(produto_id, {})
+            receita[ingrediente_id] = receita.get(ingrediente_id, 0) + necessaria
+            usos.setdefault(ingrediente_id, set()).add(produto_id)
+
+        with self._lock:
+            self._estoque, self._receitas, self._usos = estoque, receitas, usos
+            self._versao = versao
+            self._porcoes = {produto_id: self._calcular(produto_id) for produto_id in receitas}
+            # Se algo mudou durante a leitura, a próxima consulta carrega de novo
+            self._carregado = self._geracao == geracao
+
+    def _calcular(self, produto_id):
+        porcoes = None
+        for ingrediente_id, necessaria in self._receitas[produto_id].items():
+            if necessaria <= 0:
+                continue
+            # Tolerância para não perder uma porção por erro de ponto flutuante
+            possiveis = math.floor(self._estoque.get(ingrediente_id, 0) / necessaria + 1e-9)
+            porcoes = possiveis if porcoes is None else min(porcoes, possiveis)
+        return max(porcoes, 0) if porcoes is not None else None
+
+
+motor_disponibilidade = MotorDisponibilidade()
+
+
+def registrar_estoque(session, linhas):
+    """Anota na sessão o novo estoque (id, quantidade, status) devolvido por um UPDATE em massa.
+
+    O motor só aplica depois do commit; o UPDATE deve ser executado com
+    execution_options(estoque_registrado=True).
+    """
+    session.info.setdefault('estoque_alterado', {}).update(
+        (ingrediente_id, quantidade if status is not False else 0)
+        for ingrediente_id, quantidade, status in linhas)
+
+
+def coletar_alteracoes(session):
+    # Chamado no after_flush: estoque de ingredientes gravados pelo ORM e
+    # qualquer mudança de receita
+    for obj in session.new | session.dirty:
+        if isinstance(obj, Ingrediente):
+            quantidade = obj.quantidade_estoque if obj.status is not False else 0
+            session.info.setdefault('estoque_alterado', {})[obj.id] = quantidade
+        elif isinstance(obj, ProdutoIngrediente):
+            session.info['receitas_alteradas'] = True
+    for obj in session.deleted:
+        if isinstance(obj, Ingrediente):
+            session.info.setdefault('estoque_alterado', {})[obj.id] = None
+        elif isinstance(obj, ProdutoIngrediente):
+            session.info['receitas_alteradas'] = True
+
+
+def retirar_alteracoes(session):
+    """Tira da sessão, no commit, o que mudou: {ingrediente_id: quantidade}, ou None se é preciso recarregar tudo."""
+    estoque = session.info.pop('estoque_alterado', None) or {}
+    receitas_alteradas = session.info.pop('receitas_alteradas', False)
+    if session.info.pop('estoque_desconhecido', False) or receitas_alteradas:
+        return None
+    return estoque
+
+
+def aplicar_alteracoes(estoque, versao=None):
+    # Chamado depois do commit, com a versão nova do catálogo
+    if estoque is None:
+        motor_disponibilidade.invalidar()
+    else:
+        # Mesmo sem estoque novo (só produto alterado) o motor avança a versão
+        motor_disponibilidade.atualizar_estoque(estoque, versao)
+
+
+def descartar_alteracoes(session):
+    for chave in ('estoque_alterado', 'receitas_alteradas', 'estoque_desconhecido'):
+        session.info.pop(chave, None)
@@ -0,0 +1,177 @@
+import codecs
+import csv
+import json
+
+from sqlalchemy import select, update, bindparam, func
+
+from banco import bloquear_escrita
+from models import Ingrediente
+from catalogo import marcar_catalogo_alterado
+from disponibilidade import registrar_estoque
+from auditoria import registro_auditoria
+
+# Linhas aplicadas por transação na contagem de estoque
+TAMANHO_BLOCO_CONTAGEM = 500
+# Quantos erros detalhados voltam no resumo
+MAXIMO_ERROS_RESUMO = 100
+
+_tabela = Ingrediente.__table__
+
+_definir_estoque = (
+    update(_tabela)
+    .where(_tabela.c.id == bindparam('_id'))
+    .values(quantidade_estoque=bindparam('_quantidade'))
+)
+_somar_estoque = (
+    update(_tabela)
+    .where(_tabela.c.id == bindparam('_id'))
+    .values(quantidade_estoque=func.max(_tabela.c.quantidade_estoque + bindparam('_quantidade'), 0))
+)
+
+
+def linhas_texto(stream, encoding='utf-8-sig'):
+    """Decodifica o corpo da requisição linha a linha.
+
+    Só usa readline(): sob o gunicorn request.stream é o Body dele, que não
+    é um RawIOBase (io.BufferedReader/TextIOWrapper não aceitam). O CR das
+    quebras CRLF fica na linha, como com newline='', e o csv o trata.
+    """
+    decodificador = codecs.getincrementaldecoder(encoding)()
+    for linha in iter(stream.readline, b''):
+        yield decodificador.decode(linha)
+    resto = decodificador.decode(b'', final=True)
+    if resto:
+        yield resto
+
+
+def ler_linhas_contagem(arquivo, formato='csv'):
+    """Lê a contagem linha a linha, sem carregar o arquivo inteiro.
+
+    Gera (numero_linha, dict ou ValueError). CSV com cabeçalho
+    ingrediente,quantidade (ou ingrediente_id,quantidade) ou JSON por linha.
+    """
+    if formato == 'csv':
+        leitor = csv.DictReader(arquivo)
+        for registro in leitor:
+            yield leitor.line_num, registro
+        return
+
+    for numero, linha in enumerate(arquivo, start=1):
+        if not linha.strip():
+            continue
+        try:
+            registro = json.loads(linha)
+        except ValueError:
+            registro = ValueError("Linha não é um JSON válido.")
+        if not isinstance(registro, (dict, ValueError)):
+            registro = ValueError("Cada linha deve ser um objeto JSON.")
+        yield numero, registro
+
+
+def _resolver(registro, modo, ids_por_nome, ids_existentes):
+    if isinstance(registro, Exception):
+        raise registro
+
+    ingrediente_id = registro.get('ingrediente_id')
+    if ingrediente_id not in (None, ''):
+        try:
+            ingrediente_id = int(ingrediente_id)
+        except (TypeError, ValueError):
+            raise ValueError("ingrediente_id inválido.")
+        if ingrediente_id not in ids_existentes:
+            raise ValueError(f"Ingrediente com id {ingrediente_id} não encontrado.")
+    else:
+        nome = str(registro.get('ingrediente') or '').strip()
+        if not nome:
+            raise ValueError("Informe ingrediente ou ingrediente_id.")
+        ingrediente_id = ids_por_nome.get(nome, ids_por_nome.get(nome.casefold()))
+        if ingrediente_id is None:
+            raise ValueError(f"Ingrediente '{nome}' não encontrado.")
+
+    try:
+        quantidade = float(str(registro.get('quantidade')).strip().replace(',', '.'))
+    except (TypeError, ValueError):
+        raise ValueError("Quantidade inválida.")
+    if modo == 'absoluto' and quantidade < 0:
+        raise ValueError("Quantidade não pode ser negativa.")
+    return ingrediente_id, quantidade
+
+
+def aplicar_contagem(db_session, linhas, modo='absoluto', tamanho_bloco=TAMANHO_BLOCO_CONTAGEM):
+    """Aplica a contagem de estoque em blocos e devolve um resumo.
+
+    `modo='absoluto'` grava a quantidade contada; `modo='delta'` soma (ou
+    subtrai) a quantidade ao estoque atual, sem deixá-lo negativo. Os nomes
+    são resolvidos por um mapa carregado uma única vez e cada bloco vira um
+    UPDATE executemany numa transação.
+    """
+    if modo not in ('absoluto', 'delta'):
+        raise ValueError("Modo inválido. Use absoluto ou delta.")
+
+    ids_por_nome = {}
+    for ingrediente_id, nome in db_session.execute(select(Ingrediente.id, Ingrediente.nome)):
+        ids_por_nome[nome] = ingrediente_id
+        ids_por_nome.setdefault(nome.casefold(), ingrediente_id)
+    ids_existentes = set(ids_por_nome.values())
+
+    resumo = {"linhas": 0, "aplicadas": 0, "erros": 0, "ingredientes_atualizados": 0, "detalhes_erros": []}
+    atualizados = set()
+    bloco = {}
+
+    def gravar_bloco():
+        # Estoque antes da contagem, para a auditoria; lido já com o lock de
+        # escrita, então nenhum pedido muda o estoque entre a leitura e o UPDATE
+        bloquear_escrita(db_session)
+        anterior = dict(db_session.execute(
+            select(Ingrediente.id, Ingrediente.quantidade_estoque).where(Ingrediente.id.in_(list(bloco)))
+        ).all())
+        db_session.execute(
+            _definir_estoque if modo == 'absoluto' else _somar_estoque,
+            [{"_id": ingrediente_id, "_quantidade": quantidade} for ingrediente_id, quantidade in bloco.items()]
+        )
+        # O UPDATE em lote não devolve linhas; o estoque novo do bloco é
+        # relido de uma vez para o motor de disponibilidade
+        novo_estoque = db_session.execute(
+            select(Ingrediente.id, Ingrediente.quantidade_estoque, Ingrediente.status)
+            .where(Ingrediente.id.in_(list(bloco)))
+        ).all()
+        registrar_estoque(db_session, novo_estoque)
+        marcar_catalogo_alterado(db_session, apenas_estoque=True)
+        db_session.commit()
+        for ingrediente_id, quantidade, _ in novo_estoque:
+            registro_auditoria.registrar('ingrediente', ingrediente_id, 'quantidade_estoque',
+                                         anterior.get(ingrediente_id), quantidade)
+        atualizados.update(bloco)
+        bloco.clear()
+
+    try:
+        pendentes = 0
+        for numero, registro in linhas:
+            resumo["linhas"] += 1
+            try:
+                ingrediente_id, quantidade = _resolver(registro, modo, ids_por_nome, ids_existentes)
+            except ValueError as e:
+                resumo["erros"] += 1
+                if len(resumo["detalhes_erros"]) < MAXIMO_ERROS_RESUMO:
+                    resumo["detalhes_erros"].append({"linha": numero, "msg": str(e)})
+                continue
+
+            if modo == 'absoluto':
+                bloco[ingrediente_id] = quantidade
+            else:
+                bloco[ingrediente_id] = bloco.get(ingrediente_id, 0) + quantidade
+            resumo["aplicadas"] += 1
+            pendentes += 1
+
+            if pendentes >= tamanho_bloco:
+                gravar_bloco()
+                pendentes = 0
+
+        if bloco:
+            gravar_bloco()
+    except Exception:
+        db_session.rollback()
+        raise
+
+    resumo["ingredientes_atualizados"] = len(atualizados)
+    return resumo
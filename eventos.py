@@ -0,0 +1,166 @@
+import json
+import multiprocessing
+import os
+import struct
+import threading
+import time
+
+# Eventos guardados para quem reconecta com Last-Event-ID
+TAMANHO_BUFFER = int(os.environ.get('SMARTSELL_EVENTOS_BUFFER', 1024))
+# Bytes por evento; um evento maior vai só com o id (o cliente busca o resto)
+TAMANHO_EVENTO = int(os.environ.get('SMARTSELL_EVENTOS_TAMANHO_MAX', 4096))
+# Comentário enviado em conexões paradas, para proxies não derrubarem
+INTERVALO_KEEPALIVE = float(os.environ.get('SMARTSELL_EVENTOS_KEEPALIVE', 15))
+# Depois disso o servidor fecha a conexão e o EventSource reconecta com
+# Last-Event-ID: o token é conferido de novo e a thread do worker é liberada
+DURACAO_CONEXAO = float(os.environ.get('SMARTSELL_EVENTOS_DURACAO', 300))
+RECONEXAO_MS = 2000
+# Com vários workers, de quanto em quanto tempo uma conexão confere se outro
+# processo publicou algo (leitura em memória, sem banco)
+INTERVALO_VERIFICACAO = 0.5
+# Cada conexão prende uma thread do worker (gthread) pela duração inteira.
+# Por worker, todas as threads (SMARTSELL_THREADS, a mesma do
+# gunicorn.conf.py) menos THREADS_LIVRES atendem telas; as livres ficam para
+# pedidos e logins. Telas por servidor = workers x (threads - livres): com o
+# padrão de 8 threads, 6 telas por worker. Acima do limite a conexão recebe
+# 503. Uma tela que caiu libera a vaga no próximo keepalive.
+THREADS_WORKER = int(os.environ.get('SMARTSELL_THREADS', 8))
+THREADS_LIVRES = 2
+MAXIMO_CONEXOES = min(int(os.environ.get('SMARTSELL_EVENTOS_CONEXOES', THREADS_WORKER - THREADS_LIVRES)),
+                      max(THREADS_WORKER - 1, 0))
+
+_CABECALHO = struct.Struct('<qI')  # id do evento, tamanho do corpo
+
+
+class ConexoesEsgotadas(Exception):
+    pass
+
+
+class CanalEventos:
+    """Pub/sub dos eventos de pedidos, com os últimos eventos num buffer circular.
+
+    O buffer e o último id ficam em memória compartilhada, criada antes do
+    fork dos workers: um pedido gravado em qualquer processo chega às
+    conexões de todos. No próprio processo a entrega é imediata; nos outros,
+    em até INTERVALO_VERIFICACAO. Conexões paradas não consultam o banco.
+    """
+
+    def __init__(self, tamanho=TAMANHO_BUFFER, tamanho_evento=TAMANHO_EVENTO, maximo_conexoes=MAXIMO_CONEXOES):
+        self.tamanho = tamanho
+        self.tamanho_evento = tamanho_evento
+        self._posicao = _CABECALHO.size + tamanho_evento
+        self._buffer = multiprocessing.RawArray('c', tamanho * self._posicao)
+        self._ultimo = multiprocessing.Value('q', 0)
+        self._condicao = threading.Condition()
+        # Por processo: cada worker tem as suas threads
+        self.maximo_conexoes = maximo_conexoes
+        self._conexoes = threading.BoundedSemaphore(maximo_conexoes) if maximo_conexoes else None
+
+    @property
+    def ultimo_id(self):
+        return self._ultimo.value
+
+    def reservar_conexao(self):
+        """Ocupa uma das vagas de conexão deste processo; ConexoesEsgotadas se não houver."""
+        if self._conexoes is None or not self._conexoes.acquire(blocking=False):
+            raise ConexoesEsgotadas("Muitas telas conectadas neste servidor. Tente novamente em instantes.")
+
+    def liberar_conexao(self):
+        self._conexoes.release()
+
+    def publicar(self, tipo, dados):
+        """Guarda o evento no buffer, acorda as conexões e devolve o id dele."""
+        return self.publicar_varios(tipo, [dados])[-1]
+
+    def publicar_varios(self, tipo, lista_dados):
+        """Guarda um evento por item de `lista_dados`, em ordem, e acorda as conexões uma vez só.
+
+        Devolve os ids dos eventos.
+        """
+        corpos = []
+        for dados in lista_dados:
+            corpo = f"{tipo}\n{json.dumps(dados, separators=(',', ':'))}".encode('utf-8')
+            if len(corpo) > self.tamanho_evento:
+                corpo = f"{tipo}\n{json.dumps({'id': dados.get('id'), 'resumido': True})}".encode('utf-8')
+            corpos.append(corpo)
+
+        memoria = memoryview(self._buffer).cast('B')
+        ids = []
+        with self._ultimo.get_lock():
+            for corpo in corpos:
+                evento_id = self._ultimo.value + 1
+                inicio = (evento_id % self.tamanho) * self._posicao
+                _CABECALHO.pack_into(memoria, inicio, evento_id, len(corpo))
+                memoria[inicio + _CABECALHO.size:inicio + _CABECALHO.size + len(corpo)] = corpo
+                self._ultimo.value = evento_id
+                ids.append(evento_id)
+
+        with self._condicao:
+            self._condicao.notify_all()
+        return ids
+
+    def eventos_desde(self, ultimo_id):
+        """Devolve (eventos, completo): os eventos com id maior que `ultimo_id`, em ordem.
+
+        `completo` é False quando não dá para continuar de `ultimo_id`: o
+        buffer já descartou eventos do meio ou o id é de antes de um restart.
+        """
+        memoria = memoryview(self._buffer).cast('B')
+        with self._ultimo.get_lock():
+            atual = self._ultimo.value
+            if ultimo_id > atual:
+                return [], False
+            primeiro = max(ultimo_id + 1, atual - self.tamanho + 1)
+            eventos = []
+            for evento_id in range(primeiro, atual + 1):
+                inicio = (evento_id % self.tamanho) * self._posicao
+                _, tamanho = _CABECALHO.unpack_from(memoria, inicio)
+                corpo = bytes(memoria[inicio + _CABECALHO.size:inicio + _CABECALHO.size + tamanho])
+                tipo, dados = corpo.decode('utf-8').split('\n', 1)
+                eventos.append((evento_id, tipo, dados))
+        return eventos, primeiro == ultimo_id + 1
+
+    def aguardar(self, ultimo_id, timeout):
+        """Espera um evento com id maior que `ultimo_id`; False se o tempo acabou."""
+        limite = time.monotonic() + timeout
+        with self._condicao:
+            while self._ultimo.value <= ultimo_id:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    return False
+                self._condicao.wait(min(restante, INTERVALO_VERIFICACAO))
+        return True
+
+    def transmitir(self, ultimo_id=None, duracao=DURACAO_CONEXAO, keepalive=INTERVALO_KEEPALIVE):
+        """Gera o corpo text/event-stream a partir de `ultimo_id` (None: só eventos novos)."""
+        yield f"retry: {RECONEXAO_MS}\n\n"
+        if ultimo_id is None:
+            ultimo_id = self.ultimo_id
+
+        fim = time.monotonic() + duracao
+        while True:
+            eventos, completo = self.eventos_desde(ultimo_id)
+            if not completo:
+                # O cliente perdeu eventos: recarrega a fila e segue daqui
+                ultimo_id = eventos[0][0] - 1 if eventos else self.ultimo_id
+                yield f"id: {ultimo_id}\nevent: reinicio\ndata: {{}}\n\n"
+            for evento_id, tipo, dados in eventos:
+                yield f"id: {evento_id}\nevent: {tipo}\ndata: {dados}\n\n"
+                ultimo_id = evento_id
+
+            restante = fim - time.monotonic()
+            if restante <= 0:
+                return
+            if not self.aguardar(ultimo_id, min(keepalive, restante)):
+                yield ": keepalive\n\n"
+
+
+canal_pedidos = CanalEventos()
+
+
+def ler_ultimo_id(valor):
+    # Last-Event-ID vem do navegador; qualquer coisa estranha vale como "sem id"
+    try:
+        return max(0, int(valor))
+    except (TypeError, ValueError):
+        return None
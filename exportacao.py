@@ -0,0 +1,112 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from sqlalchemy import select
+
+from banco import leitura_session
+from models import Pedido, PedidoItem, Movimento, Ingrediente
+
+# Linhas lidas do banco por vez e linhas por pedaço enviado ao cliente
+LINHAS_POR_LOTE = 1000
+
+# nome -> (modelo, colunas exportadas, coluna de data para ?desde=)
+EXPORTACOES = {
+    'pedidos': (Pedido, ('id', 'usuario_id', 'produto_id', 'quantidade', 'metodo_pagamento',
+                         'valor_total', 'data', 'status'), 'data'),
+    'movimentos': (Movimento, ('id', 'pedido_id', 'valor_total', 'entrada', 'saida', 'data'), 'data'),
+    'ingredientes': (Ingrediente, ('id', 'nome', 'unidade', 'quantidade_estoque', 'status'), None),
+}
+
+# Linhas filhas exportadas junto: nome -> (modelo, chave estrangeira, colunas).
+# No NDJSON vão num array "itens" de cada registro; no CSV cada item é uma
+# linha, com os dados do registro repetidos e as colunas item_*
+ITENS_EXPORTACAO = {
+    'pedidos': (PedidoItem, 'pedido_id', ('id', 'produto_id', 'quantidade', 'preco_unitario', 'valor_total')),
+}
+
+FORMATOS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def _valor(valor):
+    return valor.isoformat() if isinstance(valor, datetime) else valor
+
+
+def cabecalho_csv(nome):
+    colunas = EXPORTACOES[nome][1]
+    if nome in ITENS_EXPORTACAO:
+        colunas += tuple(f"item_{coluna}" for coluna in ITENS_EXPORTACAO[nome][2])
+    return colunas
+
+
+def consulta_exportacao(nome, desde_id=None, desde=None):
+    """Monta o SELECT da exportação; ValueError se a tabela não aceita o filtro.
+
+    Nas exportações com itens é um LEFT JOIN com uma linha por item, em
+    ordem de (id, id do item): os itens de um registro chegam juntos.
+    """
+    modelo, colunas, coluna_data = EXPORTACOES[nome]
+    consulta = select(*[getattr(modelo, coluna) for coluna in colunas]).order_by(modelo.id)
+    if nome in ITENS_EXPORTACAO:
+        modelo_item, chave, colunas_item = ITENS_EXPORTACAO[nome]
+        consulta = (
+            consulta.add_columns(*[getattr(modelo_item, coluna) for coluna in colunas_item])
+            .outerjoin(modelo_item, getattr(modelo_item, chave) == modelo.id)
+            .order_by(modelo_item.id)
+        )
+    if desde_id is not None:
+        consulta = consulta.where(modelo.id > desde_id)
+    if desde is not None:
+        if coluna_data is None:
+            raise ValueError(f"A exportação de {nome} não tem data; use desde_id.")
+        consulta = consulta.where(getattr(modelo, coluna_data) >= desde)
+    return consulta
+
+
+def exportar(nome, formato, consulta, abrir_sessao=leitura_session, linhas_por_lote=LINHAS_POR_LOTE):
+    """Gera o arquivo em pedaços, lendo `linhas_por_lote` linhas do cursor por vez.
+
+    A sessão é aberta pelo próprio gerador, porque a resposta continua sendo
+    enviada depois do fim da requisição (e do teardown das sessões dela).
+    """
+    colunas = EXPORTACOES[nome][1]
+    colunas_item = ITENS_EXPORTACAO[nome][2] if nome in ITENS_EXPORTACAO else None
+    db_session = abrir_sessao()
+    try:
+        resultado = db_session.execute(consulta.execution_options(yield_per=linhas_por_lote))
+        if formato == 'csv':
+            buffer = io.StringIO()
+            escritor = csv.writer(buffer)
+            escritor.writerow(cabecalho_csv(nome))
+            for lote in resultado.partitions():
+                escritor.writerows(map(_valor, linha) for linha in lote)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            if buffer.tell():
+                yield buffer.getvalue()
+        else:
+            # O registro em montagem passa de um lote para o outro: os itens
+            # dele podem estar divididos entre dois lotes
+            atual = None
+            for lote in resultado.partitions():
+                prontos = []
+                for linha in lote:
+                    if atual is None or linha[0] != atual["id"]:
+                        if atual is not None:
+                            prontos.append(atual)
+                        atual = dict(zip(colunas, map(_valor, linha[:len(colunas)])))
+                        if colunas_item:
+                            atual["itens"] = []
+                    if colunas_item and linha[len(colunas)] is not None:
+                        atual["itens"].append(dict(zip(colunas_item, linha[len(colunas):])))
+                if prontos:
+                    yield ''.join(json.dumps(registro, ensure_ascii=False) + '\n' for registro in prontos)
+            if atual is not None:
+                yield json.dumps(atual, ensure_ascii=False) + '\n'
+    finally:
+        db_session.close()
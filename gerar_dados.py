@@ -0,0 +1,179 @@
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+from werkzeug.security import generate_password_hash
+
+from banco import criar_engine
+from migracoes import migrar
+from models import Base, Usuario, Ingrediente, Produto, ProdutoIngrediente, Pedido, PedidoItem, Movimento
+from resumos import reconstruir
+from caixa import recalcular_checkpoints
+from senhas import METODO_HASH, TAMANHO_SALT
+
+# Gera um banco SQLite descartável com dados sintéticos para os benchmarks.
+# Tudo entra por INSERTs em lote (executemany) com ids explícitos, sem ORM
+# nem RETURNING, então 1M de pedidos leva poucos minutos.
+
+ESCALAS = {
+    "pequena": {"ingredientes": 200, "produtos": 100, "usuarios": 20, "pedidos": 10_000},
+    "media": {"ingredientes": 2_000, "produtos": 1_000, "usuarios": 200, "pedidos": 100_000},
+    "grande": {"ingredientes": 10_000, "produtos": 5_000, "usuarios": 1_000, "pedidos": 1_000_000},
+}
+
+SENHA_PADRAO = "senha123"
+EMAIL_ADMIN = "admin@bench.local"
+TAMANHO_BLOCO = 20_000
+UNIDADES = ['g', 'mg', 'kg', 'ml', 'l', 'un']
+CATEGORIAS = ['Pizza', 'Lanche', 'Bebida', 'Sobremesa', 'Porção', 'Salada']
+METODOS_PAGAMENTO = ['dinheiro', 'pix', 'cartao']
+
+
+def _em_blocos(conexao, tabela, linhas, tamanho_bloco=TAMANHO_BLOCO):
+    # `linhas` pode ser um gerador: só um bloco fica em memória por vez
+    bloco = []
+    for linha in linhas:
+        bloco.append(linha)
+        if len(bloco) >= tamanho_bloco:
+            conexao.execute(insert(tabela), bloco)
+            conexao.commit()
+            bloco = []
+    if bloco:
+        conexao.execute(insert(tabela), bloco)
+        conexao.commit()
+
+
+def _usuarios(quantidade, senha_hash):
+    yield {"id": 1, "nome": "Admin Bench", "telefone": "11900000000", "email": EMAIL_ADMIN,
+           "senha_hash": senha_hash, "papel": "admin", "status": True}
+    for i in range(2, quantidade + 1):
+        yield {"id": i, "nome": f"Usuário {i}", "telefone": f"119{i:08d}", "email": f"usuario{i}@bench.local",
+               "senha_hash": senha_hash, "papel": "usuario", "status": True}
+
+
+def _ingredientes(quantidade, aleatorio):
+    for i in range(1, quantidade + 1):
+        yield {"id": i, "nome": f"Ingrediente {i}", "unidade": aleatorio.choice(UNIDADES),
+               # Estoque folgado: os pedidos do benchmark não podem esbarrar em falta
+               "quantidade_estoque": float(aleatorio.randint(1_000_000, 10_000_000)), "status": True}
+
+
+def _receitas(produtos, ingredientes, por_produto, aleatorio):
+    id_relacao = 0
+    for produto_id in range(1, produtos + 1):
+        for ingrediente_id in aleatorio.sample(range(1, ingredientes + 1), min(por_produto, ingredientes)):
+            id_relacao += 1
+            yield {"id": id_relacao, "produto_id": produto_id, "ingrediente_id": ingrediente_id,
+                   "quantidade_necessaria": round(aleatorio.uniform(0.01, 0.5), 3)}
+
+
+def _pedidos(quantidade, usuarios, precos, dias, aleatorio, itens, movimentos):
+    """Gera as linhas de pedido e, de carona, preenche as listas de itens e movimentos do bloco."""
+    fim = datetime.utcnow()
+    segundos = dias * 86400
+    id_item = 0
+    for pedido_id in range(1, quantidade + 1):
+        linhas = []
+        for produto_id in set(aleatorio.choices(range(1, len(precos) + 1), k=aleatorio.randint(1, 3))):
+            unidades = aleatorio.randint(1, 3)
+            id_item += 1
+            linhas.append({"id": id_item, "pedido_id": pedido_id, "produto_id": produto_id,
+                           "quantidade": unidades, "preco_unitario": precos[produto_id - 1],
+                           "valor_total": round(precos[produto_id - 1] * unidades, 2)})
+        valor_total = round(sum(linha["valor_total"] for linha in linhas), 2)
+        usuario_id = aleatorio.randint(1, usuarios)
+        metodo_pagamento = aleatorio.choice(METODOS_PAGAMENTO)
+        data = fim - timedelta(seconds=aleatorio.randrange(segundos))
+        itens.extend(linhas)
+        movimentos.append({"id": pedido_id, "pedido_id": pedido_id, "valor_total": valor_total,
+                           "entrada": True, "saida": False, "data": data})
+        yield {"id": pedido_id, "usuario_id": usuario_id,
+               "produto_id": linhas[0]["produto_id"] if len(linhas) == 1 else None,
+               "quantidade": sum(linha["quantidade"] for linha in linhas),
+               "metodo_pagamento": metodo_pagamento, "valor_total": valor_total,
+               "data": data, "status": "pendente"}
+
+
+def gerar(url, ingredientes, produtos, usuarios, pedidos, ingredientes_por_produto=4, dias=365,
+          semente=42, tamanho_bloco=TAMANHO_BLOCO, mostrar=print):
+    """Cria o schema em `url` e preenche com dados sintéticos; devolve as contagens."""
+    aleatorio = random.Random(semente)
+    engine = criar_engine(url)
+    Base.metadata.create_all(engine)
+    migrar(engine)
+
+    inicio = time.perf_counter()
+    # Todos com a mesma senha: um único hash em vez de milhares de scrypt
+    senha_hash = generate_password_hash(SENHA_PADRAO, METODO_HASH, TAMANHO_SALT)
+    precos = [round(aleatorio.uniform(5, 120), 2) for _ in range(produtos)]
+
+    with engine.connect() as conexao:
+        _em_blocos(conexao, Usuario, _usuarios(usuarios, senha_hash), tamanho_bloco)
+        _em_blocos(conexao, Ingrediente, _ingredientes(ingredientes, aleatorio), tamanho_bloco)
+        _em_blocos(conexao, Produto, ({"id": i + 1, "nome": f"Produto {i + 1}", "descricao": f"Descrição do produto {i + 1}",
+                                       "preco": preco, "categoria": aleatorio.choice(CATEGORIAS), "status": True}
+                                      for i, preco in enumerate(precos)), tamanho_bloco)
+        _em_blocos(conexao, ProdutoIngrediente,
+                   _receitas(produtos, ingredientes, ingredientes_por_produto, aleatorio), tamanho_bloco)
+        mostrar(f"Cadastros gravados em {time.perf_counter() - inicio:.1f}s")
+
+        itens, movimentos = [], []
+        bloco = []
+        for pedido in _pedidos(pedidos, usuarios, precos, dias, aleatorio, itens, movimentos):
+            bloco.append(pedido)
+            if len(bloco) >= tamanho_bloco:
+                conexao.execute(insert(Pedido), bloco)
+                conexao.execute(insert(PedidoItem), itens)
+                conexao.execute(insert(Movimento), movimentos)
+                conexao.commit()
+                bloco = []
+                itens.clear()
+                movimentos.clear()
+                mostrar(f"{pedido['id']} pedidos gravados ({time.perf_counter() - inicio:.1f}s)")
+        if bloco:
+            conexao.execute(insert(Pedido), bloco)
+            conexao.execute(insert(PedidoItem), itens)
+            conexao.execute(insert(Movimento), movimentos)
+            conexao.commit()
+
+    db_session = sessionmaker(bind=engine)()
+    try:
+        resumos = reconstruir(db_session)
+        recalcular_checkpoints(db_session)
+        db_session.commit()
+    finally:
+        db_session.close()
+    engine.dispose()
+    mostrar(f"Resumos recalculados; total {time.perf_counter() - inicio:.1f}s")
+
+    return {"ingredientes": ingredientes, "produtos": produtos, "usuarios": usuarios,
+            "pedidos": pedidos, "resumos": resumos}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Gera um banco SQLite com dados sintéticos para benchmark.")
+    parser.add_argument("arquivo", help="arquivo .sqlite3 de destino (precisa não existir)")
+    parser.add_argument("--escala", choices=ESCALAS, default="pequena")
+    parser.add_argument("--ingredientes", type=int)
+    parser.add_argument("--produtos", type=int)
+    parser.add_argument("--usuarios", type=int)
+    parser.add_argument("--pedidos", type=int)
+    parser.add_argument("--ingredientes-por-produto", type=int, default=4)
+    parser.add_argument("--dias", type=int, default=365, help="período coberto pelos pedidos")
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    if os.path.exists(args.arquivo):
+        parser.error(f"{args.arquivo} já existe; escolha outro arquivo ou apague o antigo.")
+
+    escala = dict(ESCALAS[args.escala])
+    for campo in escala:
+        if getattr(args, campo) is not None:
+            escala[campo] = getattr(args, campo)
+
+    gerar(f"sqlite:///{args.arquivo}", ingredientes_por_produto=args.ingredientes_por_produto,
+          dias=args.dias, semente=args.semente, **escala)
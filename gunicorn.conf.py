@@ -0,0 +1,48 @@
+import os
+
+# Configuração de produção, lida automaticamente pelo gunicorn nesta pasta:
+#
+#   gunicorn main:app
+#   SMARTSELL_WORKERS=4 SMARTSELL_THREADS=8 SMARTSELL_BIND=0.0.0.0:8000 gunicorn main:app
+#
+# O app é carregado uma vez no processo master (preload) e os workers são
+# criados por fork. Cache do catálogo, cache de identidades, o contador de
+# versão e as métricas do /metrics em memória compartilhada dependem disso:
+# sem preload cada worker teria os seus, uma escrita num processo não
+# invalidaria os outros e o /metrics mostraria só o worker que respondeu.
+
+bind = os.environ.get('SMARTSELL_BIND', '0.0.0.0:5002')
+workers = int(os.environ.get('SMARTSELL_WORKERS', os.cpu_count() or 1))
+# Cada tela da cozinha conectada em /pedidos/eventos ocupa uma thread. Por
+# worker são aceitas threads - 2 telas (SMARTSELL_EVENTOS_CONEXOES, ver
+# eventos.py), então o servidor comporta workers x (threads - 2) telas.
+# Mais telas: mais threads ou mais workers
+threads = int(os.environ.get('SMARTSELL_THREADS', 8))
+worker_class = 'gthread'
+preload_app = True
+timeout = int(os.environ.get('SMARTSELL_TIMEOUT', 60))
+graceful_timeout = 30
+# Vazio desliga o log de acesso
+accesslog = os.environ.get('SMARTSELL_ACCESS_LOG', '-') or None
+# Formato padrão do gunicorn trocando a linha da requisição ("%(r)s") pelo
+# caminho sem a query string (%(U)s): parâmetros de URL como o ?ticket= de
+# /pedidos/eventos não vão para o log
+access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(m)s %(U)s %(H)s" %(s)s %(b)s "%(f)s" "%(a)s"'
+
+
+def on_starting(server):
+    # Cria as tabelas e aplica as migrações pendentes (migracoes.py) antes de
+    # subir os workers: um deploy novo não atende com o schema antigo
+    from banco import engine
+    from models import init_db
+    init_db()
+    # O master não atende requisições: fecha as conexões que a migração abriu
+    engine.dispose()
+
+
+def post_fork(server, worker):
+    # O worker não pode reaproveitar conexões SQLite abertas no master: o
+    # pool é descartado sem fechar as conexões (elas continuam do master)
+    from banco import engine, engine_leitura
+    engine.dispose(close=False)
+    engine_leitura.dispose(close=False)
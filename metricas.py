@@ -0,0 +1,260 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import Counter
+
+from flask import request
+from sqlalchemy import event
+
+# Consultas mais lentas que isto (em ms) vão para o log; 0 desliga
+SQL_LENTA_MS = float(os.environ.get('SMARTSELL_SQL_LENTA_MS', 0))
+# Mesmo comando SQL repetido mais vezes que isto numa requisição = suspeita de N+1
+LIMITE_N_MAIS_1 = int(os.environ.get('SMARTSELL_N_MAIS_1_LIMITE', 10))
+
+FAIXAS_DURACAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+FAIXAS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100)
+# Séries guardadas por métrica (combinações de endpoint, método e status)
+CAPACIDADE_SERIES = int(os.environ.get('SMARTSELL_METRICAS_SERIES', 512))
+# Bytes do nome de cada série
+TAMANHO_CHAVE = 160
+
+logger = logging.getLogger('smartsell.metricas')
+
+
+class TabelaCompartilhada:
+    """Séries de contadores (chave -> `largura` valores) em memória compartilhada.
+
+    Criada antes do fork dos workers, como o cache do catálogo e o canal de
+    eventos: o que um processo soma aparece para todos, então qualquer
+    worker que atender o /metrics devolve o total do servidor. As chaves
+    ficam num array de tamanho fixo; passando de `capacidade` séries, as
+    novas são descartadas (com um aviso no log).
+    """
+
+    def __init__(self, largura, capacidade=CAPACIDADE_SERIES, tamanho_chave=TAMANHO_CHAVE):
+        self.largura = largura
+        self.capacidade = capacidade
+        self.tamanho_chave = tamanho_chave
+        self._chaves = multiprocessing.RawArray('c', capacidade * tamanho_chave)
+        self._valores = multiprocessing.RawArray('d', capacidade * largura)
+        self._total = multiprocessing.Value('i', 0)
+        # Por processo: posição de cada chave já vista
+        self._indices = {}
+        self._cheia_avisada = False
+
+    def _chave(self, indice):
+        inicio = indice * self.tamanho_chave
+        return self._chaves[inicio:inicio + self.tamanho_chave].rstrip(b'\0').decode('utf-8')
+
+    def _indice(self, chave):
+        # Chamado com o lock: outro processo pode ter criado a série depois
+        # da última vez que este olhou
+        indice = self._indices.get(chave)
+        if indice is not None:
+            return indice
+        for indice in range(len(self._indices), self._total.value):
+            self._indices[self._chave(indice)] = indice
+        if chave in self._indices:
+            return self._indices[chave]
+
+        codificada = chave.encode('utf-8')
+        if self._total.value >= self.capacidade or len(codificada) > self.tamanho_chave:
+            if not self._cheia_avisada:
+                logger.warning("Métricas: série %r descartada (limite de %d séries ou chave longa demais).",
+                               chave, self.capacidade)
+                self._cheia_avisada = True
+            return None
+        indice = self._total.value
+        inicio = indice * self.tamanho_chave
+        self._chaves[inicio:inicio + len(codificada)] = codificada
+        self._total.value = indice + 1
+        self._indices[chave] = indice
+        return indice
+
+    def somar(self, chave, incrementos):
+        """Soma cada (posição, valor) de `incrementos` aos valores da série `chave`."""
+        with self._total.get_lock():
+            indice = self._indice(chave)
+            if indice is None:
+                return
+            inicio = indice * self.largura
+            for posicao, valor in incrementos:
+                self._valores[inicio + posicao] += valor
+
+    def itens(self):
+        """[(chave, valores)] de todas as séries, em ordem de chave."""
+        with self._total.get_lock():
+            itens = [(self._chave(indice), self._valores[indice * self.largura:(indice + 1) * self.largura])
+                     for indice in range(self._total.value)]
+        return sorted(itens)
+
+
+class Contador:
+    def __init__(self):
+        self._tabela = TabelaCompartilhada(1)
+
+    def somar(self, chave, valor=1):
+        self._tabela.somar(chave, [(0, valor)])
+
+    def itens(self):
+        return [(chave, valores[0]) for chave, valores in self._tabela.itens()]
+
+
+class Histograma:
+    def __init__(self, faixas):
+        self.faixas = faixas
+        # Por série: uma contagem por faixa (e a +Inf), a soma e o total
+        self._tabela = TabelaCompartilhada(len(faixas) + 3)
+
+    def observar(self, chave, valor):
+        for indice, limite in enumerate(self.faixas):
+            if valor <= limite:
+                break
+        else:
+            indice = len(self.faixas)
+        self._tabela.somar(chave, [(indice, 1), (len(self.faixas) + 1, valor), (len(self.faixas) + 2, 1)])
+
+    def linhas(self, nome, rotulo):
+        for chave, valores in self._tabela.itens():
+            rotulos = f'{rotulo}="{chave}"'
+            acumulado = 0
+            for limite, contagem in zip(self.faixas + ('+Inf',), valores):
+                acumulado += contagem
+                yield f'{nome}_bucket{{{rotulos},le="{limite}"}} {int(acumulado)}'
+            yield f'{nome}_sum{{{rotulos}}} {valores[-2]}'
+            yield f'{nome}_count{{{rotulos}}} {int(valores[-1])}'
+
+
+class Metricas:
+    """Latência, consultas SQL e tempo de banco por endpoint, somados entre os workers.
+
+    As engines avisam cada comando executado; as informações da requisição
+    em andamento ficam num threading.local e são somadas às métricas do
+    endpoint quando a requisição termina. Os totais ficam em memória
+    compartilhada (ver TabelaCompartilhada), criada na importação, antes do
+    fork dos workers.
+    """
+
+    def __init__(self, sql_lenta_ms=SQL_LENTA_MS, limite_n_mais_1=LIMITE_N_MAIS_1):
+        self.sql_lenta_ms = sql_lenta_ms
+        self.limite_n_mais_1 = limite_n_mais_1
+        self._atual = threading.local()
+        self.requisicoes = Contador()                   # "endpoint|método|status" -> total
+        self.duracao = Histograma(FAIXAS_DURACAO)       # endpoint -> segundos
+        self.consultas = Histograma(FAIXAS_CONSULTAS)   # endpoint -> comandos por requisição
+        self.tempo_banco = Contador()                   # endpoint -> segundos no banco
+        self.n_mais_1 = Contador()                      # endpoint -> requisições com N+1 suspeito
+
+    def observar_engine(self, engine):
+        # criar_app pode rodar mais de uma vez no mesmo processo (testes, scripts)
+        if event.contains(engine, 'before_cursor_execute', self._antes_consulta):
+            return
+        event.listen(engine, 'before_cursor_execute', self._antes_consulta)
+        event.listen(engine, 'after_cursor_execute', self._depois_consulta)
+
+    def _antes_consulta(self, conexao, cursor, sql, parametros, contexto, executemany):
+        contexto._inicio_metricas = time.perf_counter()
+
+    def _depois_consulta(self, conexao, cursor, sql, parametros, contexto, executemany):
+        duracao = time.perf_counter() - contexto._inicio_metricas
+        estado = getattr(self._atual, 'estado', None)
+        if estado is not None:
+            estado['consultas'] += 1
+            estado['tempo_banco'] += duracao
+            estado['formas'][sql] += 1
+        if self.sql_lenta_ms and duracao * 1000 >= self.sql_lenta_ms:
+            logger.warning("Consulta lenta (%.1f ms) em %s: %s | parâmetros: %.200r",
+                           duracao * 1000, estado['endpoint'] if estado else '-', sql, parametros)
+
+    def iniciar_requisicao(self):
+        self._atual.estado = {
+            'endpoint': request.endpoint or 'nao_encontrado',
+            'metodo': request.method,
+            'inicio': time.perf_counter(),
+            'status': 500,
+            'consultas': 0,
+            'tempo_banco': 0.0,
+            'formas': Counter(),
+        }
+
+    def registrar_status(self, resposta):
+        estado = getattr(self._atual, 'estado', None)
+        if estado is not None:
+            estado['status'] = resposta.status_code
+            if resposta.is_streamed:
+                # O gerador (ex.: /exportar) roda depois do teardown, na mesma
+                # thread: a requisição só é somada quando o servidor fecha a resposta
+                estado['em_streaming'] = True
+                resposta.call_on_close(self._encerrar_streaming)
+        return resposta
+
+    def finalizar_requisicao(self, exception=None):
+        estado = getattr(self._atual, 'estado', None)
+        if estado is None or estado.get('em_streaming'):
+            return
+        self._atual.estado = None
+        self._somar(estado)
+
+    def _encerrar_streaming(self):
+        estado = getattr(self._atual, 'estado', None)
+        if estado is None or not estado.get('em_streaming'):
+            return
+        self._atual.estado = None
+        self._somar(estado)
+
+    def _somar(self, estado):
+        duracao = time.perf_counter() - estado['inicio']
+        endpoint = estado['endpoint']
+
+        repetidas = [(sql, vezes) for sql, vezes in estado['formas'].items() if vezes > self.limite_n_mais_1]
+        for sql, vezes in repetidas:
+            logger.warning("Possível N+1 em %s: o mesmo comando rodou %d vezes na requisição: %s",
+                           endpoint, vezes, sql)
+
+        self.requisicoes.somar(f"{endpoint}|{estado['metodo']}|{estado['status']}")
+        self.duracao.observar(endpoint, duracao)
+        self.consultas.observar(endpoint, estado['consultas'])
+        self.tempo_banco.somar(endpoint, estado['tempo_banco'])
+        if repetidas:
+            self.n_mais_1.somar(endpoint)
+
+    def instalar(self, app, *engines):
+        for engine in engines:
+            self.observar_engine(engine)
+        app.before_request(self.iniciar_requisicao)
+        app.after_request(self.registrar_status)
+        app.teardown_request(self.finalizar_requisicao)
+
+    def exportar(self):
+        """Todas as métricas, de todos os workers, no formato texto do Prometheus."""
+        linhas = ['# HELP smartsell_http_requisicoes_total Requisições atendidas por endpoint, método e status.',
+                  '# TYPE smartsell_http_requisicoes_total counter']
+        for chave, total in self.requisicoes.itens():
+            endpoint, metodo, status = chave.split('|')
+            linhas.append(f'smartsell_http_requisicoes_total{{endpoint="{endpoint}",metodo="{metodo}",'
+                          f'status="{status}"}} {int(total)}')
+
+        linhas += ['# HELP smartsell_http_duracao_segundos Latência das requisições por endpoint.',
+                   '# TYPE smartsell_http_duracao_segundos histogram']
+        linhas += self.duracao.linhas('smartsell_http_duracao_segundos', 'endpoint')
+
+        linhas += ['# HELP smartsell_sql_consultas_por_requisicao Comandos SQL executados em cada requisição.',
+                   '# TYPE smartsell_sql_consultas_por_requisicao histogram']
+        linhas += self.consultas.linhas('smartsell_sql_consultas_por_requisicao', 'endpoint')
+
+        linhas += ['# HELP smartsell_sql_duracao_segundos_total Tempo gasto no banco por endpoint.',
+                   '# TYPE smartsell_sql_duracao_segundos_total counter']
+        for endpoint, segundos in self.tempo_banco.itens():
+            linhas.append(f'smartsell_sql_duracao_segundos_total{{endpoint="{endpoint}"}} {segundos}')
+
+        linhas += ['# HELP smartsell_n_mais_1_total Requisições em que um comando SQL se repetiu '
+                   f'mais de {self.limite_n_mais_1} vezes.',
+                   '# TYPE smartsell_n_mais_1_total counter']
+        for endpoint, total in self.n_mais_1.itens():
+            linhas.append(f'smartsell_n_mais_1_total{{endpoint="{endpoint}"}} {int(total)}')
+        return '\n'.join(linhas) + '\n'
+
+
+metricas = Metricas()
@@ -0,0 +1,256 @@
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import text, select, update, func, tuple_
+
+from banco import engine
+from models import (Base, Usuario, Produto, Pedido, PedidoItem, Movimento, Ingrediente, ProdutoIngrediente,
+                    ResumoVendaDiaria, ResumoVendaHoraria, ResumoVendaProduto, SaldoCaixa, Auditoria)
+from caixa import recalcular_checkpoints
+
+# A versão do schema fica no próprio arquivo do SQLite (PRAGMA user_version).
+# Cada migração roda na sua transação e precisa ser idempotente, porque num
+# banco novo o create_all já criou tudo o que ela faria.
+
+
+def _pedido_produto_opcional(conexao):
+    # Pedidos com vários itens não têm produto_id; o SQLite não altera
+    # NOT NULL de coluna, então a tabela é recriada
+    colunas = {linha[1]: linha for linha in conexao.execute(text("PRAGMA table_info(pedido)"))}
+    if not colunas or not colunas['produto_id'][3]:
+        return
+
+    conexao.execute(text("""
+        CREATE TABLE pedido_nova (
+            id INTEGER NOT NULL,
+            valor_total FLOAT NOT NULL,
+            quantidade INTEGER,
+            metodo_pagamento VARCHAR,
+            data DATETIME,
+            status VARCHAR,
+            usuario_id INTEGER NOT NULL,
+            produto_id INTEGER,
+            PRIMARY KEY (id),
+            FOREIGN KEY(usuario_id) REFERENCES usuario (id),
+            FOREIGN KEY(produto_id) REFERENCES produto (id)
+        )
+    """))
+    conexao.execute(text("""
+        INSERT INTO pedido_nova (id, valor_total, quantidade, metodo_pagamento, data, status, usuario_id, produto_id)
+        SELECT id, valor_total, quantidade, metodo_pagamento, data, status, usuario_id, produto_id FROM pedido
+    """))
+    conexao.execute(text("DROP TABLE pedido"))
+    conexao.execute(text("ALTER TABLE pedido_nova RENAME TO pedido"))
+
+
+def _indices_consultas(conexao):
+    indices = [
+        ("ix_pedido_usuario_id", "pedido", "usuario_id"),
+        ("ix_pedido_data", "pedido", "data"),
+        ("ix_pedido_status", "pedido", "status"),
+        ("ix_produto_status", "produto", "status"),
+        ("ix_produto_nome", "produto", "nome"),
+        ("ix_produtoIngrediente_produto_id", "produtoIngrediente", "produto_id"),
+        ("ix_produtoIngrediente_ingrediente_id", "produtoIngrediente", "ingrediente_id"),
+        ("ix_movimento_pedido_id", "movimento", "pedido_id"),
+        ("ix_pedido_item_pedido_id", "pedido_item", "pedido_id"),
+        ("ix_pedido_item_produto_id", "pedido_item", "produto_id"),
+    ]
+    for nome, tabela, coluna in indices:
+        conexao.execute(text(f'CREATE INDEX IF NOT EXISTS "{nome}" ON "{tabela}" ("{coluna}")'))
+
+
+def _saldo_caixa(conexao):
+    # Movimentos antigos recebem a data do pedido; os checkpoints do saldo
+    # são calculados de uma vez a partir deles
+    colunas = {linha[1] for linha in conexao.execute(text("PRAGMA table_info(movimento)"))}
+    if 'data' not in colunas:
+        conexao.execute(text("ALTER TABLE movimento ADD COLUMN data DATETIME"))
+    conexao.execute(text(
+        "UPDATE movimento SET data = (SELECT pedido.data FROM pedido WHERE pedido.id = movimento.pedido_id) "
+        "WHERE data IS NULL"
+    ))
+    conexao.execute(text('CREATE INDEX IF NOT EXISTS "ix_movimento_data" ON "movimento" ("data")'))
+    conexao.execute(text("""
+        CREATE TABLE IF NOT EXISTS saldo_caixa (
+            momento DATETIME NOT NULL,
+            saldo FLOAT NOT NULL,
+            PRIMARY KEY (momento)
+        )
+    """))
+    recalcular_checkpoints(conexao)
+
+
+def _busca_produtos(conexao):
+    # Índice FTS5 do cardápio (ver cardapio.buscar_produtos). Sem acento e sem
+    # diferença de maiúsculas; os triggers mantêm o índice em dia em qualquer
+    # caminho de escrita, inclusive fora da API
+    conexao.execute(text("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS produto_busca USING fts5(
+            nome, descricao, categoria,
+            content='produto', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+    """))
+    conexao.execute(text("""
+        CREATE TRIGGER IF NOT EXISTS produto_busca_inclusao AFTER INSERT ON produto BEGIN
+            INSERT INTO produto_busca (rowid, nome, descricao, categoria)
+            VALUES (new.id, new.nome, new.descricao, new.categoria);
+        END
+    """))
+    conexao.execute(text("""
+        CREATE TRIGGER IF NOT EXISTS produto_busca_exclusao AFTER DELETE ON produto BEGIN
+            INSERT INTO produto_busca (produto_busca, rowid, nome, descricao, categoria)
+            VALUES ('delete', old.id, old.nome, old.descricao, old.categoria);
+        END
+    """))
+    conexao.execute(text("""
+        CREATE TRIGGER IF NOT EXISTS produto_busca_alteracao AFTER UPDATE OF nome, descricao, categoria ON produto BEGIN
+            INSERT INTO produto_busca (produto_busca, rowid, nome, descricao, categoria)
+            VALUES ('delete', old.id, old.nome, old.descricao, old.categoria);
+            INSERT INTO produto_busca (rowid, nome, descricao, categoria)
+            VALUES (new.id, new.nome, new.descricao, new.categoria);
+        END
+    """))
+    conexao.execute(text("INSERT INTO produto_busca (produto_busca) VALUES ('rebuild')"))
+
+
+def _indice_historico(conexao):
+    conexao.execute(text(
+        'CREATE INDEX IF NOT EXISTS "ix_pedido_usuario_data" ON "pedido" ("usuario_id", "data", "id")'
+    ))
+
+
+def _auditoria(conexao):
+    conexao.execute(text("""
+        CREATE TABLE IF NOT EXISTS auditoria (
+            id INTEGER NOT NULL,
+            momento DATETIME NOT NULL,
+            usuario_id INTEGER,
+            usuario_email VARCHAR,
+            entidade VARCHAR NOT NULL,
+            entidade_id INTEGER NOT NULL,
+            campo VARCHAR NOT NULL,
+            valor_anterior FLOAT,
+            valor_novo FLOAT,
+            origem VARCHAR,
+            PRIMARY KEY (id)
+        )
+    """))
+    conexao.execute(text('CREATE INDEX IF NOT EXISTS "ix_auditoria_momento" ON "auditoria" ("momento")'))
+    conexao.execute(text('CREATE INDEX IF NOT EXISTS "ix_auditoria_usuario_id" ON "auditoria" ("usuario_id")'))
+    conexao.execute(text(
+        'CREATE INDEX IF NOT EXISTS "ix_auditoria_entidade" ON "auditoria" ("entidade", "entidade_id", "id")'
+    ))
+    # A trilha só cresce: UPDATE e DELETE são recusados pelo próprio banco
+    for operacao in ('UPDATE', 'DELETE'):
+        conexao.execute(text(f"""
+            CREATE TRIGGER IF NOT EXISTS auditoria_sem_{operacao.lower()} BEFORE {operacao} ON auditoria BEGIN
+                SELECT RAISE(ABORT, 'A auditoria só aceita inclusões.');
+            END
+        """))
+
+
+MIGRACOES = [
+    (1, "pedido.produto_id opcional", _pedido_produto_opcional),
+    (2, "índices das consultas dos endpoints", _indices_consultas),
+    (3, "data nos movimentos e checkpoints do saldo do caixa", _saldo_caixa),
+    (4, "busca textual no cardápio (FTS5)", _busca_produtos),
+    (5, "índice do histórico de pedidos por usuário", _indice_historico),
+    (6, "trilha de auditoria de estoque e preço", _auditoria),
+]
+
+
+def versao_atual(conexao):
+    return conexao.execute(text("PRAGMA user_version")).scalar()
+
+
+def migrar(engine=engine):
+    """Aplica, em ordem, as migrações com versão maior que a do banco."""
+    aplicadas = []
+    for versao, descricao, migracao in MIGRACOES:
+        with engine.begin() as conexao:
+            if versao_atual(conexao) >= versao:
+                continue
+            migracao(conexao)
+            conexao.execute(text(f"PRAGMA user_version = {int(versao)}"))
+        aplicadas.append((versao, descricao))
+    return aplicadas
+
+
+def consultas_endpoints():
+    # Filtros usados pelos endpoints; nenhum deles pode virar varredura completa
+    agora = datetime.utcnow()
+    return {
+        "login": select(Usuario).where(Usuario.email == "usuario@exemplo.com"),
+        "cadastro_ingrediente": select(Ingrediente).where(Ingrediente.nome == "Alface"),
+        "cadastro_cardapio": select(Produto).where(Produto.nome == "Pizza Calabresa"),
+        "cardapio": select(Produto).where(Produto.status == True),
+        "cardapio_receitas": select(ProdutoIngrediente).where(ProdutoIngrediente.produto_id.in_([1, 2, 3])),
+        "usos_ingrediente": select(ProdutoIngrediente.produto_id).where(ProdutoIngrediente.ingrediente_id == 1),
+        "pedidos_usuario": select(Pedido).where(Pedido.usuario_id == 1),
+        "pedidos_periodo": select(Pedido).where(Pedido.data >= agora - timedelta(days=1), Pedido.data < agora),
+        "pedidos_status": select(Pedido).where(Pedido.status == "pendente"),
+        "historico_pedidos": select(Pedido.id, Pedido.valor_total)
+        .where(Pedido.usuario_id == 1, tuple_(Pedido.data, Pedido.id) < tuple_(agora, 1000))
+        .order_by(Pedido.data.desc(), Pedido.id.desc()).limit(51),
+        "cardapio_pagina": select(Produto.id, Produto.nome)
+        .where(Produto.status == True, Produto.categoria == "Pizza", Produto.id > 100).order_by(Produto.id).limit(51),
+        "itens_pagina": select(Ingrediente.id, Ingrediente.nome)
+        .where(Ingrediente.id > 100).order_by(Ingrediente.id).limit(51),
+        "itens_pedido": select(PedidoItem).where(PedidoItem.pedido_id == 1),
+        "movimentos_pedido": select(Movimento).where(Movimento.pedido_id == 1),
+        "saldo_checkpoint": select(SaldoCaixa).where(SaldoCaixa.momento <= agora)
+        .order_by(SaldoCaixa.momento.desc()).limit(1),
+        "saldo_cauda": select(func.sum(Movimento.valor_total))
+        .where(Movimento.data >= agora - timedelta(days=1), Movimento.data <= agora),
+        "baixa_estoque": update(Ingrediente).where(Ingrediente.id.in_(
+            select(ProdutoIngrediente.ingrediente_id)
+            .join(PedidoItem, PedidoItem.produto_id == ProdutoIngrediente.produto_id)
+            .where(PedidoItem.pedido_id == 1)
+        )).values(quantidade_estoque=Ingrediente.quantidade_estoque - 1),
+        "auditoria_entidade": select(Auditoria).where(Auditoria.entidade == "ingrediente", Auditoria.entidade_id == 1)
+        .order_by(Auditoria.id.desc()).limit(51),
+        "auditoria_usuario": select(Auditoria).where(Auditoria.usuario_id == 1, Auditoria.id < 1000)
+        .order_by(Auditoria.id.desc()).limit(51),
+        "auditoria_periodo": select(Auditoria).where(Auditoria.momento >= agora - timedelta(days=1)),
+        "relatorio_diario": select(ResumoVendaDiaria).where(ResumoVendaDiaria.dia >= agora.date()),
+        "relatorio_horario": select(ResumoVendaHoraria).where(ResumoVendaHoraria.hora >= agora),
+        "relatorio_produtos": select(ResumoVendaProduto.produto_id, func.sum(ResumoVendaProduto.receita))
+        .where(ResumoVendaProduto.dia >= agora.date()).group_by(ResumoVendaProduto.produto_id),
+    }
+
+
+# Varreduras aceitas de propósito: consulta -> tabelas que ela pode percorrer
+# inteiras. Um SCAN "USING INDEX" continua lendo o índice todo, então só
+# passa se estiver aqui.
+VARREDURAS_PERMITIDAS = {}
+
+
+def verificar_planos(engine=engine, consultas=None, permitidas=VARREDURAS_PERMITIDAS):
+    """Roda EXPLAIN QUERY PLAN nas consultas dos endpoints e devolve as que fazem varredura completa."""
+    falhas = {}
+    with engine.connect() as conexao:
+        for nome, consulta in (consultas or consultas_endpoints()).items():
+            sql = consulta.compile(engine, compile_kwargs={"literal_binds": True})
+            plano = [linha[3] for linha in conexao.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+            varreduras = [passo for passo in plano
+                          if passo.startswith("SCAN ") and passo.split()[1] not in permitidas.get(nome, ())]
+            if varreduras:
+                falhas[nome] = varreduras
+    return falhas
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] == ['verificar']:
+        falhas = verificar_planos()
+        for nome, varreduras in falhas.items():
+            print(f"{nome}: {'; '.join(varreduras)}")
+        if falhas:
+            sys.exit(1)
+        print("Nenhuma consulta dos endpoints faz varredura completa.")
+    else:
+        Base.metadata.create_all(engine)
+        for versao, descricao in migrar():
+            print(f"Migração {versao} aplicada: {descricao}")
+        print(f"Banco na versão {MIGRACOES[-1][0]}.")
@@ -1,11 +1,10 @@
 from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, String, ForeignKey, Float, DateTime, Boolean
-from sqlalchemy.orm import relationship, sessionmaker, scoped_session
+from sqlalchemy import Column, Integer, String, ForeignKey, Float, DateTime, Date, Boolean, Index
+from sqlalchemy.orm import relationship
 from sqlalchemy.orm import declarative_base
-from werkzeug.security import generate_password_hash, check_password_hash
 
-engine = create_engine('sqlite:///SmartSell.sqlite3')
-local_session = sessionmaker(bind=engine)
+import senhas
+from banco import engine
 
 Base = declarative_base()
 
@@ -21,11 +20,15 @@ class Usuario(Base): #TÁ PRONTO
 
     pedidos = relationship("Pedido", back_populates="usuario")
 
+    # O hash é calculado no pool de processos de senhas.py
     def set_senha_hash(self, senha):
-        self.senha_hash = generate_password_hash(senha)
+        self.senha_hash = senhas.gerar_hash(senha)
 
     def check_senha(self, senha):
-        return check_password_hash(self.senha_hash, senha)
+        return senhas.verificar_senha(self.senha_hash, senha)
+
+    def precisa_rehash(self):
+        return senhas.precisa_rehash(self.senha_hash)
 
     def __repr__(self):
         return f'<Usuario(id={self.id}, nome={self.nome}, telefone={self.telefone}, email={self.email}, papel={self.papel})>'
@@ -61,11 +64,11 @@ class Usuario(Base): #TÁ PRONTO
 class Produto(Base): #TÁ PRONTO
     __tablename__ = 'produto'
     id = Column(Integer, primary_key=True)
-    nome = Column(String, nullable=False)
+    nome = Column(String, nullable=False, index=True)
     descricao = Column(String)
     preco = Column(Float, nullable=False)
     categoria = Column(String, nullable=False)
-    status = Column(Boolean, default=True)
+    status = Column(Boolean, default=True, index=True)
 
     pedidos = relationship("Pedido", back_populates="produto")
     ingredientes_necessarios = relationship("ProdutoIngrediente", back_populates="produto")
@@ -102,19 +105,23 @@ class Produto(Base): #TÁ PRONTO
 
 class Pedido(Base): #TÁ PRONTO
     __tablename__ = 'pedido'
+    # Histórico paginado do usuário, do mais recente ao mais antigo
+    __table_args__ = (Index('ix_pedido_usuario_data', 'usuario_id', 'data', 'id'),)
     id = Column(Integer, primary_key=True)
     valor_total = Column(Float, nullable=False)
     quantidade = Column(Integer, default=1)
     metodo_pagamento = Column(String)
-    data = Column(DateTime, default=datetime.utcnow)
-    status = Column(String, default="pendente")
+    data = Column(DateTime, default=datetime.utcnow, index=True)
+    status = Column(String, default="pendente", index=True)
 
-    usuario_id = Column(Integer, ForeignKey('usuario.id'), nullable=False)
-    produto_id = Column(Integer, ForeignKey('produto.id'), nullable=False)
+    usuario_id = Column(Integer, ForeignKey('usuario.id'), nullable=False, index=True)
+    # Só preenchido em pedidos de um único produto; os itens ficam em PedidoItem
+    produto_id = Column(Integer, ForeignKey('produto.id'), nullable=True)
 
     usuario = relationship("Usuario", back_populates="pedidos")
     produto = relationship("Produto", back_populates="pedidos")
     movimentos = relationship("Movimento", back_populates="pedido")  # <-- corrigido aqui
+    itens = relationship("PedidoItem", back_populates="pedido")
 
     def __repr__(self):
         return (f'<Pedido(id={self.id}, usuario={self.usuario.nome if self.usuario else None}, '
@@ -131,6 +138,49 @@ class Pedido(Base): #TÁ PRONTO
             "metodo_pagamento": self.metodo_pagamento,
             "data": self.data.isoformat(),
             "status": self.status,
+            "valor_total": self.valor_total,
+            "itens": [item.serialize() for item in self.itens]
+        }
+
+    def save(self, db_session):
+        try:
+            db_session.add(self)
+            db_session.commit()
+        except Exception as e:
+            db_session.rollback()
+            raise e
+
+    def delete(self, db_session):
+        try:
+            db_session.delete(self)
+            db_session.commit()
+        except Exception as e:
+            db_session.rollback()
+            raise e
+
+
+class PedidoItem(Base):
+    __tablename__ = 'pedido_item'
+    id = Column(Integer, primary_key=True)
+    pedido_id = Column(Integer, ForeignKey('pedido.id'), nullable=False, index=True)
+    produto_id = Column(Integer, ForeignKey('produto.id'), nullable=False, index=True)
+    quantidade = Column(Integer, nullable=False, default=1)
+    preco_unitario = Column(Float, nullable=False)
+    valor_total = Column(Float, nullable=False)
+
+    pedido = relationship("Pedido", back_populates="itens")
+    produto = relationship("Produto")
+
+    def __repr__(self):
+        return (f'<PedidoItem(id={self.id}, pedido={self.pedido_id}, produto={self.produto_id}, '
+                f'quantidade={self.quantidade}, valor_total={self.valor_total})>')
+
+    def serialize(self):
+        return {
+            "id": self.id,
+            "produto_id": self.produto_id,
+            "quantidade": self.quantidade,
+            "preco_unitario": self.preco_unitario,
             "valor_total": self.valor_total
         }
 
@@ -154,15 +204,17 @@ class Pedido(Base): #TÁ PRONTO
 class Movimento(Base): #TÁ PRONTO
     __tablename__ = 'movimento'
     id = Column(Integer, primary_key=True)
-    pedido_id = Column(Integer, ForeignKey('pedido.id'), nullable=False)
+    pedido_id = Column(Integer, ForeignKey('pedido.id'), nullable=False, index=True)
     valor_total = Column(Float, nullable=False)
     entrada = Column(Boolean, default=False)
     saida = Column(Boolean, default=False)
+    # Quando o dinheiro entrou ou saiu (num pedido, a data do pedido)
+    data = Column(DateTime, default=datetime.utcnow, index=True)
 
     pedido = relationship("Pedido", back_populates="movimentos")  # <-- corrigido aqui
 
     def __repr__(self):
-        return f'<Movimento(id={self.id}, pedido={self.pedido_id}, valor={self.valor_total}, entrada={self.entrada}, saida={self.saida})>'
+        return f'<Movimento(id={self.id}, pedido={self.pedido_id}, valor={self.valor_total}, entrada={self.entrada}, saida={self.saida}, data={self.data})>'
 
     def serialize(self):
         return {
@@ -170,7 +222,8 @@ class Movimento(Base): #TÁ PRONTO
             "pedido_id": self.pedido_id,
             "valor_total": self.valor_total,
             "entrada": self.entrada,
-            "saida": self.saida
+            "saida": self.saida,
+            "data": self.data.isoformat() if self.data else None
         }
 
     def save(self, db_session):
@@ -230,8 +283,8 @@ class ProdutoIngrediente(Base):
     __tablename__ = 'produtoIngrediente'
     id = Column(Integer, primary_key=True)
 
-    produto_id = Column(Integer, ForeignKey('produto.id'), nullable=False)
-    ingrediente_id = Column(Integer, ForeignKey('ingrediente.id'), nullable=False)
+    produto_id = Column(Integer, ForeignKey('produto.id'), nullable=False, index=True)
+    ingrediente_id = Column(Integer, ForeignKey('ingrediente.id'), nullable=False, index=True)
 
     quantidade_necessaria = Column(Float, nullable=False)  # quanto do produto é necessário
 
@@ -265,11 +318,129 @@ class ProdutoIngrediente(Base):
             raise e
 
 
+# Resumos de vendas pré-agregados: atualizados a cada pedido gravado (ver
+# resumos.py) e lidos pelos relatórios no lugar de um GROUP BY no histórico
+class ResumoVendaDiaria(Base):
+    __tablename__ = 'resumo_venda_diaria'
+    dia = Column(Date, primary_key=True)
+    pedidos = Column(Integer, nullable=False, default=0)
+    unidades = Column(Integer, nullable=False, default=0)
+    receita = Column(Float, nullable=False, default=0)
+    entradas = Column(Float, nullable=False, default=0)
+    saidas = Column(Float, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ResumoVendaDiaria(dia={self.dia}, pedidos={self.pedidos}, receita={self.receita})>'
+
+    def serialize(self):
+        return {
+            "dia": self.dia.isoformat(),
+            "pedidos": self.pedidos,
+            "unidades": self.unidades,
+            "receita": round(self.receita, 2),
+            "entradas": round(self.entradas, 2),
+            "saidas": round(self.saidas, 2)
+        }
+
+
+class ResumoVendaHoraria(Base):
+    __tablename__ = 'resumo_venda_horaria'
+    hora = Column(DateTime, primary_key=True)
+    pedidos = Column(Integer, nullable=False, default=0)
+    unidades = Column(Integer, nullable=False, default=0)
+    receita = Column(Float, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ResumoVendaHoraria(hora={self.hora}, pedidos={self.pedidos}, receita={self.receita})>'
+
+    def serialize(self):
+        return {
+            "hora": self.hora.isoformat(),
+            "pedidos": self.pedidos,
+            "unidades": self.unidades,
+            "receita": round(self.receita, 2)
+        }
+
+
+class ResumoVendaProduto(Base):
+    __tablename__ = 'resumo_venda_produto'
+    dia = Column(Date, primary_key=True)
+    produto_id = Column(Integer, ForeignKey('produto.id'), primary_key=True)
+    unidades = Column(Integer, nullable=False, default=0)
+    receita = Column(Float, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ResumoVendaProduto(dia={self.dia}, produto={self.produto_id}, receita={self.receita})>'
+
+    def serialize(self):
+        return {
+            "dia": self.dia.isoformat(),
+            "produto_id": self.produto_id,
+            "unidades": self.unidades,
+            "receita": round(self.receita, 2)
+        }
+
+
+# Saldo acumulado do caixa no início de cada dia com movimento, mantido a cada
+# movimento gravado (ver caixa.py)
+class SaldoCaixa(Base):
+    __tablename__ = 'saldo_caixa'
+    momento = Column(DateTime, primary_key=True)
+    saldo = Column(Float, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<SaldoCaixa(momento={self.momento}, saldo={self.saldo})>'
+
+    def serialize(self):
+        return {
+            "momento": self.momento.isoformat(),
+            "saldo": round(self.saldo, 2)
+        }
+
+
+# Trilha das alterações de estoque e preço: só recebe INSERT (ver auditoria.py)
+class Auditoria(Base):
+    __tablename__ = 'auditoria'
+    # Histórico de um ingrediente ou produto, do mais recente ao mais antigo
+    __table_args__ = (Index('ix_auditoria_entidade', 'entidade', 'entidade_id', 'id'),)
+    id = Column(Integer, primary_key=True)
+    momento = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    # Sem ForeignKey: o registro continua valendo se o usuário for excluído
+    usuario_id = Column(Integer, index=True)
+    usuario_email = Column(String)
+    entidade = Column(String, nullable=False)  # "ingrediente" ou "produto"
+    entidade_id = Column(Integer, nullable=False)
+    campo = Column(String, nullable=False)
+    valor_anterior = Column(Float)
+    valor_novo = Column(Float)
+    origem = Column(String)  # endpoint que fez a alteração
+
+    def __repr__(self):
+        return (f'<Auditoria(id={self.id}, {self.entidade}={self.entidade_id}, {self.campo}: '
+                f'{self.valor_anterior} -> {self.valor_novo}, usuario={self.usuario_id})>')
+
+    def serialize(self):
+        return {
+            "id": self.id,
+            "momento": self.momento.isoformat(),
+            "usuario_id": self.usuario_id,
+            "usuario_email": self.usuario_email,
+            "entidade": self.entidade,
+            "entidade_id": self.entidade_id,
+            "campo": self.campo,
+            "valor_anterior": self.valor_anterior,
+            "valor_novo": self.valor_novo,
+            "origem": self.origem
+        }
 
 
 def init_db():
     Base.metadata.create_all(engine)
 
+    # Bancos já existentes recebem o que o create_all não altera (índices, colunas)
+    from migracoes import migrar
+    migrar(engine)
+
 
 if __name__ == '__main__':
     init_db()
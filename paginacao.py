@@ -0,0 +1,111 @@
+import base64
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import DateTime, tuple_
+
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 500
+
+# Parâmetros que fazem /itens e /cardapio responderem paginados
+PARAMETROS_PAGINACAO = ('limit', 'after', 'fields')
+
+
+def codificar_cursor(valores):
+    texto = json.dumps([valor.isoformat() if isinstance(valor, datetime) else valor for valor in valores])
+    return base64.urlsafe_b64encode(texto.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor, chaves):
+    # O cursor é opaco para o cliente: os valores das chaves da última linha
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(valores, list) or len(valores) != len(chaves):
+            raise ValueError
+        return [datetime.fromisoformat(valor) if isinstance(chave.type, DateTime) else int(valor)
+                for chave, valor in zip(chaves, valores)]
+    except (ValueError, TypeError):
+        raise ValueError("Cursor 'after' inválido.")
+
+
+def ler_limite(args, padrao=LIMITE_PADRAO):
+    """Lê ?limit= da query string (1 a LIMITE_MAXIMO)."""
+    try:
+        limite = int(args.get('limit', padrao))
+    except ValueError:
+        raise ValueError("limit deve ser um número inteiro.")
+    if not 1 <= limite <= LIMITE_MAXIMO:
+        raise ValueError(f"limit deve estar entre 1 e {LIMITE_MAXIMO}.")
+    return limite
+
+
+def ler_pagina(args, campos_validos, campos_padrao):
+    """Lê limit e fields da query string; devolve (limite, campos)."""
+    limite = ler_limite(args)
+
+    campos = campos_padrao
+    if args.get('fields'):
+        campos = [campo.strip() for campo in args['fields'].split(',') if campo.strip()]
+        invalidos = [campo for campo in campos if campo not in campos_validos]
+        if invalidos or not campos:
+            raise ValueError(f"Campos inválidos: {', '.join(invalidos) or '-'}. Use: {', '.join(campos_validos)}.")
+    return limite, campos
+
+
+def ler_booleano(valor, nome):
+    if valor is None or valor == '':
+        return None
+    if valor.lower() in ('true', '1', 'sim'):
+        return True
+    if valor.lower() in ('false', '0', 'nao', 'não'):
+        return False
+    raise ValueError(f"{nome} deve ser true ou false.")
+
+
+def ler_intervalo(inicio, fim):
+    """Converte ?inicio=&fim= (ISO 8601) em (inicio, fim exclusivo); uma data sem hora no fim vale o dia inteiro."""
+    try:
+        inicio = datetime.fromisoformat(inicio) if inicio else None
+        if fim:
+            fim_data = datetime.fromisoformat(fim)
+            fim = fim_data + timedelta(days=1) if len(fim) == 10 else fim_data + timedelta(microseconds=1)
+        else:
+            fim = None
+    except ValueError:
+        raise ValueError("Datas inválidas. Use o formato ISO 8601.")
+    return inicio, fim
+
+
+def paginar(db_session, consulta, chaves, limite, cursor=None, decrescente=False):
+    """Executa `consulta` como uma página keyset e devolve (linhas, próximo cursor).
+
+    `chaves` são as colunas da ordenação, únicas em conjunto (a última é
+    sempre o id). A página seguinte começa depois da última linha desta com
+    um WHERE sobre as chaves, então o custo não cresce com a página, ao
+    contrário de OFFSET. As linhas voltam como dicts só com as colunas da
+    consulta.
+    """
+    nomes = [coluna.key for coluna in consulta.selected_columns]
+    rotulos = [chave.label(f"_chave_{indice}") for indice, chave in enumerate(chaves)]
+    consulta = consulta.add_columns(*rotulos)
+
+    if cursor:
+        valores = decodificar_cursor(cursor, chaves)
+        if len(chaves) == 1:
+            condicao = chaves[0] < valores[0] if decrescente else chaves[0] > valores[0]
+        else:
+            condicao = tuple_(*chaves) < tuple_(*valores) if decrescente else tuple_(*chaves) > tuple_(*valores)
+        consulta = consulta.where(condicao)
+    consulta = consulta.order_by(*[chave.desc() if decrescente else chave for chave in chaves]).limit(limite + 1)
+
+    linhas = db_session.execute(consulta).all()
+    proximo = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        proximo = codificar_cursor(list(linhas[-1][len(nomes):]))
+
+    return [{nome: _valor_json(valor) for nome, valor in zip(nomes, linha)} for linha in linhas], proximo
+
+
+def _valor_json(valor):
+    return valor.isoformat() if isinstance(valor, datetime) else valor
@@ -0,0 +1,416 @@
+import json
+from datetime import datetime
+
+from sqlalchemy import select, update, insert, func
+
+from models import Usuario, Produto, Pedido, PedidoItem, Movimento, Ingrediente, ProdutoIngrediente
+from disponibilidade import registrar_estoque
+from resumos import acumular_vendas
+from caixa import registrar_movimentos
+from eventos import canal_pedidos
+from paginacao import paginar
+
+
+class EstoqueInsuficiente(Exception):
+    pass
+
+
+# Pedidos gravados por transação na importação em lote
+TAMANHO_BLOCO_LOTE = 200
+
+# Etapas do pedido na cozinha, na ordem
+STATUS_PEDIDO = ('pendente', 'em_preparo', 'pronto', 'entregue')
+
+# Campos aceitos em ?fields= no histórico de pedidos
+COLUNAS_HISTORICO = ('id', 'valor_total', 'quantidade', 'metodo_pagamento', 'data', 'status', 'usuario_id')
+CAMPOS_HISTORICO = COLUNAS_HISTORICO + ('itens',)
+CAMPOS_HISTORICO_PADRAO = ('id', 'valor_total', 'quantidade', 'metodo_pagamento', 'data', 'status', 'itens')
+
+
+def ler_itens(data):
+    # Aceita a lista "itens" ou o formato antigo com produto_id/quantidade no corpo
+    itens = data.get('itens')
+    if itens is None:
+        itens = [{"produto_id": data.get('produto_id'), "quantidade": data.get('quantidade', 1)}]
+
+    if not isinstance(itens, list) or not itens:
+        raise ValueError("O campo 'itens' deve ser uma lista com pelo menos um item.")
+
+    linhas = []
+    for item in itens:
+        if not isinstance(item, dict) or not item.get('produto_id'):
+            raise ValueError("Cada item precisa de produto_id e quantidade.")
+        try:
+            produto_id = int(item['produto_id'])
+            quantidade = int(item.get('quantidade', 1))
+        except (TypeError, ValueError):
+            raise ValueError("produto_id ou quantidade inválidos.")
+        if quantidade <= 0:
+            raise ValueError("Quantidade deve ser maior que zero.")
+        linhas.append((produto_id, quantidade))
+    return linhas
+
+
+def agrupar_itens(itens):
+    # Junta linhas repetidas do mesmo produto: {produto_id: quantidade}
+    quantidades = {}
+    for produto_id, quantidade in itens:
+        quantidades[produto_id] = quantidades.get(produto_id, 0) + quantidade
+    return quantidades
+
+
+def registrar_pedido(db_session, usuario_id, itens, metodo_pagamento=None):
+    """Grava a comanda inteira, a entrada no caixa e a baixa de estoque numa única transação.
+
+    `itens` é uma lista de (produto_id, quantidade). As linhas entram com um
+    único INSERT em lote e a baixa dos ingredientes de todas elas é um único
+    UPDATE com a condição de estoque suficiente no próprio WHERE: se alguma
+    linha da receita ficar de fora, o pedido inteiro é desfeito e
+    EstoqueInsuficiente é lançada.
+    """
+    quantidades = agrupar_itens(itens)
+    if not quantidades:
+        raise ValueError("O pedido deve conter pelo menos um item.")
+
+    usuario = db_session.execute(
+        select(Usuario.id).where(Usuario.id == usuario_id, Usuario.status == True)
+    ).scalar()
+    if not usuario:
+        raise ValueError(f"Usuário com id {usuario_id} não encontrado.")
+
+    produtos = db_session.execute(
+        select(Produto.id, Produto.preco, Produto.nome).where(Produto.id.in_(list(quantidades)), Produto.status == True)
+    ).all()
+    precos = {produto.id: produto.preco for produto in produtos}
+    nomes = {produto.id: produto.nome for produto in produtos}
+    for produto_id in quantidades:
+        if produto_id not in precos:
+            raise ValueError(f"Produto com id {produto_id} não encontrado.")
+
+    linhas = [{
+        "produto_id": produto_id,
+        "quantidade": quantidade,
+        "preco_unitario": precos[produto_id],
+        "valor_total": round(precos[produto_id] * quantidade, 2)
+    } for produto_id, quantidade in quantidades.items()]
+    valor_total = round(sum(linha["valor_total"] for linha in linhas), 2)
+
+    try:
+        # Primeira escrita da transação: já pega o lock de escrita do SQLite,
+        # então dois caixas nunca baixam o mesmo estoque ao mesmo tempo
+        pedido = Pedido(
+            usuario_id=usuario_id,
+            produto_id=linhas[0]["produto_id"] if len(linhas) == 1 else None,
+            quantidade=sum(quantidades.values()),
+            metodo_pagamento=metodo_pagamento,
+            valor_total=valor_total,
+            data=datetime.utcnow()
+        )
+        db_session.add(pedido)
+        db_session.flush()  # para obter o ID
+
+        for linha in linhas:
+            linha["pedido_id"] = pedido.id
+        db_session.execute(insert(PedidoItem), linhas)
+
+        ingredientes_usados = (
+            select(ProdutoIngrediente.ingrediente_id)
+            .join(PedidoItem, PedidoItem.produto_id == ProdutoIngrediente.produto_id)
+            .where(PedidoItem.pedido_id == pedido.id)
+        )
+        consumo = (
+            select(func.sum(ProdutoIngrediente.quantidade_necessaria * PedidoItem.quantidade))
+            .join(PedidoItem, PedidoItem.produto_id == ProdutoIngrediente.produto_id)
+            .where(PedidoItem.pedido_id == pedido.id,
+                   ProdutoIngrediente.ingrediente_id == Ingrediente.id)
+            .scalar_subquery()
+        )
+        baixa = db_session.execute(
+            update(Ingrediente)
+            .where(Ingrediente.id.in_(ingredientes_usados), Ingrediente.quantidade_estoque >= consumo)
+            .values(quantidade_estoque=Ingrediente.quantidade_estoque - consumo)
+            .returning(Ingrediente.id, Ingrediente.quantidade_estoque, Ingrediente.status)
+            .execution_options(synchronize_session=False, estoque_registrado=True)
+        ).all()
+        esperado = db_session.execute(
+            select(func.count(func.distinct(ingredientes_usados.subquery().c.ingrediente_id)))
+        ).scalar()
+        if len(baixa) != esperado:
+            raise EstoqueInsuficiente("Estoque insuficiente para atender o pedido.")
+        registrar_estoque(db_session, baixa)
+
+        movimento = {"pedido_id": pedido.id, "valor_total": valor_total, "entrada": True, "saida": False,
+                     "data": pedido.data}
+        registrar_movimentos(db_session, [movimento])
+        db_session.add(Movimento(**movimento))
+        acumular_vendas(db_session, [(pedido.data, pedido.quantidade, valor_total,
+                                      [(linha["produto_id"], linha["quantidade"], linha["valor_total"]) for linha in linhas])])
+        db_session.commit()
+    except Exception:
+        db_session.rollback()
+        raise
+
+    # Telas da cozinha (GET /pedidos/eventos)
+    canal_pedidos.publicar('pedido_criado', _evento_pedido(pedido.id, usuario_id, pedido.status, pedido.data,
+                                                           linhas, nomes))
+    return pedido
+
+
+def _evento_pedido(pedido_id, usuario_id, status, data, linhas, nomes):
+    # Dados do evento pedido_criado enviado às telas da cozinha
+    return {
+        "id": pedido_id,
+        "usuario_id": usuario_id,
+        "status": status,
+        "data": data.isoformat(),
+        "itens": [{"produto_id": linha["produto_id"], "nome": nomes[linha["produto_id"]],
+                   "quantidade": linha["quantidade"]} for linha in linhas]
+    }
+
+
+def alterar_status(db_session, pedido_id, status):
+    """Muda a etapa do pedido e avisa as telas da cozinha; None se o pedido não existe."""
+    if status not in STATUS_PEDIDO:
+        raise ValueError(f"Status inválido. Use um destes: {', '.join(STATUS_PEDIDO)}.")
+
+    try:
+        pedido = db_session.execute(
+            update(Pedido)
+            .where(Pedido.id == pedido_id)
+            .values(status=status)
+            .returning(Pedido.id, Pedido.status)
+            .execution_options(synchronize_session=False)
+        ).first()
+        db_session.commit()
+    except Exception:
+        db_session.rollback()
+        raise
+
+    if pedido is None:
+        return None
+    canal_pedidos.publicar('pedido_status', {"id": pedido.id, "status": pedido.status})
+    return {"id": pedido.id, "status": pedido.status}
+
+
+def historico_pedidos(db_session, usuario_id, limite, cursor, campos, inicio=None, fim=None, status=None):
+    """Uma página dos pedidos do usuário, do mais recente ao mais antigo; devolve (pedidos, próximo cursor).
+
+    Percorre o índice (usuario_id, data, id), então qualquer página custa o
+    mesmo. Os itens, se pedidos em `campos`, vêm numa consulta para a página.
+    """
+    colunas = [campo for campo in COLUNAS_HISTORICO if campo in campos or campo == 'id']
+    consulta = select(*[getattr(Pedido, coluna) for coluna in colunas]).where(Pedido.usuario_id == usuario_id)
+    if inicio:
+        consulta = consulta.where(Pedido.data >= inicio)
+    if fim:
+        consulta = consulta.where(Pedido.data < fim)
+    if status:
+        consulta = consulta.where(Pedido.status == status)
+    pedidos, proximo = paginar(db_session, consulta, [Pedido.data, Pedido.id], limite, cursor, decrescente=True)
+
+    if 'itens' in campos and pedidos:
+        itens = {}
+        for item in db_session.execute(
+                select(PedidoItem).where(PedidoItem.pedido_id.in_([pedido['id'] for pedido in pedidos]))
+        ).scalars():
+            itens.setdefault(item.pedido_id, []).append(item.serialize())
+        for pedido in pedidos:
+            pedido['itens'] = itens.get(pedido['id'], [])
+    if 'id' not in campos:
+        for pedido in pedidos:
+            del pedido['id']
+    return pedidos, proximo
+
+
+def ler_lote(texto, ndjson=False):
+    """Converte o corpo da requisição numa lista de pedidos (dict) ou erros (ValueError).
+
+    Aceita um array JSON ou JSON por linha (NDJSON). No NDJSON cada linha é
+    lida separadamente, então uma linha corrompida não invalida as outras.
+    """
+    if not ndjson:
+        try:
+            pedidos = json.loads(texto)
+        except ValueError:
+            raise ValueError("Corpo inválido: envie um array JSON ou NDJSON.")
+        if not isinstance(pedidos, list):
+            raise ValueError("Corpo inválido: envie um array JSON ou NDJSON.")
+        return pedidos
+
+    pedidos = []
+    for numero, linha in enumerate(texto.splitlines(), start=1):
+        if not linha.strip():
+            continue
+        try:
+            pedidos.append(json.loads(linha))
+        except ValueError:
+            pedidos.append(ValueError(f"Linha {numero} não é um JSON válido."))
+    return pedidos
+
+
+def _validar_pedido_lote(data, usuarios, precos):
+    if isinstance(data, Exception):
+        raise data
+    if not isinstance(data, dict):
+        raise ValueError("Cada pedido deve ser um objeto JSON.")
+
+    try:
+        usuario_id = int(data.get('usuario_id'))
+    except (TypeError, ValueError):
+        raise ValueError("usuario_id é obrigatório.")
+    if usuario_id not in usuarios:
+        raise ValueError(f"Usuário com id {usuario_id} não encontrado.")
+
+    quantidades = agrupar_itens(ler_itens(data))
+    for produto_id in quantidades:
+        if produto_id not in precos:
+            raise ValueError(f"Produto com id {produto_id} não encontrado.")
+
+    # Horário em que o terminal registrou a venda, se veio da fila offline
+    data_pedido = data.get('data')
+    if data_pedido:
+        try:
+            data_pedido = datetime.fromisoformat(str(data_pedido))
+        except ValueError:
+            raise ValueError("Data do pedido inválida. Use o formato ISO 8601.")
+    else:
+        data_pedido = datetime.utcnow()
+
+    linhas = [{
+        "produto_id": produto_id,
+        "quantidade": quantidade,
+        "preco_unitario": precos[produto_id],
+        "valor_total": round(precos[produto_id] * quantidade, 2)
+    } for produto_id, quantidade in quantidades.items()]
+
+    pedido = {
+        "usuario_id": usuario_id,
+        "produto_id": linhas[0]["produto_id"] if len(linhas) == 1 else None,
+        "quantidade": sum(quantidades.values()),
+        "metodo_pagamento": data.get('metodo_pagamento'),
+        "valor_total": round(sum(linha["valor_total"] for linha in linhas), 2),
+        "data": data_pedido,
+        "status": "pendente"
+    }
+    return pedido, linhas
+
+
+def _ids_referenciados(pedidos):
+    usuarios, produtos = set(), set()
+    for data in pedidos:
+        if not isinstance(data, dict):
+            continue
+        try:
+            usuarios.add(int(data.get('usuario_id')))
+        except (TypeError, ValueError):
+            pass
+        try:
+            produtos.update(produto_id for produto_id, _ in ler_itens(data))
+        except ValueError:
+            pass
+    return usuarios, produtos
+
+
+def registrar_lote(db_session, pedidos, tamanho_bloco=TAMANHO_BLOCO_LOTE):
+    """Importa pedidos em lote (sincronização dos terminais offline).
+
+    Usuários e preços são carregados uma única vez para o lote inteiro; os
+    pedidos válidos são gravados com executemany em transações de
+    `tamanho_bloco` pedidos. Retorna um resultado por pedido, na ordem de
+    entrada, para que um pedido inválido não derrube o lote.
+
+    Como são vendas que já aconteceram, a baixa de estoque não recusa
+    pedidos: o consumo do bloco é abatido num único UPDATE, sem deixar o
+    estoque negativo. Depois do commit de cada bloco os pedidos dele vão,
+    de uma vez, para as telas da cozinha.
+    """
+    ids_usuarios, ids_produtos = _ids_referenciados(pedidos)
+    usuarios = set(db_session.execute(
+        select(Usuario.id).where(Usuario.id.in_(ids_usuarios), Usuario.status == True)
+    ).scalars()) if ids_usuarios else set()
+    produtos = db_session.execute(
+        select(Produto.id, Produto.preco, Produto.nome).where(Produto.id.in_(ids_produtos), Produto.status == True)
+    ).all() if ids_produtos else []
+    precos = {produto.id: produto.preco for produto in produtos}
+    nomes = {produto.id: produto.nome for produto in produtos}
+
+    resultados = [None] * len(pedidos)
+    validos = []
+    for indice, data in enumerate(pedidos):
+        try:
+            validos.append((indice,) + _validar_pedido_lote(data, usuarios, precos))
+        except ValueError as e:
+            resultados[indice] = {"indice": indice, "status": "erro", "msg": str(e)}
+
+    for inicio in range(0, len(validos), tamanho_bloco):
+        bloco = validos[inicio:inicio + tamanho_bloco]
+        try:
+            ids = _gravar_bloco(db_session, bloco)
+        except Exception as e:
+            db_session.rollback()
+            for indice, _, _ in bloco:
+                resultados[indice] = {"indice": indice, "status": "erro", "msg": f"Erro ao gravar pedido: {str(e)}"}
+            continue
+
+        for (indice, _, _), pedido_id in zip(bloco, ids):
+            resultados[indice] = {"indice": indice, "status": "ok", "pedido_id": pedido_id}
+        canal_pedidos.publicar_varios('pedido_criado', [
+            _evento_pedido(pedido_id, pedido["usuario_id"], pedido["status"], pedido["data"], linhas, nomes)
+            for (_, pedido, linhas), pedido_id in zip(bloco, ids)
+        ])
+
+    return resultados
+
+
+def _gravar_bloco(db_session, bloco):
+    ids = _inserir_pedidos(db_session, [pedido for _, pedido, _ in bloco])
+
+    itens, movimentos = [], []
+    for (_, pedido, linhas), pedido_id in zip(bloco, ids):
+        itens.extend(dict(linha, pedido_id=pedido_id) for linha in linhas)
+        movimentos.append({"pedido_id": pedido_id, "valor_total": pedido["valor_total"],
+                           "entrada": True, "saida": False, "data": pedido["data"]})
+    db_session.execute(insert(PedidoItem), itens)
+    registrar_movimentos(db_session, movimentos)
+    db_session.execute(insert(Movimento), movimentos)
+
+    consumo = (
+        select(func.sum(ProdutoIngrediente.quantidade_necessaria * PedidoItem.quantidade))
+        .join(PedidoItem, PedidoItem.produto_id == ProdutoIngrediente.produto_id)
+        .where(PedidoItem.pedido_id.in_(ids),
+               ProdutoIngrediente.ingrediente_id == Ingrediente.id)
+        .scalar_subquery()
+    )
+    ingredientes_usados = (
+        select(ProdutoIngrediente.ingrediente_id)
+        .join(PedidoItem, PedidoItem.produto_id == ProdutoIngrediente.produto_id)
+        .where(PedidoItem.pedido_id.in_(ids))
+    )
+    baixa = db_session.execute(
+        update(Ingrediente)
+        .where(Ingrediente.id.in_(ingredientes_usados))
+        .values(quantidade_estoque=func.max(Ingrediente.quantidade_estoque - consumo, 0))
+        .returning(Ingrediente.id, Ingrediente.quantidade_estoque, Ingrediente.status)
+        .execution_options(synchronize_session=False, estoque_registrado=True)
+    ).all()
+    registrar_estoque(db_session, baixa)
+
+    acumular_vendas(db_session, [
+        (pedido["data"], pedido["quantidade"], pedido["valor_total"],
+         [(linha["produto_id"], linha["quantidade"], linha["valor_total"]) for linha in linhas])
+        for _, pedido, linhas in bloco
+    ])
+    db_session.commit()
+    return ids
+
+
+def _inserir_pedidos(db_session, pedidos):
+    """Grava os pedidos com um INSERT multi-linha e devolve os ids na ordem de `pedidos`.
+
+    O RETURNING não garante a ordem das linhas, mas o SQLite (o único banco
+    suportado, ver banco.py) numera as linhas de um INSERT em sequência
+    (maior rowid + 1), então os ids ordenados seguem a ordem dos pedidos.
+    sort_by_parameter_order faria um INSERT por pedido no SQLite, e Pedido
+    não tem coluna única para mapear os ids de volta.
+    """
+    return sorted(db_session.execute(insert(Pedido).returning(Pedido.id), pedidos).scalars())
@@ -0,0 +1,173 @@
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import select, delete, func, and_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import (Pedido, PedidoItem, Movimento, Produto,
+                    ResumoVendaDiaria, ResumoVendaHoraria, ResumoVendaProduto)
+
+
+def _hora(momento):
+    return momento.replace(minute=0, second=0, microsecond=0)
+
+
+def _somar(db_session, modelo, chaves, linhas):
+    # UPSERT em lote: cria a linha do período ou soma nos contadores existentes
+    if not linhas:
+        return
+    stmt = sqlite_insert(modelo)
+    campos = [coluna for coluna in linhas[0] if coluna not in chaves]
+    db_session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=chaves,
+            set_={campo: getattr(modelo, campo) + getattr(stmt.excluded, campo) for campo in campos}
+        ),
+        linhas
+    )
+
+
+def acumular_vendas(db_session, pedidos):
+    """Soma pedidos recém-gravados nos resumos, na mesma transação do pedido.
+
+    `pedidos` é uma lista de (data, quantidade, valor_total, linhas), com
+    `linhas` no formato (produto_id, quantidade, valor_total). Cada entrada
+    do pedido no caixa também é somada em `entradas` do dia.
+    """
+    diario, horario, por_produto = {}, {}, {}
+    for data, quantidade, valor_total, linhas in pedidos:
+        dia = diario.setdefault(data.date(), {"pedidos": 0, "unidades": 0, "receita": 0.0,
+                                              "entradas": 0.0, "saidas": 0.0})
+        dia["pedidos"] += 1
+        dia["unidades"] += quantidade
+        dia["receita"] += valor_total
+        dia["entradas"] += valor_total
+
+        hora = horario.setdefault(_hora(data), {"pedidos": 0, "unidades": 0, "receita": 0.0})
+        hora["pedidos"] += 1
+        hora["unidades"] += quantidade
+        hora["receita"] += valor_total
+
+        for produto_id, quantidade_item, valor_item in linhas:
+            produto = por_produto.setdefault((data.date(), produto_id), {"unidades": 0, "receita": 0.0})
+            produto["unidades"] += quantidade_item
+            produto["receita"] += valor_item
+
+    _somar(db_session, ResumoVendaDiaria, ["dia"],
+           [dict(valores, dia=dia) for dia, valores in diario.items()])
+    _somar(db_session, ResumoVendaHoraria, ["hora"],
+           [dict(valores, hora=hora) for hora, valores in horario.items()])
+    _somar(db_session, ResumoVendaProduto, ["dia", "produto_id"],
+           [dict(valores, dia=dia, produto_id=produto_id) for (dia, produto_id), valores in por_produto.items()])
+
+
+def reconstruir(db_session):
+    """Recalcula todos os resumos a partir do histórico (carga inicial ou correção)."""
+    dia = func.date(Pedido.data)
+    hora = func.strftime('%Y-%m-%d %H:00:00', Pedido.data)
+
+    diario = {
+        date.fromisoformat(linha.dia): {"pedidos": linha.pedidos, "unidades": linha.unidades or 0,
+                                        "receita": linha.receita or 0.0, "entradas": 0.0, "saidas": 0.0}
+        for linha in db_session.execute(
+            select(dia.label("dia"), func.count(Pedido.id).label("pedidos"),
+                   func.sum(Pedido.quantidade).label("unidades"), func.sum(Pedido.valor_total).label("receita"))
+            .group_by(dia))
+    }
+    for linha in db_session.execute(
+            select(dia.label("dia"),
+                   func.sum(Movimento.valor_total).filter(Movimento.entrada == True).label("entradas"),
+                   func.sum(Movimento.valor_total).filter(Movimento.saida == True).label("saidas"))
+            .join(Pedido, Pedido.id == Movimento.pedido_id)
+            .group_by(dia)):
+        valores = diario.setdefault(date.fromisoformat(linha.dia), {"pedidos": 0, "unidades": 0, "receita": 0.0})
+        valores["entradas"] = linha.entradas or 0.0
+        valores["saidas"] = linha.saidas or 0.0
+
+    horario = [
+        {"hora": datetime.fromisoformat(linha.hora), "pedidos": linha.pedidos,
+         "unidades": linha.unidades or 0, "receita": linha.receita or 0.0}
+        for linha in db_session.execute(
+            select(hora.label("hora"), func.count(Pedido.id).label("pedidos"),
+                   func.sum(Pedido.quantidade).label("unidades"), func.sum(Pedido.valor_total).label("receita"))
+            .group_by(hora))
+    ]
+
+    # Pedidos antigos (anteriores a PedidoItem) guardam o produto no próprio pedido
+    sem_itens = ~select(PedidoItem.id).where(PedidoItem.pedido_id == Pedido.id).exists()
+    por_produto = {}
+    for consulta in (
+            select(dia.label("dia"), PedidoItem.produto_id, func.sum(PedidoItem.quantidade).label("unidades"),
+                   func.sum(PedidoItem.valor_total).label("receita"))
+            .join(Pedido, Pedido.id == PedidoItem.pedido_id)
+            .group_by(dia, PedidoItem.produto_id),
+            select(dia.label("dia"), Pedido.produto_id, func.sum(Pedido.quantidade).label("unidades"),
+                   func.sum(Pedido.valor_total).label("receita"))
+            .where(Pedido.produto_id.isnot(None), sem_itens)
+            .group_by(dia, Pedido.produto_id)):
+        for linha in db_session.execute(consulta):
+            valores = por_produto.setdefault((date.fromisoformat(linha.dia), linha.produto_id),
+                                             {"unidades": 0, "receita": 0.0})
+            valores["unidades"] += linha.unidades or 0
+            valores["receita"] += linha.receita or 0.0
+
+    try:
+        for modelo in (ResumoVendaDiaria, ResumoVendaHoraria, ResumoVendaProduto):
+            db_session.execute(delete(modelo))
+        _somar(db_session, ResumoVendaDiaria, ["dia"],
+               [dict(valores, dia=dia) for dia, valores in diario.items()])
+        _somar(db_session, ResumoVendaHoraria, ["hora"], horario)
+        _somar(db_session, ResumoVendaProduto, ["dia", "produto_id"],
+               [dict(valores, dia=dia, produto_id=produto_id) for (dia, produto_id), valores in por_produto.items()])
+        db_session.commit()
+    except Exception:
+        db_session.rollback()
+        raise
+
+    return {"dias": len(diario), "horas": len(horario), "produtos": len(por_produto)}
+
+
+def periodo(inicio, fim, dias_padrao=30):
+    # Converte os parâmetros ?inicio=&fim= (AAAA-MM-DD); sem eles, os últimos `dias_padrao` dias
+    try:
+        fim = date.fromisoformat(fim) if fim else datetime.utcnow().date()
+        inicio = date.fromisoformat(inicio) if inicio else fim - timedelta(days=dias_padrao - 1)
+    except ValueError:
+        raise ValueError("Datas inválidas. Use o formato AAAA-MM-DD.")
+    if inicio > fim:
+        raise ValueError("A data inicial deve ser anterior à final.")
+    return inicio, fim
+
+
+def vendas_diarias(db_session, inicio, fim):
+    return [resumo.serialize() for resumo in db_session.execute(
+        select(ResumoVendaDiaria)
+        .where(ResumoVendaDiaria.dia >= inicio, ResumoVendaDiaria.dia <= fim)
+        .order_by(ResumoVendaDiaria.dia)
+    ).scalars()]
+
+
+def vendas_horarias(db_session, inicio, fim):
+    return [resumo.serialize() for resumo in db_session.execute(
+        select(ResumoVendaHoraria)
+        .where(ResumoVendaHoraria.hora >= datetime.combine(inicio, datetime.min.time()),
+               ResumoVendaHoraria.hora < datetime.combine(fim + timedelta(days=1), datetime.min.time()))
+        .order_by(ResumoVendaHoraria.hora)
+    ).scalars()]
+
+
+def vendas_por_produto(db_session, inicio, fim):
+    linhas = db_session.execute(
+        select(ResumoVendaProduto.produto_id, Produto.nome,
+               func.sum(ResumoVendaProduto.unidades).label("unidades"),
+               func.sum(ResumoVendaProduto.receita).label("receita"))
+        .outerjoin(Produto, Produto.id == ResumoVendaProduto.produto_id)
+        .where(and_(ResumoVendaProduto.dia >= inicio, ResumoVendaProduto.dia <= fim))
+        .group_by(ResumoVendaProduto.produto_id, Produto.nome)
+        .order_by(func.sum(ResumoVendaProduto.receita).desc())
+    )
+    return [{
+        "produto_id": linha.produto_id,
+        "nome": linha.nome,
+        "unidades": linha.unidades,
+        "receita": round(linha.receita, 2)
+    } for linha in linhas]
@@ -0,0 +1,376 @@
+from flask import Blueprint, current_app, request, jsonify
+
+import compressao
+from banco import sessao, sessao_leitura
+from autorizacao import papel_requerido, PAPEIS_ADMIN
+from catalogo import (cache_catalogo, montar_cardapio, montar_itens, pagina_itens, pagina_cardapio,
+                      porcoes_disponiveis, CAMPOS_ITENS, CAMPOS_ITENS_PADRAO, CAMPOS_CARDAPIO)
+from cardapio import validar_produto, cadastrar_produtos, buscar_produtos, ErroCardapio, LIMITE_BUSCA_PADRAO
+from paginacao import PARAMETROS_PAGINACAO, ler_pagina, ler_limite, ler_booleano
+
+bp = Blueprint('cardapio', __name__)
+
+LIMITE_CARDAPIO_LOTE = 5000
+
+
+def resposta_catalogo(nome, montar):
+    codificacao = compressao.escolher_codificacao()
+
+    # Com o cache em dia, nada aqui abre sessão nem consulta o banco
+    etag, status, corpo = cache_catalogo.obter(nome, lambda: montar(sessao_leitura()))
+    if status != 200:
+        return current_app.response_class(corpo, status=status, mimetype='application/json')
+
+    comprimir = codificacao and len(corpo) >= compressao.TAMANHO_MINIMO
+    # GET condicional: 304 só se a ETag do cliente é a da representação que
+    # esta requisição receberia (uma ETag -gzip não vale para quem não aceita gzip)
+    if request.if_none_match.contains(f"{etag}-{codificacao}" if comprimir else etag):
+        resposta = current_app.response_class(status=304)
+        resposta.set_etag(f"{etag}-{codificacao}" if comprimir else etag)
+        resposta.vary.add('Accept-Encoding')
+        return resposta
+
+    resposta = current_app.response_class(corpo, status=status, mimetype='application/json')
+    resposta.set_etag(etag)
+    # Bytes comprimidos guardados junto do corpo: comprime uma vez por versão
+    if comprimir:
+        compressao.marcar_codificacao(resposta, codificacao,
+                                      cache_catalogo.comprimido(nome, etag, corpo, codificacao))
+    return resposta
+
+
+def paginado(*filtros):
+    # Sem nenhum destes parâmetros a resposta é a listagem completa em cache
+    return any(request.args.get(nome) for nome in PARAMETROS_PAGINACAO + filtros)
+
+
+@bp.route('/itens', methods=['GET'])
+def listar_ingrediente():
+    """
+    API para listar os ingredientes.
+
+    Pública, como /cardapio: os tablets e terminais consultam sem token.
+
+    ## Endpoint:
+        /itens
+        /itens?limit=50&after=<cursor>&fields=id,nome&status=true&unidade=kg
+
+    ## Método:
+        GET
+
+    ## Parâmetros (opcionais):
+        Sem parâmetros, devolve todos os ingredientes (resposta em cache, com ETag).
+        limit   itens por página (padrão 50, máximo 500)
+        after   o "proximo" da página anterior
+        fields  campos separados por vírgula: id, nome, unidade, quantidade_estoque, status
+        status, unidade   filtros
+
+    ## Respostas (JSON):
+        Sucesso - 200
+        {
+            "produtos": [{"id": 1, "nome": "Queijo", "unidade": "kg", "quantidade_estoque": 12.5}],
+            "proximo": "WzUwXQ"
+        }
+        "proximo" é null na última página (e não aparece sem paginação).
+
+    ## Erros possíveis (JSON):
+        Parâmetro inválido - 400
+        {
+            "msg": "limit deve estar entre 1 e 500."
+        }
+    """
+    try:
+        if not paginado('status', 'unidade'):
+            return resposta_catalogo('itens', montar_itens)
+
+        try:
+            limite, campos = ler_pagina(request.args, CAMPOS_ITENS, CAMPOS_ITENS_PADRAO)
+            itens, proximo = pagina_itens(sessao_leitura(), limite, request.args.get('after'), campos,
+                                          status=ler_booleano(request.args.get('status'), 'status'),
+                                          unidade=request.args.get('unidade'))
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), 400
+        return jsonify({"produtos": itens, "proximo": proximo}), 200
+
+    except Exception as e:
+        return jsonify({"msg": f"Erro ao listar produtos: {str(e)}"}), 500
+
+
+@bp.route('/cadastro/item/cardapio', methods=['POST'])
+@papel_requerido(*PAPEIS_ADMIN)
+def cadastrar_produto_cardapio():
+    """
+    API para cadastrar um novo item no cardápio com seus ingredientes.
+
+    ## Endpoint:
+        /cadastro/item/cardapio
+
+    ## Método:
+        POST
+
+    ## Requisição (JSON):
+        {
+            "nome": "Pizza Calabresa",
+            "descricao": "Pizza com calabresa, queijo e molho",
+            "preco": 39.90,
+            "categoria": "Pizza",
+            "ingredientes": [
+                {
+                    "ingrediente_id": 1,
+                    "quantidade_necessaria": 0.2
+                },
+                {
+                    "ingrediente_id": 2,
+                    "quantidade_necessaria": 0.1
+                }
+            ]
+        }
+
+    ## Respostas (JSON):
+        Sucesso - 201
+        {
+            "msg": "Item do cardápio cadastrado com sucesso!",
+            "item": {
+                "id": 5,
+                "nome": "Pizza Calabresa",
+                "descricao": "Pizza com calabresa, queijo e molho",
+                "preco": 39.90,
+                "categoria": "Pizza",
+                "status": true
+            }
+        }
+
+    ## Erros possíveis (JSON):
+        Nome duplicado - 400
+        {
+            "msg": "Já existe um item com esse nome no cardápio."
+        }
+
+        Ingrediente não encontrado - 400
+        {
+            "msg": "Ingrediente com id 99 não encontrado."
+        }
+
+        Campos obrigatórios ausentes - 400
+        {
+            "msg": "Todos os campos são obrigatórios."
+        }
+
+        Erro interno - 500
+        {
+            "msg": "Erro ao cadastrar item: detalhes..."
+        }
+    """
+    db_session = sessao()
+    try:
+        data = request.get_json()
+
+        try:
+            item = validar_produto(data)
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), 400
+
+        try:
+            novo_item = cadastrar_produtos(db_session, [item])[0]
+        except ErroCardapio as e:
+            return jsonify({"msg": str(e)}), 400
+
+        return jsonify({
+            "msg": "Item do cardápio cadastrado com sucesso!",
+            "item": novo_item
+        }), 201
+
+    except Exception as e:
+        db_session.rollback()
+        return jsonify({"msg": f"Erro ao cadastrar item: {str(e)}"}), 500
+
+
+@bp.route('/cadastro/cardapio/lote', methods=['POST'])
+@papel_requerido(*PAPEIS_ADMIN)
+def cadastrar_cardapio_lote():
+    """
+    API para carregar um cardápio inteiro (vários itens com receitas) de uma vez.
+
+    Tudo é gravado numa única transação: se algum item tiver problema,
+    nenhum é cadastrado e a resposta lista os erros.
+
+    ## Endpoint:
+        /cadastro/cardapio/lote
+
+    ## Método:
+        POST
+
+    ## Requisição (JSON):
+        {
+            "itens": [
+                {
+                    "nome": "Pizza Calabresa",
+                    "descricao": "Pizza com calabresa, queijo e molho",
+                    "preco": 39.90,
+                    "categoria": "Pizza",
+                    "ingredientes": [{"ingrediente_id": 1, "quantidade_necessaria": 0.2}]
+                }
+            ]
+        }
+
+    ## Respostas (JSON):
+        Sucesso - 201
+        {
+            "msg": "1 itens cadastrados no cardápio!",
+            "itens": [{"id": 5, "nome": "Pizza Calabresa", ...}]
+        }
+
+    ## Erros possíveis (JSON):
+        Itens inválidos - 400
+        {
+            "msg": "Nenhum item foi cadastrado.",
+            "erros": [{"indice": 0, "msg": "Ingrediente com id 99 não encontrado."}]
+        }
+    """
+    db_session = sessao()
+    try:
+        data = request.get_json()
+        itens = data.get('itens') if isinstance(data, dict) else data
+
+        if not isinstance(itens, list) or not itens:
+            return jsonify({"msg": "Envie a lista 'itens' com pelo menos um item."}), 400
+        if len(itens) > LIMITE_CARDAPIO_LOTE:
+            return jsonify({"msg": f"Envie no máximo {LIMITE_CARDAPIO_LOTE} itens por lote."}), 413
+
+        validados, erros = [], []
+        for indice, item in enumerate(itens):
+            try:
+                validados.append(validar_produto(item))
+            except ValueError as e:
+                erros.append({"indice": indice, "msg": str(e)})
+        if erros:
+            return jsonify({"msg": "Nenhum item foi cadastrado.", "erros": erros}), 400
+
+        try:
+            novos_itens = cadastrar_produtos(db_session, validados)
+        except ErroCardapio as e:
+            return jsonify({"msg": "Nenhum item foi cadastrado.", "erros": e.erros}), 400
+
+        return jsonify({
+            "msg": f"{len(novos_itens)} itens cadastrados no cardápio!",
+            "itens": novos_itens
+        }), 201
+
+    except Exception as e:
+        db_session.rollback()
+        return jsonify({"msg": f"Erro ao cadastrar cardápio: {str(e)}"}), 500
+
+
+@bp.route('/cardapio', methods=['GET'])
+def listar_cardapio():
+    """
+    API para listar o cardápio com as receitas e as porções disponíveis.
+
+    ## Endpoint:
+        /cardapio
+        /cardapio?limit=50&after=<cursor>&fields=id,nome,preco,disponivel&categoria=Pizza
+
+    ## Método:
+        GET
+
+    ## Parâmetros (opcionais):
+        Sem parâmetros, devolve o cardápio inteiro (resposta em cache, com ETag).
+        limit      itens por página (padrão 50, máximo 500)
+        after      o "proximo" da página anterior
+        fields     campos separados por vírgula: id, nome, descricao, preco, categoria,
+                   status, porcoes_disponiveis, disponivel, ingredientes (padrão: todos)
+        categoria  filtro
+        status     true (padrão) ou false para os itens desativados
+
+    ## Respostas (JSON):
+        Sucesso - 200
+        {
+            "cardapio": [{"id": 1, "nome": "Pizza Calabresa", "preco": 39.9, "disponivel": true}],
+            "proximo": "WzUwXQ"
+        }
+
+    ## Erros possíveis (JSON):
+        Parâmetro inválido - 400
+        {
+            "msg": "Campos inválidos: foto. Use: id, nome, ..."
+        }
+    """
+    try:
+        if not paginado('categoria', 'status'):
+            return resposta_catalogo('cardapio', montar_cardapio)
+
+        try:
+            limite, campos = ler_pagina(request.args, CAMPOS_CARDAPIO, CAMPOS_CARDAPIO)
+            status = ler_booleano(request.args.get('status'), 'status')
+            itens, proximo = pagina_cardapio(sessao_leitura(), limite, request.args.get('after'), campos,
+                                             categoria=request.args.get('categoria'),
+                                             status=True if status is None else status)
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), 400
+        return jsonify({"cardapio": itens, "proximo": proximo}), 200
+
+    except Exception as e:
+        return jsonify({"msg": f"Erro ao listar cardápio: {str(e)}"}), 500
+
+
+@bp.route('/cardapio/busca', methods=['GET'])
+def buscar_cardapio():
+    """
+    API de busca no cardápio por nome, descrição e categoria.
+
+    Ignora acentos e maiúsculas, e cada palavra vale como prefixo
+    ("pao de q" encontra "Pão de Queijo"). Todas as palavras precisam
+    aparecer; o resultado vem do mais relevante para o menos.
+
+    ## Endpoint:
+        /cardapio/busca?q=pizza calab&limit=20
+
+    ## Método:
+        GET
+
+    ## Parâmetros:
+        q      texto da busca (obrigatório)
+        limit  máximo de itens (padrão 20, máximo 500)
+
+    ## Respostas (JSON):
+        Sucesso - 200
+        {
+            "q": "pizza calab",
+            "resultados": [
+                {"id": 3, "nome": "Pizza Calabresa", "descricao": "...", "preco": 39.9,
+                 "categoria": "Pizza", "status": true, "porcoes_disponiveis": 12, "disponivel": true}
+            ]
+        }
+
+    ## Erros possíveis (JSON):
+        Busca vazia - 400
+        {
+            "msg": "Informe o que buscar em 'q'."
+        }
+
+        limit fora de 1 a 500 - 400
+        {
+            "msg": "limit deve estar entre 1 e 500."
+        }
+    """
+    termo = request.args.get('q', '')
+    try:
+        limite = ler_limite(request.args, LIMITE_BUSCA_PADRAO)
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+
+    db_session = sessao_leitura()
+    try:
+        try:
+            resultados = buscar_produtos(db_session, termo, limite)
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), 400
+
+        porcoes = porcoes_disponiveis(db_session)
+        for item in resultados:
+            item["porcoes_disponiveis"] = porcoes.get(item["id"])
+            item["disponivel"] = item["porcoes_disponiveis"] != 0
+        return jsonify({"q": termo, "resultados": resultados}), 200
+
+    except Exception as e:
+        return jsonify({"msg": f"Erro ao buscar no cardápio: {str(e)}"}), 500
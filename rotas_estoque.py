@@ -0,0 +1,221 @@
+from flask import Blueprint, request, jsonify
+from sqlalchemy import select
+
+from banco import sessao, bloquear_escrita
+from models import Ingrediente, Produto
+from autorizacao import papel_requerido, PAPEIS_ADMIN
+from estoque import aplicar_contagem, ler_linhas_contagem, linhas_texto
+
+bp = Blueprint('estoque', __name__)
+
+
+@bp.route('/cadastro/ingrediente', methods=['POST'])
+@papel_requerido(*PAPEIS_ADMIN)
+def cadastro_ingrediente():
+    db_session = sessao()
+    try:
+        data = request.get_json()
+
+        nome = data.get('nome')
+        unidade = data.get('unidade')
+        quantidade_estoque = data.get('quantidade_estoque', 0)
+        status = data.get('status', True)
+
+        # Verifica campos obrigatórios
+        if not nome or not unidade:
+            return jsonify({"msg": "Nome e unidade são obrigatórios."}), 400
+
+        # Verifica se já existe produto com o mesmo nome
+        ja_existe = db_session.execute(
+            select(Ingrediente).where(Ingrediente.nome == nome)
+        ).scalar()
+
+        unidades_validas = ['g', 'mg', 'kg', 'ml', 'l','un']
+        unidade_normalizada = unidade.strip().lower()
+
+        if unidade_normalizada not in unidades_validas:
+            return jsonify({
+                "msg": f"Unidade inválida. Use apenas: {', '.join(unidades_validas)}."
+            }), 400
+
+        if ja_existe:
+            return jsonify({"msg": "Ingrediente com esse nome já existe."}), 400
+
+
+        if status is True or status is False:
+            status_final = status
+        else:
+            status_str = str(status).strip().lower()
+            if status_str == 'true' or status_str == '1' or status_str == 'ativo':
+                status_final = True
+            elif status_str == 'false' or status_str == '2' or status_str == 'desativo':
+                status_final = False
+            else:
+                return jsonify({"msg": "Valor de 'status' inválido. Use true/false ou 1/2."}), 400
+
+
+        novo_ingrediente = Ingrediente(
+            nome=nome.strip(),
+            unidade=unidade.strip(),
+            quantidade_estoque=quantidade_estoque,
+            status=status_final
+        )
+        novo_ingrediente.save(db_session)
+
+        return jsonify({
+            "msg": "Ingrediente cadastrado com sucesso!",
+            "ingrediente": novo_ingrediente.serialize()
+        }), 201
+
+    except Exception as e:
+        db_session.rollback()
+        return jsonify({"msg": f"Erro ao cadastrar o ingrediente : {str(e)}"}), 500
+
+
+@bp.route('/editar/item/<tipo>/<valor>', methods=['PUT'])
+@papel_requerido(*PAPEIS_ADMIN)
+def editar_ingrediente(tipo, valor):
+    db_session = sessao()
+    try:
+        data = request.get_json()
+
+        UNIDADES_PERMITIDAS = {'g', 'mg', 'kg', 'ml', 'l', 'un'}
+
+        # O estoque lido aqui é o "antes" da auditoria: com o lock de escrita
+        # já pego, nenhum pedido muda o estoque entre a leitura e o save()
+        bloquear_escrita(db_session)
+
+        # Buscar produto por ID ou nome
+        if tipo == 'id':
+            try:
+                ingrediente = db_session.execute(
+                    select(Ingrediente).where(Ingrediente.id == int(valor))
+                ).scalar()
+            except ValueError:
+                return jsonify({"msg": "ID inválido."}), 400
+
+        elif tipo == 'nome':
+            ingrediente = db_session.execute(
+                select(Ingrediente).where(Ingrediente.nome == valor.strip())
+            ).scalar()
+        else:
+            return jsonify({"msg": "Parâmetro de busca inválido. Use 'id' ou 'nome'."}), 400
+
+        if not ingrediente:
+            return jsonify({"msg": "Produto não encontrado."}), 404
+
+        # Atualiza nome (se enviado)
+        if 'nome' in data:
+            novo_nome = data['nome'].strip()
+            if not novo_nome:
+                return jsonify({"msg": "Nome não pode ser vazio."}), 400
+            if novo_nome != ingrediente.nome:
+                existente = db_session.execute(
+                    select(Produto).where(Produto.nome == novo_nome, Produto.id != ingrediente.id)
+                ).scalar()
+                if existente:
+                    return jsonify({"msg": "Já existe um produto com esse nome."}), 400
+                ingrediente.nome = novo_nome
+
+        if 'unidade' in data:
+            nova_unidade = data['unidade'].strip().lower()
+            if not nova_unidade:
+                return jsonify({"msg": "Unidade não pode ser vazia."}), 400
+            if nova_unidade not in UNIDADES_PERMITIDAS:
+                return jsonify({"msg": "Unidade inválida. Use g, mg, kg, ml, l ou un."}), 400
+            ingrediente.unidade = nova_unidade
+
+        if 'quantidade_estoque' in data:
+            valor_qtd = str(data['quantidade_estoque']).strip()
+            if valor_qtd == '' or valor_qtd.lower() == 'none':
+                ingrediente.quantidade_estoque = 0.0
+            else:
+                try:
+                    ingrediente.quantidade_estoque = float(valor_qtd)
+                except:
+                    return jsonify({"msg": "Quantidade de estoque inválida."}), 400
+
+        # Atualiza status
+        if 'status' in data:
+            val = data['status']
+            if val is True or val is False:
+                ingrediente.status = val
+            else:
+                val_str = str(val).strip().lower()
+                if val_str == 'true' or val_str == '1':
+                    ingrediente.status = True
+                elif val_str == 'false' or val_str == '2':
+                    ingrediente.status = False
+                else:
+                    return jsonify({"msg": "Valor de 'status' inválido. Use true/false ou 1/2."}), 400
+
+        # Salvar alterações
+        ingrediente.save(db_session)
+
+        return jsonify({
+            "msg": "Ingrediente atualizado com sucesso!",
+            "ingrediente": ingrediente.serialize()
+        }), 200
+
+    except Exception as e:
+        db_session.rollback()
+        return jsonify({"msg": f"Erro ao editar produto: {str(e)}"}), 500
+
+
+@bp.route('/estoque/contagem', methods=['POST'])
+@papel_requerido(*PAPEIS_ADMIN)
+def importar_contagem_estoque():
+    """
+    API para aplicar a contagem de inventário (ou ajustes) de muitos ingredientes.
+
+    O arquivo é lido em streaming, linha a linha, e aplicado em blocos.
+
+    ## Endpoint:
+        /estoque/contagem?modo=absoluto   (grava a quantidade contada)
+        /estoque/contagem?modo=delta      (soma/subtrai do estoque atual)
+
+    ## Método:
+        POST
+
+    ## Requisição:
+        CSV (text/csv):
+            ingrediente,quantidade
+            Alface,42
+            Carne Bovina,3500
+
+        ou JSON por linha (application/x-ndjson):
+            {"ingrediente": "Alface", "quantidade": 42}
+            {"ingrediente_id": 4, "quantidade": -150}
+
+    ## Respostas (JSON):
+        Sucesso - 200
+        {
+            "linhas": 3,
+            "aplicadas": 2,
+            "erros": 1,
+            "ingredientes_atualizados": 2,
+            "detalhes_erros": [{"linha": 4, "msg": "Ingrediente 'Rúcula' não encontrado."}]
+        }
+
+    ## Erros possíveis (JSON):
+        Modo inválido - 400
+        {
+            "msg": "Modo inválido. Use absoluto ou delta."
+        }
+    """
+    db_session = sessao()
+    try:
+        modo = request.args.get('modo', 'absoluto')
+        formato = 'csv' if request.mimetype == 'text/csv' else 'jsonl'
+        arquivo = linhas_texto(request.stream)
+
+        try:
+            resumo = aplicar_contagem(db_session, ler_linhas_contagem(arquivo, formato), modo)
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), 400
+
+        return jsonify(resumo), 200
+
+    except Exception as e:
+        db_session.rollback()
+        return jsonify({"msg": f"Erro ao aplicar contagem de estoque: {str(e)}"}), 500
@@ -0,0 +1,381 @@
+from flask import Blueprint, current_app, request, jsonify, g
+
+from banco import sessao, sessao_leitura
+from autorizacao import papel_requerido, eh_admin, gerar_ticket, PAPEIS_COZINHA, TICKET_TTL
+from eventos import canal_pedidos, ler_ultimo_id, ConexoesEsgotadas
+from paginacao import ler_pagina, ler_intervalo
+from pedidos import (registrar_pedido, registrar_lote, alterar_status, historico_pedidos, ler_itens, ler_lote,
+                     EstoqueInsuficiente, CAMPOS_HISTORICO, CAMPOS_HISTORICO_PADRAO)
+
+bp = Blueprint('pedidos', __name__)
+
+LIMITE_PEDIDOS_LOTE = 5000
+
+
+@bp.route('/pedido', methods=['POST'])
+@papel_requerido()
+def cadastrar_pedido():
+    """
+    API para registrar um pedido (comanda com um ou mais itens) com baixa de estoque dos ingredientes.
+
+    ## Endpoint:
+        /pedido
+
+    ## Método:
+        POST
+
+    ## Requisição (JSON):
+        {
+            "metodo_pagamento": "pix",
+            "itens": [
+                {"produto_id": 1, "quantidade": 2},
+                {"produto_id": 3, "quantidade": 1}
+            ]
+        }
+
+        Pedidos de um só produto também podem mandar "produto_id" e
+        "quantidade" direto no corpo, sem a lista "itens". O pedido fica no
+        nome do usuário do token; administradores podem informar "usuario_id".
+
+    ## Respostas (JSON):
+        Sucesso - 201
+        {
+            "msg": "Pedido registrado com sucesso!",
+            "pedido": {...}
+        }
+
+    ## Erros possíveis (JSON):
+        Corpo que não é um objeto JSON - 400
+        {
+            "msg": "Cada pedido deve ser um objeto JSON."
+        }
+
+        Dados inválidos - 400
+        {
+            "msg": "Produto com id 99 não encontrado."
+        }
+
+        Estoque insuficiente - 409
+        {
+            "msg": "Estoque insuficiente para atender o pedido."
+        }
+    """
+    db_session = sessao()
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"msg": "Cada pedido deve ser um objeto JSON."}), 400
+
+        # Só administradores registram pedidos em nome de outro usuário
+        usuario_id = g.usuario.id
+        if data.get('usuario_id') and eh_admin():
+            try:
+                usuario_id = int(data['usuario_id'])
+            except (TypeError, ValueError):
+                return jsonify({"msg": "usuario_id inválido."}), 400
+        metodo_pagamento = data.get('metodo_pagamento')
+
+        itens = ler_itens(data)
+        pedido = registrar_pedido(db_session, usuario_id, itens, metodo_pagamento)
+
+        return jsonify({
+            "msg": "Pedido registrado com sucesso!",
+            "pedido": pedido.serialize()
+        }), 201
+
+    except EstoqueInsuficiente as e:
+        return jsonify({"msg": str(e)}), 409
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+    except Exception as e:
+        db_session.rollback()
+        return jsonify({"msg": f"Erro ao registrar pedido: {str(e)}"}), 500
+
+
+@bp.route('/pedidos/lote', methods=['POST'])
+@papel_requerido()
+def cadastrar_pedidos_lote():
+    """
+    API para sincronizar em lote os pedidos que os terminais guardaram offline.
+
+    ## Endpoint:
+        /pedidos/lote
+
+    ## Método:
+        POST
+
+    ## Requisição:
+        Array JSON (application/json) ou um pedido por linha
+        (application/x-ndjson), no mesmo formato de /pedido, com os campos
+        opcionais "data" (ISO 8601) do momento da venda e "usuario_id" do
+        caixa que vendeu (padrão: o usuário do token; de outro usuário, só
+        para administradores):
+        [
+            {"usuario_id": 1, "itens": [{"produto_id": 1, "quantidade": 2}], "data": "2025-06-01T12:30:00"},
+            {"usuario_id": 2, "produto_id": 3, "quantidade": 1, "metodo_pagamento": "dinheiro"}
+        ]
+
+    ## Respostas (JSON):
+        Processado - 200 (um resultado por pedido, na ordem enviada)
+        {
+            "total": 2,
+            "gravados": 1,
+            "erros": 1,
+            "resultados": [
+                {"indice": 0, "status": "ok", "pedido_id": 10},
+                {"indice": 1, "status": "erro", "msg": "Produto com id 3 não encontrado."}
+            ]
+        }
+
+    ## Erros possíveis (JSON):
+        Corpo inválido - 400
+        {
+            "msg": "Corpo inválido: envie um array JSON ou NDJSON."
+        }
+    """
+    db_session = sessao()
+    try:
+        ndjson = request.mimetype in ('application/x-ndjson', 'application/jsonl')
+        try:
+            pedidos = ler_lote(request.get_data(as_text=True), ndjson=ndjson)
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), 400
+
+        if not pedidos:
+            return jsonify({"msg": "Nenhum pedido enviado."}), 400
+        if len(pedidos) > LIMITE_PEDIDOS_LOTE:
+            return jsonify({"msg": f"Envie no máximo {LIMITE_PEDIDOS_LOTE} pedidos por lote."}), 413
+
+        # Pedidos sem usuario_id ficam com o usuário do terminal que
+        # sincronizou; só administradores gravam em nome de outro usuário
+        admin = eh_admin()
+        for pedido in pedidos:
+            if isinstance(pedido, dict) and (not admin or not pedido.get('usuario_id')):
+                pedido['usuario_id'] = g.usuario.id
+
+        resultados = registrar_lote(db_session, pedidos)
+        gravados = sum(1 for resultado in resultados if resultado["status"] == "ok")
+
+        return jsonify({
+            "total": len(resultados),
+            "gravados": gravados,
+            "erros": len(resultados) - gravados,
+            "resultados": resultados
+        }), 200
+
+    except Exception as e:
+        db_session.rollback()
+        return jsonify({"msg": f"Erro ao importar pedidos: {str(e)}"}), 500
+
+
+@bp.route('/pedidos/historico', methods=['GET'])
+@papel_requerido()
+def listar_historico_pedidos():
+    """
+    API do histórico de pedidos de um usuário, do mais recente ao mais antigo, paginado.
+
+    ## Endpoint:
+        /pedidos/historico?limit=20&after=<cursor>&inicio=2025-06-01&fim=2025-06-30&status=entregue
+
+    ## Método:
+        GET
+
+    ## Parâmetros (opcionais):
+        limit        pedidos por página (padrão 50, máximo 500)
+        after        o "proximo" da página anterior
+        fields       campos separados por vírgula: id, valor_total, quantidade, metodo_pagamento,
+                     data, status, usuario_id, itens (padrão: todos menos usuario_id)
+        inicio, fim  período (ISO 8601, UTC); uma data sem hora em "fim" inclui o dia inteiro
+        status       filtro
+        usuario_id   só para administradores; padrão: o usuário do token
+
+    ## Respostas (JSON):
+        Sucesso - 200
+        {
+            "pedidos": [
+                {"id": 10, "valor_total": 79.8, "quantidade": 2, "metodo_pagamento": "pix",
+                 "data": "2025-06-01T12:30:00", "status": "entregue",
+                 "itens": [{"id": 15, "produto_id": 1, "quantidade": 2, "preco_unitario": 39.9, "valor_total": 79.8}]}
+            ],
+            "proximo": "WyIyMDI1LTA2LTAxVDEyOjMwOjAwIiwgMTBd"
+        }
+        "proximo" é null na última página.
+
+    ## Erros possíveis (JSON):
+        Parâmetro inválido - 400
+        {
+            "msg": "Cursor 'after' inválido."
+        }
+    """
+    usuario_id = g.usuario.id
+    if request.args.get('usuario_id') and eh_admin():
+        try:
+            usuario_id = int(request.args['usuario_id'])
+        except ValueError:
+            return jsonify({"msg": "usuario_id inválido."}), 400
+
+    try:
+        try:
+            limite, campos = ler_pagina(request.args, CAMPOS_HISTORICO, CAMPOS_HISTORICO_PADRAO)
+            inicio, fim = ler_intervalo(request.args.get('inicio'), request.args.get('fim'))
+            pedidos, proximo = historico_pedidos(sessao_leitura(), usuario_id, limite, request.args.get('after'),
+                                                 campos, inicio, fim, request.args.get('status'))
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), 400
+        return jsonify({"pedidos": pedidos, "proximo": proximo}), 200
+
+    except Exception as e:
+        return jsonify({"msg": f"Erro ao listar pedidos: {str(e)}"}), 500
+
+
+@bp.route('/pedido/<int:pedido_id>/status', methods=['PUT'])
+@papel_requerido(*PAPEIS_COZINHA)
+def editar_status_pedido(pedido_id):
+    """
+    API para a cozinha mudar a etapa de um pedido (papel "cozinha" ou administrador).
+
+    ## Endpoint:
+        /pedido/<pedido_id>/status
+
+    ## Método:
+        PUT
+
+    ## Requisição (JSON):
+        {
+            "status": "em_preparo"
+        }
+        Etapas: pendente, em_preparo, pronto, entregue.
+
+    ## Respostas (JSON):
+        Sucesso - 200
+        {
+            "msg": "Status do pedido atualizado.",
+            "pedido": {"id": 10, "status": "em_preparo"}
+        }
+
+    ## Erros possíveis (JSON):
+        Status inválido - 400
+        {
+            "msg": "Status inválido. Use um destes: pendente, em_preparo, pronto, entregue."
+        }
+
+        Papel sem permissão - 403
+        {
+            "msg": "Acesso não permitido para o seu papel."
+        }
+
+        Pedido não encontrado - 404
+        {
+            "msg": "Pedido não encontrado."
+        }
+    """
+    db_session = sessao()
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            pedido = alterar_status(db_session, pedido_id, data.get('status'))
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), 400
+
+        if pedido is None:
+            return jsonify({"msg": "Pedido não encontrado."}), 404
+        return jsonify({"msg": "Status do pedido atualizado.", "pedido": pedido}), 200
+
+    except Exception as e:
+        db_session.rollback()
+        return jsonify({"msg": f"Erro ao atualizar pedido: {str(e)}"}), 500
+
+
+@bp.route('/pedidos/eventos/ticket', methods=['POST'])
+@papel_requerido()
+def ticket_eventos():
+    """
+    Ticket para abrir /pedidos/eventos no EventSource do navegador, que não envia cabeçalhos.
+
+    O JWT não vai na URL: URLs ficam no log de acesso e no histórico do
+    navegador. O ticket só serve para /pedidos/eventos e vale por
+    SMARTSELL_TICKET_TTL segundos (padrão 60), o bastante para abrir a conexão.
+
+    ## Endpoint:
+        /pedidos/eventos/ticket
+
+    ## Método:
+        POST (com o cabeçalho Authorization)
+
+    ## Respostas (JSON):
+        Sucesso - 200
+        {
+            "ticket": "InNhbXVlbEBleGVtcGxvLmNvbSI.Zm9v.YmFy",
+            "expira_em": 60
+        }
+    """
+    return jsonify({"ticket": gerar_ticket('eventos', g.usuario.email), "expira_em": TICKET_TTL}), 200
+
+
+@bp.route('/pedidos/eventos', methods=['GET'])
+@papel_requerido(ticket='eventos')
+def eventos_pedidos():
+    """
+    Fila da cozinha em tempo real (Server-Sent Events): pedidos novos e mudanças de status.
+
+    ## Endpoint:
+        /pedidos/eventos
+
+    ## Método:
+        GET
+
+    ## Autenticação:
+        Cabeçalho Authorization ou, no EventSource do navegador,
+        ?ticket=<ticket de POST /pedidos/eventos/ticket>. O ticket expira
+        logo: quando o EventSource der erro ao reconectar, a tela pede um
+        ticket novo e abre /pedidos/eventos?ticket=...&ultimo_id=<último id>.
+
+    ## Parâmetros:
+        Cabeçalho Last-Event-ID (enviado pelo EventSource ao reconectar) ou
+        ?ultimo_id=N para continuar depois do evento N. Sem eles, só chegam
+        os eventos a partir da conexão.
+
+    ## Resposta (text/event-stream):
+        id: 41
+        event: pedido_criado
+        data: {"id":10,"usuario_id":2,"status":"pendente","data":"2025-06-01T12:30:00","itens":[{"produto_id":1,"nome":"Pizza","quantidade":2}]}
+
+        id: 42
+        event: pedido_status
+        data: {"id":10,"status":"em_preparo"}
+
+        event: reinicio
+            O servidor não tem mais os eventos pedidos (buffer cheio ou
+            restart): a tela deve recarregar a fila e seguir do id enviado.
+
+    A conexão é encerrada a cada SMARTSELL_EVENTOS_DURACAO segundos e o
+    EventSource reconecta sozinho com o último id recebido. Cada conexão
+    aberta ocupa uma thread do worker; por worker são aceitas no máximo
+    SMARTSELL_EVENTOS_CONEXOES (padrão: SMARTSELL_THREADS menos 2, ou seja 6
+    com as 8 threads padrão; sempre menos que o total de threads).
+
+    ## Erros possíveis (JSON):
+        Ticket inválido ou expirado - 401
+        {
+            "msg": "Ticket inválido ou expirado."
+        }
+
+        Limite de conexões do worker - 503 (com Retry-After; a tela deve reabrir a conexão depois)
+        {
+            "msg": "Muitas telas conectadas neste servidor. Tente novamente em instantes."
+        }
+    """
+    try:
+        canal_pedidos.reservar_conexao()
+    except ConexoesEsgotadas as e:
+        return jsonify({"msg": str(e)}), 503, {"Retry-After": "5"}
+
+    ultimo_id = ler_ultimo_id(request.headers.get('Last-Event-ID', request.args.get('ultimo_id')))
+    resposta = current_app.response_class(canal_pedidos.transmitir(ultimo_id), mimetype='text/event-stream')
+    # Chamado quando a resposta termina ou o cliente desconecta, mesmo que
+    # o gerador nem tenha começado
+    resposta.call_on_close(canal_pedidos.liberar_conexao)
+    resposta.headers['Cache-Control'] = 'no-cache'
+    # Sem isso o nginx segura os eventos no buffer dele
+    resposta.headers['X-Accel-Buffering'] = 'no'
+    return resposta
@@ -0,0 +1,322 @@
+import hmac
+import os
+from datetime import date, datetime
+
+from flask import Blueprint, current_app, request, jsonify
+
+from banco import sessao_leitura, local_session
+from autorizacao import papel_requerido, PAPEIS_ADMIN
+from metricas import metricas
+from resumos import reconstruir, periodo, vendas_diarias, vendas_horarias, vendas_por_produto
+from caixa import saldo_em, saldo_fechamento, recalcular_checkpoints
+from exportacao import EXPORTACOES, FORMATOS, consulta_exportacao, exportar
+from auditoria import consultar_auditoria
+from paginacao import ler_limite, ler_intervalo
+
+bp = Blueprint('relatorios', __name__, cli_group=None)
+
+# Token fixo para o Prometheus (Authorization: Bearer <token>); sem ele,
+# /metrics exige o JWT de um administrador
+METRICAS_TOKEN = os.environ.get('SMARTSELL_METRICAS_TOKEN', '')
+
+
+@bp.route('/relatorios/vendas/<agrupamento>', methods=['GET'])
+@papel_requerido(*PAPEIS_ADMIN)
+def relatorio_vendas(agrupamento):
+    """
+    API de relatórios de vendas, lidos apenas das tabelas de resumo.
+
+    ## Endpoint:
+        /relatorios/vendas/diario
+        /relatorios/vendas/horario
+        /relatorios/vendas/produtos
+
+    ## Método:
+        GET
+
+    ## Parâmetros (opcionais):
+        inicio=AAAA-MM-DD&fim=AAAA-MM-DD (padrão: últimos 30 dias, em UTC)
+
+    ## Respostas (JSON):
+        Sucesso - 200
+        {
+            "inicio": "2025-06-01",
+            "fim": "2025-06-30",
+            "vendas": [
+                {"dia": "2025-06-01", "pedidos": 12, "unidades": 30, "receita": 540.5, "entradas": 540.5, "saidas": 0.0}
+            ]
+        }
+
+    ## Erros possíveis (JSON):
+        Agrupamento ou datas inválidos - 400
+        {
+            "msg": "Datas inválidas. Use o formato AAAA-MM-DD."
+        }
+    """
+    consultas = {
+        'diario': vendas_diarias,
+        'horario': vendas_horarias,
+        'produtos': vendas_por_produto
+    }
+    if agrupamento not in consultas:
+        return jsonify({"msg": "Relatório inválido. Use diario, horario ou produtos."}), 400
+
+    db_session = sessao_leitura()
+    try:
+        try:
+            inicio, fim = periodo(request.args.get('inicio'), request.args.get('fim'))
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), 400
+
+        return jsonify({
+            "inicio": inicio.isoformat(),
+            "fim": fim.isoformat(),
+            "vendas": consultas[agrupamento](db_session, inicio, fim)
+        }), 200
+
+    except Exception as e:
+        return jsonify({"msg": f"Erro ao gerar relatório: {str(e)}"}), 500
+
+
+@bp.cli.command('reconstruir-resumos')
+def reconstruir_resumos():
+    """Recalcula os resumos de vendas a partir de todo o histórico de pedidos."""
+    db_session = local_session()
+    try:
+        totais = reconstruir(db_session)
+        print(f"Resumos reconstruídos: {totais['dias']} dias, {totais['horas']} horas, "
+              f"{totais['produtos']} linhas por produto.")
+    finally:
+        db_session.close()
+
+
+@bp.route('/relatorios/caixa/saldo', methods=['GET'])
+@papel_requerido(*PAPEIS_ADMIN)
+def saldo_caixa():
+    """
+    API do saldo do caixa (entradas menos saídas), sem somar o histórico inteiro.
+
+    ## Endpoint:
+        /relatorios/caixa/saldo
+
+    ## Método:
+        GET
+
+    ## Parâmetros (opcionais, um ou outro):
+        em=2025-06-01T18:30:00   saldo naquele momento (UTC)
+        dia=2025-06-01           saldo no fechamento do dia (UTC)
+        Sem parâmetros: saldo atual.
+
+    ## Respostas (JSON):
+        Sucesso - 200
+        {
+            "em": "2025-06-01T18:30:00",
+            "saldo": 15230.4
+        }
+        (com dia=, a chave "dia" no lugar de "em")
+
+    ## Erros possíveis (JSON):
+        Data inválida - 400
+        {
+            "msg": "Data inválida. Use o formato ISO 8601."
+        }
+    """
+    db_session = sessao_leitura()
+    try:
+        try:
+            dia = date.fromisoformat(request.args['dia']) if request.args.get('dia') else None
+            momento = datetime.fromisoformat(request.args['em']) if request.args.get('em') else datetime.utcnow()
+        except ValueError:
+            return jsonify({"msg": "Data inválida. Use o formato ISO 8601."}), 400
+
+        if dia:
+            return jsonify({"dia": dia.isoformat(), "saldo": saldo_fechamento(db_session, dia)}), 200
+        return jsonify({"em": momento.isoformat(), "saldo": saldo_em(db_session, momento)}), 200
+
+    except Exception as e:
+        return jsonify({"msg": f"Erro ao calcular saldo: {str(e)}"}), 500
+
+
+@bp.route('/auditoria', methods=['GET'])
+@papel_requerido(*PAPEIS_ADMIN)
+def listar_auditoria():
+    """
+    API da trilha de auditoria: quem mudou o estoque de um ingrediente ou o preço de um produto, e quando.
+
+    As alterações são gravadas em lotes, em segundo plano: as do último
+    segundo podem ainda não aparecer.
+
+    ## Endpoint:
+        /auditoria?entidade=ingrediente&entidade_id=4&limit=50&after=<cursor>
+
+    ## Método:
+        GET
+
+    ## Parâmetros (opcionais):
+        limit        eventos por página (padrão 50, máximo 500)
+        after        o "proximo" da página anterior
+        entidade     ingrediente ou produto
+        entidade_id  id do ingrediente ou produto
+        usuario_id   quem fez a alteração
+        campo        quantidade_estoque ou preco
+        inicio, fim  período (ISO 8601, UTC); uma data sem hora em "fim" inclui o dia inteiro
+
+    ## Respostas (JSON):
+        Sucesso - 200
+        {
+            "eventos": [
+                {"id": 31, "momento": "2025-06-01T18:30:00", "usuario_id": 1, "usuario_email": "admin@exemplo.com",
+                 "entidade": "ingrediente", "entidade_id": 4, "campo": "quantidade_estoque",
+                 "valor_anterior": 12.5, "valor_novo": 3.0, "origem": "editar_ingrediente"}
+            ],
+            "proximo": null
+        }
+        Do evento mais recente ao mais antigo; "proximo" é null na última página.
+
+    ## Erros possíveis (JSON):
+        Parâmetro inválido - 400
+        {
+            "msg": "entidade_id inválido."
+        }
+    """
+    try:
+        try:
+            limite = ler_limite(request.args)
+            inicio, fim = ler_intervalo(request.args.get('inicio'), request.args.get('fim'))
+            filtros = {}
+            for nome in ('entidade_id', 'usuario_id'):
+                if request.args.get(nome):
+                    try:
+                        filtros[nome] = int(request.args[nome])
+                    except ValueError:
+                        raise ValueError(f"{nome} inválido.")
+            eventos, proximo = consultar_auditoria(
+                sessao_leitura(), limite, request.args.get('after'), request.args.get('entidade'),
+                campo=request.args.get('campo'), inicio=inicio, fim=fim, **filtros
+            )
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), 400
+        return jsonify({"eventos": eventos, "proximo": proximo}), 200
+
+    except Exception as e:
+        return jsonify({"msg": f"Erro ao consultar a auditoria: {str(e)}"}), 500
+
+
+@bp.route('/exportar/<nome>', methods=['GET'])
+@papel_requerido(*PAPEIS_ADMIN)
+def exportar_tabela(nome):
+    """
+    API de exportação completa ou incremental, enviada em streaming.
+
+    ## Endpoint:
+        /exportar/pedidos
+        /exportar/movimentos
+        /exportar/ingredientes
+
+    ## Método:
+        GET
+
+    ## Parâmetros (opcionais):
+        formato=ndjson (padrão) ou csv
+        desde_id=N                   só linhas com id maior que N
+        desde=2025-06-01T00:00:00    só linhas com data a partir dela (pedidos e movimentos)
+
+        Para as cargas noturnas prefira desde_id com o maior id já recebido:
+        pedidos sincronizados pelos terminais offline chegam depois com a
+        data antiga e ficariam fora de um "desde" pela data.
+
+    ## Resposta:
+        Um objeto JSON por linha (application/x-ndjson) ou CSV com cabeçalho,
+        em ordem de id. Os pedidos levam os itens: no NDJSON, no array
+        "itens"; no CSV, uma linha por item com as colunas item_id,
+        item_produto_id, item_quantidade, item_preco_unitario e item_valor_total.
+        {"id": 1, "usuario_id": 2, "produto_id": null, "quantidade": 3, "metodo_pagamento": "pix",
+         "valor_total": 79.8, "data": "2025-06-01T12:30:00", "status": "entregue",
+         "itens": [{"id": 1, "produto_id": 4, "quantidade": 2, "preco_unitario": 29.9, "valor_total": 59.8},
+                   {"id": 2, "produto_id": 7, "quantidade": 1, "preco_unitario": 20.0, "valor_total": 20.0}]}
+
+    ## Erros possíveis (JSON):
+        Exportação ou parâmetros inválidos - 400
+        {
+            "msg": "Formato inválido. Use ndjson ou csv."
+        }
+    """
+    if nome not in EXPORTACOES:
+        return jsonify({"msg": f"Exportação inválida. Use {', '.join(EXPORTACOES)}."}), 400
+    formato = request.args.get('formato', 'ndjson')
+    if formato not in FORMATOS:
+        return jsonify({"msg": "Formato inválido. Use ndjson ou csv."}), 400
+
+    try:
+        desde_id = int(request.args['desde_id']) if request.args.get('desde_id') else None
+        desde = datetime.fromisoformat(request.args['desde']) if request.args.get('desde') else None
+    except ValueError:
+        return jsonify({"msg": "desde_id deve ser inteiro e desde uma data ISO 8601."}), 400
+
+    try:
+        consulta = consulta_exportacao(nome, desde_id, desde)
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+
+    resposta = current_app.response_class(exportar(nome, formato, consulta), mimetype=FORMATOS[formato])
+    resposta.headers['Content-Disposition'] = f'attachment; filename="{nome}.{formato}"'
+    return resposta
+
+
+@bp.cli.command('reconstruir-saldos')
+def reconstruir_saldos():
+    """Recalcula os checkpoints do saldo do caixa a partir de todos os movimentos."""
+    db_session = local_session()
+    try:
+        total = recalcular_checkpoints(db_session)
+        db_session.commit()
+        print(f"Saldos reconstruídos: {total} checkpoints.")
+    except Exception:
+        db_session.rollback()
+        raise
+    finally:
+        db_session.close()
+
+
+@bp.route('/metrics', methods=['GET'])
+def exportar_metricas():
+    """
+    Métricas de todos os workers no formato texto do Prometheus.
+
+    ## Endpoint:
+        /metrics
+
+    ## Método:
+        GET
+
+    ## Autenticação:
+        Authorization: Bearer <SMARTSELL_METRICAS_TOKEN> (para o Prometheus)
+        ou o JWT de um administrador
+
+    ## Respostas:
+        Sem token ou token inválido - 401
+        Papel sem acesso - 403
+
+    ## Resposta (text/plain):
+        smartsell_http_requisicoes_total{endpoint="cardapio.listar_cardapio",metodo="GET",status="200"} 42
+        smartsell_http_duracao_segundos_bucket{endpoint="cardapio.listar_cardapio",le="0.005"} 40
+        smartsell_sql_consultas_por_requisicao_sum{endpoint="cardapio.listar_cardapio"} 3
+        smartsell_sql_duracao_segundos_total{endpoint="cardapio.listar_cardapio"} 0.012
+        smartsell_n_mais_1_total{endpoint="cardapio.listar_cardapio"} 0
+
+    Consultas lentas (SMARTSELL_SQL_LENTA_MS) e suspeitas de N+1
+    (SMARTSELL_N_MAIS_1_LIMITE) também vão para o log "smartsell.metricas".
+    """
+    cabecalho = request.headers.get('Authorization', '')
+    if METRICAS_TOKEN and hmac.compare_digest(cabecalho.encode(), f'Bearer {METRICAS_TOKEN}'.encode()):
+        return _texto_metricas()
+    return _metricas_administrador()
+
+
+@papel_requerido(*PAPEIS_ADMIN)
+def _metricas_administrador():
+    return _texto_metricas()
+
+
+def _texto_metricas():
+    return current_app.response_class(metricas.exportar(), mimetype='text/plain; version=0.0.4')
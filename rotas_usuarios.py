@@ -0,0 +1,324 @@
+import click
+import sqlalchemy
+from flask import Blueprint, current_app, request, jsonify
+from flask_jwt_extended import create_access_token
+from sqlalchemy import select
+
+from banco import sessao, local_session
+from models import Usuario
+from senhas import FilaSenhasCheia
+from autorizacao import papel_requerido, cache_identidades, PAPEIS_ADMIN
+from usuarios import ler_usuarios, importar_usuarios
+
+bp = Blueprint('usuarios', __name__, cli_group=None)
+
+LIMITE_USUARIOS_LOTE = 5000
+
+
+@bp.route('/login', methods=['POST'])
+def login():
+    """
+        API para login do usuário.
+
+        ## Endpoint:
+            /login
+
+        ## Método:
+            POST
+
+        ## Requisição (JSON):
+            {
+                "email": "usuario@exemplo.com",
+                "senha": "senha123"
+            }
+
+        ## Respostas (JSON):
+            Sucesso - 200 OK
+            ```json
+            {
+                "access_token": "eyJhbGciOiJIUzI1NiIsInR5cCI6...",
+                "papel": "admin",
+                "nome": "João Silva"
+            }
+            ```
+
+        ## Erros possíveis (JSON):
+
+        Credenciais inválidas - 401 Unauthorized
+            ```json
+            {
+                "msg": "Credenciais inválidas"
+            }
+            ```
+
+        Erro interno do servidor - 500 Internal Server Error
+            ```json
+            {
+                "msg": "Erro interno do servidor"
+            }
+            ```
+        """
+    data = request.get_json()
+    email = data.get('email')
+    senha = data.get('senha')
+
+    db_session = sessao()
+    try:
+        user = db_session.execute(
+            select(Usuario).where(Usuario.email == email)
+        ).scalar()
+
+        if user and user.check_senha(senha):
+            # Atualiza hashes antigos para os parâmetros configurados
+            if user.precisa_rehash():
+                try:
+                    user.set_senha_hash(senha)
+                    user.save(db_session)
+                except FilaSenhasCheia:
+                    pass  # tenta de novo no próximo login
+
+            # Gera o token JWT usando o email do usuário
+            access_token = create_access_token(identity=user.email)
+            return jsonify({
+                "access_token": access_token,
+                "papel": user.papel,
+                "nome": user.nome
+            }), 200
+
+        return jsonify({"msg": "Credenciais inválidas"}), 401
+
+    except FilaSenhasCheia as e:
+        return jsonify({"msg": str(e)}), 503, {"Retry-After": "1"}
+    except Exception:
+        current_app.logger.exception("Erro no login")
+        return jsonify({"msg": "Erro interno do servidor"}), 500
+
+
+@bp.route('/cadastro/usuario', methods=['POST'])
+@papel_requerido(*PAPEIS_ADMIN)
+def cadastro_usuario():
+    # Só administradores cadastram; o primeiro administrador de um banco
+    # novo vem da linha de comando: flask --app main criar-admin
+    db_session = sessao()
+    try:
+        data = request.get_json()
+        nome = data['nome']
+        telefone = data['telefone'].strip()
+        email = data['email'].strip()
+        senha = data['senha']
+        papel = data.get('papel', 'usuario')
+
+        # Validação dos campos obrigatórios
+        if not nome or not telefone or not email or not senha or not papel:
+            return jsonify({
+                "msg": "Nome, telefone, email e senha são obrigatórios."
+            }), 400
+
+        # Verifica se já existe usuário com o mesmo email
+        check_user = select(Usuario).where(Usuario.email == email)
+        user_exists = db_session.execute(check_user).scalar()
+        if user_exists:
+            return jsonify({
+                "msg": "Usuário já existente!"
+            }), 400
+
+        # Cria o usuário e define o hash da senha
+        new_user = Usuario(
+            nome=nome,
+            telefone=telefone,
+            email=email,
+            papel=papel)
+        new_user.set_senha_hash(senha)
+        new_user.save(db_session)
+
+        id_user = new_user.id
+        return jsonify({
+            "msg": "Usuário criado com sucesso!",
+            "user_id": id_user,
+        }), 201
+
+    except FilaSenhasCheia as e:
+        return jsonify({"msg": str(e)}), 503, {"Retry-After": "1"}
+    except Exception as e:
+        db_session.rollback()
+        return jsonify({
+            "msg": f"Erro ao cadastrar usuário: {str(e)}"
+        }), 500
+
+
+@bp.route('/cadastro/usuarios/lote', methods=['POST'])
+@papel_requerido(*PAPEIS_ADMIN)
+def cadastro_usuarios_lote():
+    """
+    API para cadastrar vários usuários de uma vez (equipe de uma nova franquia).
+
+    ## Endpoint:
+        /cadastro/usuarios/lote
+
+    ## Método:
+        POST
+
+    ## Requisição:
+        CSV (text/csv) com cabeçalho:
+            nome,telefone,email,senha,papel
+            Maria,11999990000,maria@exemplo.com,senha123,usuario
+
+        ou um usuário por linha em JSON (application/x-ndjson):
+            {"nome": "Maria", "telefone": "11999990000", "email": "maria@exemplo.com", "senha": "senha123"}
+
+    ## Respostas (JSON):
+        Processado - 200 (um resultado por linha do arquivo)
+        {
+            "total": 2,
+            "criados": 1,
+            "erros": 1,
+            "resultados": [
+                {"linha": 2, "status": "ok", "user_id": 10},
+                {"linha": 3, "status": "erro", "msg": "Já existe usuário com esse email."}
+            ]
+        }
+    """
+    db_session = sessao()
+    try:
+        formato = 'csv' if request.mimetype == 'text/csv' else 'jsonl'
+        registros = ler_usuarios(request.get_data(as_text=True), formato)
+
+        if not registros:
+            return jsonify({"msg": "Nenhum usuário enviado."}), 400
+        if len(registros) > LIMITE_USUARIOS_LOTE:
+            return jsonify({"msg": f"Envie no máximo {LIMITE_USUARIOS_LOTE} usuários por arquivo."}), 413
+
+        resultados = importar_usuarios(db_session, registros)
+        criados = sum(1 for resultado in resultados if resultado["status"] == "ok")
+
+        return jsonify({
+            "total": len(resultados),
+            "criados": criados,
+            "erros": len(resultados) - criados,
+            "resultados": resultados
+        }), 200
+
+    except Exception as e:
+        db_session.rollback()
+        return jsonify({"msg": f"Erro ao importar usuários: {str(e)}"}), 500
+
+
+@bp.route('/editar/usuario/<int:id>', methods=['PUT'])
+@papel_requerido(*PAPEIS_ADMIN)
+def editar_usuario(id):
+    db_session = sessao()
+    try:
+        data = request.get_json()
+        nome = data['nome']
+        telefone = data['telefone'].strip()
+        email = data['email'].strip()
+        senha = data['senha'].strip()
+        papel = data.get('papel', 'usuario')
+        status = data.get('status')
+
+        put_user = db_session.execute(select(Usuario).where(Usuario.id == id)).scalar()
+        if not put_user:
+            return jsonify({"msg": "Usuário não encontrado!"}), 404
+        email_antigo = put_user.email
+
+        email_exists = db_session.execute(select(Usuario).where(Usuario.email == email, Usuario.id != id)).scalar()
+        phone_exists = db_session.execute(
+            select(Usuario).where(Usuario.telefone == telefone, Usuario.id != id)).scalar()
+        if email_exists:
+            return jsonify({"msg": "Este email já está cadastrado!"}), 400
+        if phone_exists:
+            return jsonify({"msg": "Este telefone já está cadastrado!"}), 400
+
+        put_user.nome = data.get('nome', put_user.nome).strip() if data.get('nome') else put_user.nome
+        put_user.telefone = data.get('telefone', put_user.telefone).strip() if data.get(
+            'telefone') else put_user.telefone
+        put_user.email = data.get('email', put_user.email).strip() if data.get('email') else put_user.email
+        put_user.papel = data.get('papel', put_user.papel).strip() if data.get('papel') else put_user.papel
+
+        # status pode ser bool ou None, então só atualiza se estiver no JSON
+        if 'status' in data:
+            val = data['status']
+
+            # Aceita booleanos True/False diretamente
+            if val is True or val is False:
+                put_user.status = val
+            else:
+                # Converter para string para facilitar checagem
+                val_str = str(val).lower()
+
+                # Checa strings aceitas
+                if val_str == 'true' or val_str == '1':
+                    put_user.status = True
+                elif val_str == 'false' or val_str == '2':
+                    put_user.status = False
+                # Caso contrário, ignora a atualização para evitar erro
+
+        if data.get('senha'):
+            put_user.set_senha_hash(data['senha'].strip())
+
+        put_user.save(db_session)
+        # Papel, status ou email podem ter mudado: a próxima requisição relê do banco
+        cache_identidades.remover(email_antigo, put_user.email)
+
+        return jsonify({
+            "nome": put_user.nome,
+            "telefone": put_user.telefone,
+            "email": put_user.email,
+            "papel": put_user.papel,
+            "status": put_user.status,
+        }), 200
+
+    except sqlalchemy.exc.IntegrityError:
+        return jsonify({"msg": "O email ou telefone já estão cadastrados!"}), 400
+    except FilaSenhasCheia as e:
+        return jsonify({"msg": str(e)}), 503, {"Retry-After": "1"}
+    except Exception:
+        current_app.logger.exception("Erro inesperado ao editar usuário")
+        return jsonify({"msg": "Erro interno do servidor!"}), 500
+
+
+@bp.cli.command('importar-usuarios')
+@click.argument('arquivo', type=click.Path(exists=True, dir_okay=False))
+def importar_usuarios_arquivo(arquivo):
+    """Cadastra os usuários de um arquivo CSV ou JSONL (um por linha)."""
+    formato = 'csv' if arquivo.lower().endswith('.csv') else 'jsonl'
+    with open(arquivo, encoding='utf-8-sig') as f:
+        registros = ler_usuarios(f.read(), formato)
+
+    db_session = local_session()
+    try:
+        resultados = importar_usuarios(db_session, registros)
+    finally:
+        db_session.close()
+
+    for resultado in resultados:
+        if resultado["status"] == "erro":
+            print(f"Linha {resultado['linha']}: {resultado['msg']}")
+    criados = sum(1 for resultado in resultados if resultado["status"] == "ok")
+    print(f"{criados} usuários criados, {len(resultados) - criados} com erro.")
+
+
+@bp.cli.command('criar-admin')
+@click.option('--nome', prompt=True)
+@click.option('--telefone', prompt=True)
+@click.option('--email', prompt=True)
+@click.option('--senha', prompt=True, hide_input=True, confirmation_prompt=True)
+def criar_admin(nome, telefone, email, senha):
+    """Cadastra um administrador; é assim que um banco novo ganha o primeiro usuário."""
+    nome, telefone, email = nome.strip(), telefone.strip(), email.strip()
+    if not nome or not telefone or not email or not senha:
+        raise click.ClickException("Nome, telefone, email e senha são obrigatórios.")
+
+    db_session = local_session()
+    try:
+        if db_session.execute(select(Usuario.id).where(Usuario.email == email)).scalar():
+            raise click.ClickException("Usuário já existente!")
+        admin = Usuario(nome=nome, telefone=telefone, email=email, papel=PAPEIS_ADMIN[0])
+        admin.set_senha_hash(senha)
+        try:
+            admin.save(db_session)
+        except sqlalchemy.exc.IntegrityError:
+            raise click.ClickException("O nome, email ou telefone já estão cadastrados!")
+        print(f"Administrador {admin.email} criado (id {admin.id}).")
+    finally:
+        db_session.close()
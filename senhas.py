@@ -0,0 +1,115 @@
+import atexit
+import multiprocessing
+import os
+import threading
+
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+# Parâmetros do hash no formato do Werkzeug (o prefixo gravado antes do
+# primeiro '$'), por exemplo 'scrypt:32768:8:1' ou 'pbkdf2:sha256:600000'.
+# Hashes gravados com outro formato são refeitos no próximo login. Parâmetros
+# omitidos ('scrypt', 'pbkdf2:sha256') valem os padrões do Werkzeug.
+METODO_HASH = os.environ.get('SMARTSELL_HASH_METODO', 'scrypt:32768:8:1')
+TAMANHO_SALT = int(os.environ.get('SMARTSELL_HASH_SALT', 16))
+# 0 desliga o pool e calcula na própria thread (scripts, testes)
+PROCESSOS_HASH = int(os.environ.get('SMARTSELL_HASH_PROCESSOS', os.cpu_count() or 1))
+FILA_MAXIMA_HASH = int(os.environ.get('SMARTSELL_HASH_FILA', PROCESSOS_HASH * 4 or 1))
+
+
+class FilaSenhasCheia(Exception):
+    pass
+
+
+class PoolSenhas:
+    """Calcula os hashes de senha (lentos de propósito) num pool de processos.
+
+    Assim uma rajada de logins não prende o GIL das threads que atendem os
+    outros endpoints. No máximo `fila_maxima` hashes ficam pendentes; acima
+    disso FilaSenhasCheia é lançada e o endpoint responde 503.
+    """
+
+    def __init__(self, processos=PROCESSOS_HASH, fila_maxima=FILA_MAXIMA_HASH):
+        self.processos = processos
+        self._vagas = threading.BoundedSemaphore(fila_maxima)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def _obter_executor(self):
+        # Um executor criado antes de um fork não funciona no processo filho
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                # Importado só no primeiro hash: concurrent.futures.process
+                # fica fora da inicialização (ver tempo_inicializacao.py)
+                from concurrent.futures import ProcessPoolExecutor
+                # fork dentro de um worker com várias threads copia locks
+                # que outra thread pode estar segurando; o forkserver cria
+                # os processos a partir de um processo limpo
+                self._executor = ProcessPoolExecutor(max_workers=self.processos,
+                                                     mp_context=multiprocessing.get_context('forkserver'))
+                atexit.register(self._executor.shutdown)
+                self._pid = os.getpid()
+            return self._executor
+
+    def executar(self, funcao, *args):
+        if not self.processos:
+            return funcao(*args)
+
+        if not self._vagas.acquire(blocking=False):
+            raise FilaSenhasCheia("Muitas requisições de login no momento. Tente novamente em instantes.")
+        try:
+            futuro = self._obter_executor().submit(funcao, *args)
+        except Exception:
+            self._vagas.release()
+            raise
+        futuro.add_done_callback(lambda _: self._vagas.release())
+        return futuro.result()
+
+    def executar_lote(self, funcao, lista_args):
+        """Distribui muitos cálculos entre os processos de uma vez (importação em lote).
+
+        Não passa pela fila dos logins: quem chama já é uma operação pesada
+        e rara, feita por administrador.
+        """
+        if not self.processos or not lista_args:
+            return [funcao(*args) for args in lista_args]
+        colunas = list(zip(*lista_args))
+        tamanho_bloco = max(1, len(lista_args) // (self.processos * 4))
+        return list(self._obter_executor().map(funcao, *colunas, chunksize=tamanho_bloco))
+
+
+pool_senhas = PoolSenhas()
+
+
+def gerar_hash(senha):
+    return pool_senhas.executar(generate_password_hash, senha, METODO_HASH, TAMANHO_SALT)
+
+
+def gerar_hashes(senhas):
+    return pool_senhas.executar_lote(generate_password_hash,
+                                     [(senha, METODO_HASH, TAMANHO_SALT) for senha in senhas])
+
+
+def verificar_senha(senha_hash, senha):
+    return pool_senhas.executar(check_password_hash, senha_hash, senha)
+
+
+def normalizar_metodo(metodo):
+    """Completa o método com os parâmetros padrão, como o Werkzeug grava no hash.
+
+    'scrypt' vira 'scrypt:32768:8:1' e 'pbkdf2:sha256' vira
+    'pbkdf2:sha256:<iterações padrão>'.
+    """
+    nome, *parametros = metodo.split(':')
+    if nome == 'scrypt' and not parametros:
+        parametros = [str(2 ** 15), '8', '1']
+    elif nome == 'pbkdf2':
+        parametros = (parametros + ['sha256', str(DEFAULT_PBKDF2_ITERATIONS)][len(parametros):])
+    return ':'.join([nome] + parametros)
+
+
+METODO_HASH_NORMALIZADO = normalizar_metodo(METODO_HASH)
+
+
+def precisa_rehash(senha_hash):
+    return normalizar_metodo(senha_hash.split('$', 1)[0]) != METODO_HASH_NORMALIZADO
@@ -0,0 +1,82 @@
+import argparse
+import os
+import subprocess
+import sys
+
+# Mede o custo de importar a aplicação (o que cada worker novo paga antes de
+# atender a primeira requisição) com `python -X importtime` e sai com código
+# 1 se passar do orçamento:
+#
+#   python tempo_inicializacao.py
+#   python tempo_inicializacao.py --orcamento-ms 400 --rodadas 10
+#
+# O tempo depende da máquina; a contagem de módulos e a lista de módulos
+# proibidos não, e são o que pega a maioria das regressões (um import de
+# biblioteca pesada que ninguém usa).
+
+PASTA = os.path.dirname(os.path.abspath(__file__))
+ORCAMENTO_MS = float(os.environ.get('SMARTSELL_ORCAMENTO_IMPORTACAO_MS', 700))
+MAXIMO_MODULOS = int(os.environ.get('SMARTSELL_MAXIMO_MODULOS', 560))
+
+# Só podem ser importados sob demanda (ou nunca, no caso dos de teste)
+MODULOS_PROIBIDOS = (
+    'sqlalchemy.testing',
+    'flask_pydantic_spec',
+    'pydantic',
+    'unittest',
+    'concurrent.futures.process',
+)
+
+
+def medir(modulo='main'):
+    """Importa `modulo` num processo novo e devolve (ms acumulados, {módulo: µs acumulados})."""
+    # Importar não abre conexão com o banco, então o arquivo padrão serve
+    resultado = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {modulo}'],
+                               cwd=PASTA, capture_output=True, text=True, check=True)
+    modulos = {}
+    for linha in resultado.stderr.splitlines():
+        if not linha.startswith('import time:') or 'cumulative' in linha:
+            continue
+        _, acumulado, nome = linha[len('import time:'):].split('|')
+        modulos[nome.strip()] = int(acumulado)
+    return modulos[modulo] / 1000, modulos
+
+
+def verificar(rodadas=5, orcamento_ms=ORCAMENTO_MS, maximo_modulos=MAXIMO_MODULOS):
+    """Devolve (melhor tempo em ms, total de módulos, lista de problemas)."""
+    # A menor de várias rodadas: o ruído da máquina só aumenta o tempo
+    tempos, modulos = [], {}
+    for _ in range(rodadas):
+        tempo, modulos = medir()
+        tempos.append(tempo)
+    melhor = min(tempos)
+
+    problemas = []
+    if melhor > orcamento_ms:
+        problemas.append(f"importar main levou {melhor:.0f} ms (orçamento {orcamento_ms:.0f} ms)")
+    if len(modulos) > maximo_modulos:
+        problemas.append(f"{len(modulos)} módulos importados (máximo {maximo_modulos})")
+    for proibido in MODULOS_PROIBIDOS:
+        if any(nome == proibido or nome.startswith(proibido + '.') for nome in modulos):
+            problemas.append(f"{proibido} importado na inicialização")
+    return melhor, len(modulos), problemas
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Confere o tempo de importação da aplicação.")
+    parser.add_argument("--rodadas", type=int, default=5)
+    parser.add_argument("--orcamento-ms", type=float, default=ORCAMENTO_MS)
+    parser.add_argument("--maximo-modulos", type=int, default=MAXIMO_MODULOS)
+    parser.add_argument("--detalhes", action="store_true", help="lista os 20 módulos mais caros")
+    args = parser.parse_args()
+
+    melhor, total, problemas = verificar(args.rodadas, args.orcamento_ms, args.maximo_modulos)
+    print(f"import main: {melhor:.0f} ms, {total} módulos")
+    if args.detalhes:
+        _, modulos = medir()
+        for nome, micros in sorted(modulos.items(), key=lambda item: -item[1])[:20]:
+            print(f"{micros / 1000:8.1f} ms  {nome}")
+    for problema in problemas:
+        print(f"ACIMA DO ORÇAMENTO: {problema}")
+    if problemas:
+        sys.exit(1)
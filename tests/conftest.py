@@ -0,0 +1,121 @@
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+# banco.py lê a URL do ambiente na importação: o banco dos testes precisa
+# estar definido antes de importar qualquer módulo do projeto
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIRETORIO_TESTES = tempfile.mkdtemp(prefix='smartsell-testes-')
+os.environ['SMARTSELL_DATABASE_URL'] = f"sqlite:///{os.path.join(DIRETORIO_TESTES, 'testes.sqlite3')}"
+os.environ['SMARTSELL_HASH_PROCESSOS'] = '0'
+# A auditoria grava em segundo plano; os testes esperam a fila esvaziar
+os.environ['SMARTSELL_AUDITORIA_INTERVALO'] = '0.05'
+sys.path.insert(0, RAIZ)
+
+_nomes = itertools.count(1)
+
+
+@pytest.fixture(scope='session')
+def app():
+    from models import init_db
+    init_db()
+    from main import app
+    yield app
+
+    from auditoria import registro_auditoria
+    from banco import engine, engine_leitura
+    registro_auditoria.encerrar()
+    engine.dispose()
+    engine_leitura.dispose()
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(DIRETORIO_TESTES, ignore_errors=True)
+
+
+@pytest.fixture
+def cliente(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def db_session(app):
+    from banco import local_session
+    sessao = local_session()
+    yield sessao
+    sessao.close()
+
+
+def _criar_usuario(app, papel):
+    from flask_jwt_extended import create_access_token
+    from banco import local_session
+    from models import Usuario
+
+    numero = next(_nomes)
+    email = f"{papel}{numero}@testes.local"
+    sessao = local_session()
+    try:
+        usuario = Usuario(nome=f"{papel.title()} {numero}", telefone=f"1199{numero:07d}", email=email,
+                          senha_hash="scrypt:32768:8:1$teste$0", papel=papel)
+        sessao.add(usuario)
+        sessao.commit()
+        usuario_id = usuario.id
+    finally:
+        sessao.close()
+    with app.app_context():
+        token = create_access_token(identity=email)
+    return usuario_id, {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture(scope='session')
+def admin(app):
+    """(id, cabeçalhos) de um administrador."""
+    return _criar_usuario(app, 'admin')
+
+
+@pytest.fixture(scope='session')
+def caixa(app):
+    """(id, cabeçalhos) de um usuário comum."""
+    return _criar_usuario(app, 'caixa')
+
+
+@pytest.fixture(scope='session')
+def cozinha(app):
+    """(id, cabeçalhos) de um usuário da cozinha."""
+    return _criar_usuario(app, 'cozinha')
+
+
+@pytest.fixture
+def criar_usuario(app):
+    """Cria um usuário novo do papel pedido; devolve (id, cabeçalhos)."""
+    return lambda papel='usuario': _criar_usuario(app, papel)
+
+
+@pytest.fixture
+def criar_produto(app):
+    """Cria um produto ativo de receita {ingrediente: quantidade necessária}; devolve (produto_id, ingrediente_ids)."""
+    from banco import local_session
+    from models import Ingrediente, Produto, ProdutoIngrediente
+
+    def criar(estoques, necessarias, preco=10.0):
+        numero = next(_nomes)
+        sessao = local_session()
+        try:
+            ingredientes = [Ingrediente(nome=f"Ingrediente {numero}-{i}", unidade="kg", quantidade_estoque=estoque)
+                            for i, estoque in enumerate(estoques)]
+            produto = Produto(nome=f"Produto {numero}", descricao="Teste", preco=preco, categoria="Teste")
+            sessao.add_all(ingredientes + [produto])
+            sessao.flush()
+            sessao.add_all([ProdutoIngrediente(produto_id=produto.id, ingrediente_id=ingrediente.id,
+                                               quantidade_necessaria=necessaria)
+                            for ingrediente, necessaria in zip(ingredientes, necessarias)])
+            sessao.commit()
+            return produto.id, [ingrediente.id for ingrediente in ingredientes]
+        finally:
+            sessao.close()
+
+    return criar
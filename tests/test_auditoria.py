@@ -0,0 +1,89 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+import rotas_estoque
+from auditoria import registro_auditoria
+from banco import BUSY_TIMEOUT_MS, bloquear_escrita, engine
+
+
+def eventos(cliente, cabecalhos, consulta):
+    # A trilha é gravada em segundo plano: espera a fila esvaziar
+    registro_auditoria._obter_fila().join()
+    return cliente.get(f'/auditoria?{consulta}', headers=cabecalhos).get_json()["eventos"]
+
+
+def test_edicao_de_estoque_fica_na_trilha(cliente, admin, criar_produto):
+    _, (ingrediente_id,) = criar_produto([12.5], [1.0])
+    admin_id, cabecalhos = admin
+
+    resposta = cliente.put(f'/editar/item/id/{ingrediente_id}', json={"quantidade_estoque": 3}, headers=cabecalhos)
+
+    assert resposta.status_code == 200
+    evento, cadastro = eventos(cliente, cabecalhos, f'entidade=ingrediente&entidade_id={ingrediente_id}')
+    assert (evento["campo"], evento["valor_anterior"], evento["valor_novo"]) == ("quantidade_estoque", 12.5, 3.0)
+    assert (evento["usuario_id"], evento["origem"]) == (admin_id, "editar_ingrediente")
+    # O cadastro do ingrediente (fora de uma requisição) também entra, sem usuário
+    assert (cadastro["valor_anterior"], cadastro["valor_novo"], cadastro["usuario_id"]) == (None, 12.5, None)
+
+
+def test_edicao_le_o_estoque_anterior_com_o_lock_de_escrita(cliente, admin, criar_produto, monkeypatch):
+    _, (ingrediente_id,) = criar_produto([8.0], [1.0])
+    _, cabecalhos = admin
+    concorrente = []
+
+    def bloquear_e_tentar_gravar(db_session):
+        bloquear_escrita(db_session)
+        # Outro escritor no meio da edição não consegue mudar o estoque
+        with engine.connect() as conexao:
+            conexao.exec_driver_sql("PRAGMA busy_timeout=0")
+            try:
+                conexao.execute(text("UPDATE ingrediente SET quantidade_estoque = 99 WHERE id = :id"),
+                                {"id": ingrediente_id})
+                conexao.commit()
+                concorrente.append("gravou")
+            except OperationalError:
+                concorrente.append("bloqueado")
+            finally:
+                conexao.exec_driver_sql(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+
+    monkeypatch.setattr(rotas_estoque, 'bloquear_escrita', bloquear_e_tentar_gravar)
+    cliente.put(f'/editar/item/id/{ingrediente_id}', json={"quantidade_estoque": 2}, headers=cabecalhos)
+
+    assert concorrente == ["bloqueado"]
+    evento, cadastro = eventos(cliente, cabecalhos, f'entidade=ingrediente&entidade_id={ingrediente_id}')
+    assert (evento["valor_anterior"], evento["valor_novo"]) == (8.0, 2.0)
+
+
+def test_contagem_de_estoque_fica_na_trilha(cliente, admin, criar_produto):
+    _, (alterado, igual) = criar_produto([5.0, 7.0], [1.0, 1.0])
+    _, cabecalhos = admin
+
+    cliente.post('/estoque/contagem?modo=delta', data=f"ingrediente_id,quantidade\n{alterado},-2\n{igual},0\n",
+                 headers=cabecalhos, content_type='text/csv')
+
+    evento = eventos(cliente, cabecalhos, f'entidade=ingrediente&entidade_id={alterado}')[0]
+    assert (evento["valor_anterior"], evento["valor_novo"], evento["origem"]) == (5.0, 3.0, "importar_contagem_estoque")
+    # Sem mudança, só o evento do cadastro
+    assert [evento["origem"] for evento in eventos(cliente, cabecalhos,
+                                                   f'entidade=ingrediente&entidade_id={igual}')] == [None]
+
+
+def test_preco_de_item_novo_fica_na_trilha(cliente, admin, criar_produto):
+    _, (ingrediente_id,) = criar_produto([1.0], [1.0])
+    _, cabecalhos = admin
+
+    item = cliente.post('/cadastro/item/cardapio', json={
+        "nome": "Auditado", "preco": 12.0, "categoria": "Teste",
+        "ingredientes": [{"ingrediente_id": ingrediente_id, "quantidade_necessaria": 1}]
+    }, headers=cabecalhos).get_json()["item"]
+
+    evento, = eventos(cliente, cabecalhos, f'entidade=produto&entidade_id={item["id"]}')
+    assert (evento["campo"], evento["valor_anterior"], evento["valor_novo"]) == ("preco", None, 12.0)
+
+
+@pytest.mark.parametrize('comando', ["UPDATE auditoria SET valor_novo = 0", "DELETE FROM auditoria"])
+def test_trilha_so_aceita_inclusoes(comando):
+    with engine.connect() as conexao:
+        with pytest.raises(Exception, match="A auditoria só aceita inclusões."):
+            conexao.execute(text(comando))
@@ -0,0 +1,103 @@
+import pytest
+
+import autorizacao
+from autorizacao import CacheIdentidades, Identidade, cache_identidades
+from models import Usuario
+
+
+@pytest.fixture(autouse=True)
+def _cache_limpo():
+    cache_identidades.limpar()
+    yield
+    cache_identidades.limpar()
+
+
+class Carregador:
+    """carregar(email) de mentira, que conta as idas ao "banco"."""
+
+    def __init__(self):
+        self.lidos = []
+
+    def __call__(self, email):
+        self.lidos.append(email)
+        return Identidade(len(self.lidos), email, 'usuario', True)
+
+
+def editar(cliente, cabecalhos_admin, db_session, usuario_id, **campos):
+    usuario = db_session.get(Usuario, usuario_id)
+    corpo = dict({"nome": usuario.nome, "telefone": usuario.telefone, "email": usuario.email, "senha": ""},
+                 **campos)
+    resposta = cliente.put(f'/editar/usuario/{usuario_id}', json=corpo, headers=cabecalhos_admin)
+    assert resposta.status_code == 200
+    return resposta
+
+
+def test_cache_rele_depois_do_ttl(monkeypatch):
+    agora = [100.0]
+    monkeypatch.setattr(autorizacao.time, 'monotonic', lambda: agora[0])
+    cache, carregar = CacheIdentidades(ttl=60, tamanho_maximo=10), Carregador()
+
+    cache.obter('a@x', carregar)
+    agora[0] += 59
+    cache.obter('a@x', carregar)
+    agora[0] += 2
+    cache.obter('a@x', carregar)
+
+    assert carregar.lidos == ['a@x', 'a@x']
+
+
+def test_cache_descarta_o_menos_usado_acima_do_limite():
+    cache, carregar = CacheIdentidades(ttl=60, tamanho_maximo=2), Carregador()
+
+    for email in ('a@x', 'b@x', 'a@x', 'c@x'):
+        cache.obter(email, carregar)
+    # "a" foi usado depois de "b": "b" é o que sai
+    assert list(cache._entradas) == ['a@x', 'c@x']
+    for email in ('a@x', 'b@x'):
+        cache.obter(email, carregar)
+
+    # "a" voltou ao fim da fila antes de "b" entrar: agora sai "c"
+    assert carregar.lidos == ['a@x', 'b@x', 'c@x', 'b@x']
+    assert list(cache._entradas) == ['a@x', 'b@x']
+
+
+def test_cache_nao_guarda_usuario_inexistente():
+    cache = CacheIdentidades(ttl=60, tamanho_maximo=2)
+
+    assert cache.obter('nada@x', lambda email: None) is None
+    assert not cache._entradas
+
+
+def test_remover_descarta_o_cache_dos_outros_processos():
+    # Os workers compartilham o contador de geração (criado antes do fork)
+    este, outro, carregar = CacheIdentidades(), CacheIdentidades(), Carregador()
+    outro._geracao = este._geracao
+    este.obter('a@x', carregar)
+    outro.obter('b@x', carregar)
+
+    este.remover('a@x')
+    este.obter('c@x', carregar)
+    outro.obter('b@x', carregar)
+
+    assert carregar.lidos == ['a@x', 'b@x', 'c@x', 'b@x']
+    assert list(este._entradas) == ['c@x']
+
+
+def test_usuario_desativado_perde_o_acesso_na_hora(cliente, db_session, admin, criar_usuario):
+    usuario_id, cabecalhos = criar_usuario()
+    assert cliente.get('/pedidos/historico', headers=cabecalhos).status_code == 200
+
+    editar(cliente, admin[1], db_session, usuario_id, status=False)
+    resposta = cliente.get('/pedidos/historico', headers=cabecalhos)
+
+    assert resposta.status_code == 401
+    assert resposta.get_json()["msg"] == "Usuário inativo ou inexistente."
+
+
+def test_papel_alterado_vale_na_proxima_requisicao(cliente, db_session, admin, criar_usuario):
+    usuario_id, cabecalhos = criar_usuario('admin')
+    assert cliente.get('/auditoria', headers=cabecalhos).status_code == 200
+
+    editar(cliente, admin[1], db_session, usuario_id, papel='usuario')
+
+    assert cliente.get('/auditoria', headers=cabecalhos).status_code == 403
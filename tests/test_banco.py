@@ -0,0 +1,46 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+import banco
+from banco import criar_engine
+
+
+@pytest.fixture
+def engines(tmp_path):
+    url = f"sqlite:///{tmp_path / 'pragmas.sqlite3'}"
+    escrita = criar_engine(url)
+    leitura = criar_engine(url, somente_leitura=True)
+    yield escrita, leitura
+    escrita.dispose()
+    leitura.dispose()
+
+
+def pragmas(engine):
+    with engine.connect() as conexao:
+        return {nome: conexao.execute(text(f"PRAGMA {nome}")).scalar()
+                for nome in ('journal_mode', 'busy_timeout', 'synchronous', 'temp_store', 'query_only')}
+
+
+def test_conexao_nova_sai_com_os_pragmas_de_producao(engines):
+    escrita, leitura = engines
+
+    # synchronous NORMAL = 1, temp_store MEMORY = 2
+    assert pragmas(escrita) == {'journal_mode': 'wal', 'busy_timeout': banco.BUSY_TIMEOUT_MS,
+                                'synchronous': 1, 'temp_store': 2, 'query_only': 0}
+    assert pragmas(leitura) == {'journal_mode': 'wal', 'busy_timeout': banco.BUSY_TIMEOUT_MS,
+                                'synchronous': 1, 'temp_store': 2, 'query_only': 1}
+
+
+def test_engine_de_leitura_recusa_escrita(engines):
+    escrita, leitura = engines
+    with escrita.begin() as conexao:
+        conexao.execute(text("CREATE TABLE t (x INTEGER)"))
+
+    with leitura.connect() as conexao, pytest.raises(OperationalError, match="readonly"):
+        conexao.execute(text("INSERT INTO t VALUES (1)"))
+
+
+def test_so_aceita_sqlite():
+    with pytest.raises(ValueError, match="só roda sobre SQLite"):
+        criar_engine("postgresql://smartsell@localhost/smartsell")
@@ -0,0 +1,76 @@
+import pytest
+
+from models import Produto
+
+
+@pytest.fixture
+def produtos_busca(db_session):
+    """Itens com palavras que só existem nestes testes; devolve {nome: id}."""
+    produtos = [
+        Produto(nome="Pão de Queijo Zabumbê", descricao="Assado na hora", preco=6.0, categoria="Padaria"),
+        Produto(nome="Pizza Zabumbê", descricao="Calabresa e queijo", preco=40.0, categoria="Pizza"),
+        Produto(nome="Zabumbê Antigo", descricao="Fora do cardápio", preco=1.0, categoria="Padaria",
+                status=False),
+    ]
+    db_session.add_all(produtos)
+    db_session.commit()
+    yield {produto.nome: produto.id for produto in produtos}
+    for produto in produtos:
+        db_session.delete(produto)
+    db_session.commit()
+
+
+def buscar(cliente, consulta):
+    return cliente.get('/cardapio/busca', query_string=consulta)
+
+
+def nomes(resposta):
+    assert resposta.status_code == 200
+    return [item["nome"] for item in resposta.get_json()["resultados"]]
+
+
+def test_busca_ignora_acentos_e_aceita_prefixos(cliente, produtos_busca):
+    assert nomes(buscar(cliente, {"q": "pao de q zabumbe"})) == ["Pão de Queijo Zabumbê"]
+    assert nomes(buscar(cliente, {"q": "ZABUMB PÃO"})) == ["Pão de Queijo Zabumbê"]
+
+
+def test_busca_exige_todas_as_palavras_e_procura_na_descricao(cliente, produtos_busca):
+    assert nomes(buscar(cliente, {"q": "zabumbe calabresa"})) == ["Pizza Zabumbê"]
+    assert nomes(buscar(cliente, {"q": "zabumbe sushi"})) == []
+
+
+def test_busca_so_traz_itens_ativos_com_disponibilidade(cliente, produtos_busca):
+    resultados = buscar(cliente, {"q": "zabumbe"}).get_json()["resultados"]
+
+    assert sorted(item["nome"] for item in resultados) == ["Pizza Zabumbê", "Pão de Queijo Zabumbê"]
+    # Sem receita, sem limite de porções
+    assert all(item["porcoes_disponiveis"] is None and item["disponivel"] for item in resultados)
+
+
+def test_busca_acompanha_o_nome_alterado(cliente, db_session, produtos_busca):
+    produto = db_session.get(Produto, produtos_busca["Pizza Zabumbê"])
+    produto.nome = "Pizza Maracatu"
+    db_session.commit()
+
+    assert nomes(buscar(cliente, {"q": "maracatu"})) == ["Pizza Maracatu"]
+    assert nomes(buscar(cliente, {"q": "zabumbe pizza"})) == []
+
+
+def test_busca_respeita_o_limite(cliente, produtos_busca):
+    assert len(nomes(buscar(cliente, {"q": "zabumbe", "limit": 1}))) == 1
+
+
+def test_operadores_do_fts_digitados_pelo_usuario_nao_quebram_a_busca(cliente, produtos_busca):
+    assert nomes(buscar(cliente, {"q": '"zabumbe" (pizza* -'})) == ["Pizza Zabumbê"]
+
+
+@pytest.mark.parametrize('consulta, mensagem', [
+    ({}, "Informe o que buscar em 'q'."),
+    ({"q": "!!! ?"}, "Informe o que buscar em 'q'."),
+    ({"q": "pizza", "limit": 0}, "limit deve estar entre 1 e 500."),
+])
+def test_busca_invalida(cliente, consulta, mensagem):
+    resposta = buscar(cliente, consulta)
+
+    assert resposta.status_code == 400
+    assert resposta.get_json()["msg"] == mensagem
@@ -0,0 +1,68 @@
+import pytest
+from sqlalchemy import func, select
+
+from banco import engine
+from caixa import VALOR_MOVIMENTO, recalcular_checkpoints
+
+
+def saldo(cliente, cabecalhos, consulta=''):
+    resposta = cliente.get(f'/relatorios/caixa/saldo?{consulta}', headers=cabecalhos)
+    assert resposta.status_code == 200
+    return resposta.get_json()["saldo"]
+
+
+def sincronizar(cliente, cabecalhos, produto_id, *datas):
+    resposta = cliente.post('/pedidos/lote', json=[{"produto_id": produto_id, "quantidade": 1, "data": data}
+                                                    for data in datas], headers=cabecalhos)
+    assert all(resultado["status"] == "ok" for resultado in resposta.get_json()["resultados"])
+
+
+def test_saldo_em_um_momento_e_no_fechamento_do_dia(cliente, admin, caixa, criar_produto):
+    produto_id, _ = criar_produto([100.0], [1.0], preco=10.0)
+    base = saldo(cliente, admin[1], 'dia=2020-01-09')
+
+    sincronizar(cliente, caixa[1], produto_id, "2020-01-10T10:00:00", "2020-01-10T15:00:00", "2020-01-12T09:00:00")
+
+    assert saldo(cliente, admin[1], 'em=2020-01-10T12:00:00') == pytest.approx(base + 10)
+    assert saldo(cliente, admin[1], 'dia=2020-01-10') == pytest.approx(base + 20)
+    assert saldo(cliente, admin[1], 'dia=2020-01-11') == pytest.approx(base + 20)
+    assert saldo(cliente, admin[1], 'em=2020-01-12T09:00:00') == pytest.approx(base + 30)
+
+
+def test_venda_antiga_sincronizada_depois_entra_nos_dias_seguintes(cliente, admin, caixa, criar_produto):
+    produto_id, _ = criar_produto([100.0], [1.0], preco=5.0)
+    sincronizar(cliente, caixa[1], produto_id, "2020-02-10T10:00:00")
+    antes = saldo(cliente, admin[1], 'dia=2020-02-10')
+
+    sincronizar(cliente, caixa[1], produto_id, "2020-02-03T10:00:00")
+
+    assert saldo(cliente, admin[1], 'dia=2020-02-10') == pytest.approx(antes + 5)
+
+
+def test_saldo_atual_bate_com_a_soma_dos_movimentos(cliente, admin, caixa, criar_produto):
+    produto_id, _ = criar_produto([100.0], [1.0], preco=7.5)
+    cliente.post('/pedido', json={"produto_id": produto_id}, headers=caixa[1])
+    with engine.connect() as conexao:
+        total = round(conexao.execute(select(func.sum(VALOR_MOVIMENTO))).scalar(), 2)
+
+    assert saldo(cliente, admin[1]) == pytest.approx(total)
+
+
+def test_recalcular_checkpoints_mantem_os_saldos(cliente, admin, caixa, criar_produto):
+    produto_id, _ = criar_produto([100.0], [1.0], preco=3.0)
+    sincronizar(cliente, caixa[1], produto_id, "2020-03-01T08:00:00", "2020-03-04T08:00:00")
+    consultas = ['dia=2020-03-01', 'dia=2020-03-03', 'em=2020-03-04T09:00:00', '']
+    antes = [saldo(cliente, admin[1], consulta) for consulta in consultas]
+
+    with engine.begin() as conexao:
+        recalcular_checkpoints(conexao)
+
+    assert [saldo(cliente, admin[1], consulta) for consulta in consultas] == pytest.approx(antes)
+
+
+@pytest.mark.parametrize('consulta', ['em=ontem', 'dia=2020-13-01'])
+def test_data_invalida(cliente, admin, consulta):
+    resposta = cliente.get(f'/relatorios/caixa/saldo?{consulta}', headers=admin[1])
+
+    assert resposta.status_code == 400
+    assert resposta.get_json()["msg"] == "Data inválida. Use o formato ISO 8601."
@@ -0,0 +1,74 @@
+from sqlalchemy import func, select
+
+from models import Produto, ProdutoIngrediente
+
+
+def receita(db_session, produto_id):
+    return sorted(db_session.execute(
+        select(ProdutoIngrediente.ingrediente_id, ProdutoIngrediente.quantidade_necessaria)
+        .where(ProdutoIngrediente.produto_id == produto_id)
+    ).all())
+
+
+def test_cardapio_em_lote_grava_cada_receita_no_seu_item(cliente, db_session, admin, criar_produto):
+    _, (farinha, queijo) = criar_produto([10.0, 10.0], [1.0, 1.0])
+    _, cabecalhos = admin
+    itens = [
+        {"nome": "Lote Pizza Queijo", "preco": 30, "categoria": "Pizza",
+         "ingredientes": [{"ingrediente_id": farinha, "quantidade_necessaria": 0.3},
+                          {"ingrediente_id": queijo, "quantidade_necessaria": 0.2}]},
+        {"nome": "Lote Pão", "preco": "4.5", "categoria": "Padaria",
+         "ingredientes": [{"produto_id": farinha, "quantidade_necessaria": 0.1}]},
+    ]
+
+    resposta = cliente.post('/cadastro/cardapio/lote', json={"itens": itens}, headers=cabecalhos)
+
+    assert resposta.status_code == 201
+    pizza, pao = resposta.get_json()["itens"]
+    assert (pizza["nome"], pao["nome"], pao["preco"]) == ("Lote Pizza Queijo", "Lote Pão", 4.5)
+    assert db_session.get(Produto, pizza["id"]).nome == "Lote Pizza Queijo"
+    assert receita(db_session, pizza["id"]) == [(farinha, 0.3), (queijo, 0.2)]
+    assert receita(db_session, pao["id"]) == [(farinha, 0.1)]
+
+
+def test_cardapio_em_lote_com_erro_nao_grava_nada(cliente, db_session, admin, criar_produto):
+    produto_id, (farinha,) = criar_produto([10.0], [1.0])
+    existente = db_session.get(Produto, produto_id).nome
+    _, cabecalhos = admin
+    antes = db_session.execute(select(func.count(Produto.id))).scalar()
+    itens = [
+        {"nome": "Lote Válido", "preco": 10, "categoria": "Teste",
+         "ingredientes": [{"ingrediente_id": farinha, "quantidade_necessaria": 1}]},
+        {"nome": existente, "preco": 10, "categoria": "Teste",
+         "ingredientes": [{"ingrediente_id": farinha, "quantidade_necessaria": 1}]},
+        {"nome": "Lote Sem Ingrediente", "preco": 10, "categoria": "Teste",
+         "ingredientes": [{"ingrediente_id": 999999, "quantidade_necessaria": 1}]},
+        {"nome": "Lote Válido", "preco": 10, "categoria": "Teste",
+         "ingredientes": [{"ingrediente_id": farinha, "quantidade_necessaria": 1}]},
+    ]
+
+    resposta = cliente.post('/cadastro/cardapio/lote', json={"itens": itens}, headers=cabecalhos)
+
+    assert resposta.status_code == 400
+    assert resposta.get_json()["erros"] == [
+        {"indice": 1, "msg": "Já existe um item com esse nome no cardápio."},
+        {"indice": 2, "msg": "Ingrediente com id 999999 não encontrado."},
+        {"indice": 3, "msg": "Já existe um item com esse nome no cardápio."},
+    ]
+    assert db_session.execute(select(func.count(Produto.id))).scalar() == antes
+
+
+def test_cardapio_em_lote_valida_cada_item_antes_de_consultar(cliente, admin):
+    _, cabecalhos = admin
+
+    resposta = cliente.post('/cadastro/cardapio/lote', json={"itens": [
+        {"nome": "Lote Sem Preço", "categoria": "Teste", "ingredientes": [{"ingrediente_id": 1,
+                                                                           "quantidade_necessaria": 1}]},
+        "não é um item",
+    ]}, headers=cabecalhos)
+
+    assert resposta.status_code == 400
+    assert resposta.get_json()["erros"] == [
+        {"indice": 0, "msg": "Todos os campos são obrigatórios."},
+        {"indice": 1, "msg": "Cada item do cardápio deve ser um objeto JSON."},
+    ]
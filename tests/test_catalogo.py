@@ -0,0 +1,159 @@
+import threading
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+import banco
+import catalogo
+from catalogo import cache_catalogo
+from models import Produto
+
+
+@pytest.fixture
+def cardapio_grande(criar_produto):
+    # Corpo acima de TAMANHO_MINIMO, para que o catálogo vá comprimido
+    for _ in range(12):
+        criar_produto([10.0], [1.0])
+
+
+def etag(resposta):
+    return resposta.get_etag()[0]
+
+
+def test_cardapio_responde_304_com_a_etag_atual(cliente, cardapio_grande):
+    primeira = cliente.get('/cardapio')
+
+    segunda = cliente.get('/cardapio', headers={"If-None-Match": primeira.headers['ETag']})
+
+    assert primeira.status_code == 200
+    assert segunda.status_code == 304
+    assert segunda.get_data() == b""
+    assert etag(segunda) == etag(primeira)
+    assert 'Accept-Encoding' in segunda.vary
+
+
+def test_etag_muda_quando_o_catalogo_muda(cliente, admin, criar_produto, cardapio_grande):
+    _, (ingrediente_id,) = criar_produto([10.0], [1.0])
+    anterior = cliente.get('/cardapio').headers['ETag']
+
+    cliente.put(f'/editar/item/id/{ingrediente_id}', json={"quantidade_estoque": 3}, headers=admin[1])
+    resposta = cliente.get('/cardapio', headers={"If-None-Match": anterior})
+
+    assert resposta.status_code == 200
+    assert resposta.headers['ETag'] != anterior
+
+
+def test_etag_comprimida_so_vale_para_quem_aceita_a_codificacao(cliente, cardapio_grande):
+    comprimida = cliente.get('/cardapio', headers={"Accept-Encoding": "gzip"})
+    assert comprimida.headers['Content-Encoding'] == 'gzip'
+    assert etag(comprimida).endswith('-gzip')
+
+    mesma = cliente.get('/cardapio', headers={"Accept-Encoding": "gzip",
+                                              "If-None-Match": comprimida.headers['ETag']})
+    sem_gzip = cliente.get('/cardapio', headers={"If-None-Match": comprimida.headers['ETag']})
+
+    assert mesma.status_code == 304
+    assert sem_gzip.status_code == 200
+    assert 'Content-Encoding' not in sem_gzip.headers
+    assert etag(sem_gzip) == etag(comprimida)[:-len('-gzip')]
+
+
+def test_etag_sem_compressao_nao_vale_para_a_resposta_comprimida(cliente, cardapio_grande):
+    simples = cliente.get('/cardapio')
+
+    resposta = cliente.get('/cardapio', headers={"Accept-Encoding": "gzip", "If-None-Match": simples.headers['ETag']})
+
+    assert resposta.status_code == 200
+    assert etag(resposta) == f"{etag(simples)}-gzip"
+
+
+@contextmanager
+def consultas():
+    """Conta os comandos SQL (nas duas engines) que esta thread executa dentro do bloco."""
+    comandos = []
+    # A auditoria grava em segundo plano, em outra thread
+    thread = threading.get_ident()
+
+    def contar(conexao, cursor, sql, *args):
+        if threading.get_ident() == thread:
+            comandos.append(sql)
+
+    for engine in (banco.engine, banco.engine_leitura):
+        event.listen(engine, 'before_cursor_execute', contar)
+    try:
+        yield comandos
+    finally:
+        for engine in (banco.engine, banco.engine_leitura):
+            event.remove(engine, 'before_cursor_execute', contar)
+
+
+@pytest.fixture
+def montagens(monkeypatch):
+    """Quantas vezes a parte fixa do cardápio foi montada (lida do banco)."""
+    chamadas = []
+    original = catalogo.montar_partes_cardapio
+
+    def montar(db_session):
+        chamadas.append(1)
+        return original(db_session)
+
+    monkeypatch.setattr(catalogo, 'montar_partes_cardapio', montar)
+    return chamadas
+
+
+def test_pedido_nao_remonta_a_parte_fixa_do_cardapio(cliente, caixa, criar_produto, montagens):
+    produto_id, _ = criar_produto([10.0], [1.0])
+    cliente.get('/cardapio')
+    versao_estatica = cache_catalogo.versao_estatica
+
+    cliente.post('/pedido', json={"produto_id": produto_id}, headers=caixa[1])
+    with consultas() as comandos:
+        item, = [item for item in cliente.get('/cardapio').get_json()["cardapio"] if item["id"] == produto_id]
+
+    assert item["porcoes_disponiveis"] == 9
+    assert cache_catalogo.versao_estatica == versao_estatica
+    assert montagens == [1]
+    # As porções vêm do motor em memória, já atualizado pelo próprio pedido
+    assert comandos == []
+
+
+def test_edicao_so_de_estoque_nao_remonta_a_parte_fixa(cliente, admin, criar_produto, montagens):
+    _, (ingrediente_id,) = criar_produto([10.0], [1.0])
+    cliente.get('/cardapio')
+
+    cliente.put(f'/editar/item/id/{ingrediente_id}', json={"quantidade_estoque": 4}, headers=admin[1])
+    cliente.get('/cardapio')
+
+    assert montagens == [1]
+
+
+def test_mudanca_de_produto_remonta_a_parte_fixa(cliente, db_session, criar_produto, montagens):
+    produto_id, _ = criar_produto([10.0], [1.0])
+    cliente.get('/cardapio')
+
+    db_session.get(Produto, produto_id).preco = 12.5
+    db_session.commit()
+    item, = [item for item in cliente.get('/cardapio').get_json()["cardapio"] if item["id"] == produto_id]
+
+    assert item["preco"] == 12.5
+    assert montagens == [1, 1]
+
+
+def test_cardapio_custa_as_mesmas_consultas_com_mais_produtos(cliente, criar_produto):
+    def consultas_cardapio_frio():
+        # Produto novo com receita: parte fixa e motor de disponibilidade recarregam
+        criar_produto([10.0], [1.0])
+        with consultas() as comandos:
+            assert cliente.get('/cardapio').status_code == 200
+        return len(comandos)
+
+    antes = consultas_cardapio_frio()
+    for _ in range(15):
+        criar_produto([10.0, 5.0], [1.0, 0.5])
+    depois = consultas_cardapio_frio()
+
+    assert depois == antes
+    with consultas() as comandos:
+        cliente.get('/cardapio')
+    assert comandos == []
@@ -0,0 +1,67 @@
+import gzip
+
+import pytest
+from werkzeug.test import EnvironBuilder
+from werkzeug.wrappers import Request
+
+import compressao
+
+
+@pytest.fixture
+def cardapio_grande(criar_produto):
+    for _ in range(12):
+        criar_produto([10.0], [1.0])
+
+
+def requisicao(accept_encoding):
+    return Request(EnvironBuilder(headers={"Accept-Encoding": accept_encoding}).get_environ())
+
+
+@pytest.mark.parametrize('accept_encoding, esperada', [
+    ('gzip, deflate', 'gzip'),
+    ('gzip;q=0', None),
+    ('identity', None),
+    ('', None),
+])
+def test_escolher_codificacao(accept_encoding, esperada):
+    assert compressao.escolher_codificacao(requisicao(accept_encoding)) == esperada
+
+
+def test_gzip_gera_sempre_os_mesmos_bytes():
+    corpo = b'{"itens": []}' * 200
+
+    assert compressao.comprimir(corpo, 'gzip') == compressao.comprimir(corpo, 'gzip')
+    assert gzip.decompress(compressao.comprimir(corpo, 'gzip')) == corpo
+
+
+def test_json_grande_vai_comprimido(cliente, cardapio_grande):
+    simples = cliente.get('/cardapio?limit=500')
+
+    resposta = cliente.get('/cardapio?limit=500', headers={"Accept-Encoding": "gzip"})
+
+    assert len(simples.get_data()) >= compressao.TAMANHO_MINIMO
+    assert resposta.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in resposta.vary
+    assert gzip.decompress(resposta.get_data()) == simples.get_data()
+
+
+def test_json_pequeno_vai_sem_compressao(cliente):
+    resposta = cliente.get('/cardapio/busca?q=nadaparecidocomisto', headers={"Accept-Encoding": "gzip"})
+
+    assert len(resposta.get_data()) < compressao.TAMANHO_MINIMO
+    assert 'Content-Encoding' not in resposta.headers
+    assert 'Accept-Encoding' in resposta.vary
+
+
+def test_sem_accept_encoding_nao_comprime(cliente, cardapio_grande):
+    resposta = cliente.get('/cardapio?limit=500')
+
+    assert 'Content-Encoding' not in resposta.headers
+    assert resposta.get_json()["cardapio"]
+
+
+def test_streaming_passa_sem_compressao(cliente, admin):
+    resposta = cliente.get('/exportar/ingredientes', headers=dict(admin[1], **{"Accept-Encoding": "gzip"}))
+
+    assert resposta.status_code == 200
+    assert 'Content-Encoding' not in resposta.headers
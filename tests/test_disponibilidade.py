@@ -0,0 +1,60 @@
+from sqlalchemy import text
+
+from banco import engine
+from catalogo import cache_catalogo
+
+
+def disponibilidade(cliente, produto_id):
+    item, = [item for item in cliente.get('/cardapio').get_json()["cardapio"] if item["id"] == produto_id]
+    return item["porcoes_disponiveis"], item["disponivel"]
+
+
+def test_porcoes_seguem_o_ingrediente_mais_escasso(cliente, criar_produto):
+    produto_id, _ = criar_produto([1.0, 10.0], [0.3, 1.0])
+
+    assert disponibilidade(cliente, produto_id) == (3, True)
+
+
+def test_produto_sem_receita_nao_tem_limite(cliente, criar_produto):
+    produto_id, _ = criar_produto([], [])
+
+    assert disponibilidade(cliente, produto_id) == (None, True)
+
+
+def test_pedido_reduz_as_porcoes(cliente, caixa, criar_produto):
+    produto_id, _ = criar_produto([1.0], [0.4])
+    assert disponibilidade(cliente, produto_id) == (2, True)
+
+    cliente.post('/pedido', json={"produto_id": produto_id, "quantidade": 2}, headers=caixa[1])
+
+    assert disponibilidade(cliente, produto_id) == (0, False)
+
+
+def test_edicao_de_estoque_atualiza_so_os_produtos_do_ingrediente(cliente, admin, criar_produto):
+    produto_id, (ingrediente_id,) = criar_produto([2.0], [1.0])
+    outro_id, _ = criar_produto([5.0], [1.0])
+
+    cliente.put(f'/editar/item/id/{ingrediente_id}', json={"quantidade_estoque": 7}, headers=admin[1])
+
+    assert disponibilidade(cliente, produto_id) == (7, True)
+    assert disponibilidade(cliente, outro_id) == (5, True)
+
+
+def test_ingrediente_inativo_conta_como_estoque_zerado(cliente, admin, criar_produto):
+    produto_id, (ingrediente_id,) = criar_produto([5.0], [1.0])
+
+    cliente.put(f'/editar/item/id/{ingrediente_id}', json={"status": False}, headers=admin[1])
+
+    assert disponibilidade(cliente, produto_id) == (0, False)
+
+
+def test_gravacao_de_outro_processo_e_relida_pela_versao(cliente, criar_produto):
+    produto_id, (ingrediente_id,) = criar_produto([5.0], [1.0])
+    assert disponibilidade(cliente, produto_id) == (5, True)
+
+    # Como outro worker faria: grava direto e publica o ingrediente alterado
+    with engine.begin() as conexao:
+        conexao.execute(text("UPDATE ingrediente SET quantidade_estoque = 1 WHERE id = :id"), {"id": ingrediente_id})
+    cache_catalogo.invalidar(apenas_estoque=True, ingredientes=[ingrediente_id])
+
+    assert disponibilidade(cliente, produto_id) == (1, True)
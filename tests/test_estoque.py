@@ -0,0 +1,117 @@
+import io
+import json
+
+import pytest
+
+from banco import local_session
+from estoque import aplicar_contagem, ler_linhas_contagem
+from models import Ingrediente
+
+
+def estoques(db_session, ids):
+    db_session.expire_all()
+    return [db_session.get(Ingrediente, ingrediente_id).quantidade_estoque for ingrediente_id in ids]
+
+
+def nome(db_session, ingrediente_id):
+    return db_session.get(Ingrediente, ingrediente_id).nome
+
+
+def test_contagem_absoluta_por_nome_ou_id(cliente, db_session, admin, criar_produto):
+    _, (primeiro, segundo) = criar_produto([10.0, 10.0], [1.0, 1.0])
+    arquivo = "\n".join([
+        "ingrediente,ingrediente_id,quantidade",
+        f"{nome(db_session, primeiro).upper()},,\"3,5\"",
+        f",{segundo},42",
+        "Rúcula Inexistente,,1",
+        f",{segundo},-1",
+        f",{segundo},muito",
+    ])
+
+    resposta = cliente.post('/estoque/contagem', data=arquivo, headers=admin[1], content_type='text/csv')
+
+    assert resposta.status_code == 200
+    assert resposta.get_json() == {
+        "linhas": 5, "aplicadas": 2, "erros": 3, "ingredientes_atualizados": 2,
+        "detalhes_erros": [
+            {"linha": 4, "msg": "Ingrediente 'Rúcula Inexistente' não encontrado."},
+            {"linha": 5, "msg": "Quantidade não pode ser negativa."},
+            {"linha": 6, "msg": "Quantidade inválida."},
+        ],
+    }
+    assert estoques(db_session, [primeiro, segundo]) == [3.5, 42.0]
+
+
+def test_contagem_delta_soma_e_nao_deixa_negativo(cliente, db_session, admin, criar_produto):
+    _, (primeiro, segundo) = criar_produto([10.0, 2.0], [1.0, 1.0])
+    arquivo = "\n".join([
+        json.dumps({"ingrediente_id": primeiro, "quantidade": 5}),
+        json.dumps({"ingrediente_id": primeiro, "quantidade": -1}),
+        "",
+        json.dumps({"ingrediente": nome(db_session, segundo), "quantidade": -7}),
+        "{quebrado",
+    ])
+
+    resposta = cliente.post('/estoque/contagem?modo=delta', data=arquivo, headers=admin[1],
+                            content_type='application/x-ndjson')
+
+    corpo = resposta.get_json()
+    assert (corpo["aplicadas"], corpo["erros"]) == (3, 1)
+    assert corpo["detalhes_erros"] == [{"linha": 5, "msg": "Linha não é um JSON válido."}]
+    assert estoques(db_session, [primeiro, segundo]) == [14.0, 0.0]
+
+
+def test_contagem_aplica_em_blocos(db_session, criar_produto):
+    _, ids = criar_produto([1.0] * 5, [1.0] * 5)
+    arquivo = io.StringIO("ingrediente_id,quantidade\n" + "".join(f"{i},{n}\n" for n, i in enumerate(ids)))
+    sessao = local_session()
+    try:
+        resumo = aplicar_contagem(sessao, ler_linhas_contagem(arquivo), tamanho_bloco=2)
+    finally:
+        sessao.close()
+
+    assert (resumo["aplicadas"], resumo["ingredientes_atualizados"]) == (5, 5)
+    assert estoques(db_session, ids) == [0.0, 1.0, 2.0, 3.0, 4.0]
+
+
+def test_contagem_com_modo_invalido(cliente, admin):
+    resposta = cliente.post('/estoque/contagem?modo=soma', data="ingrediente_id,quantidade\n",
+                            headers=admin[1], content_type='text/csv')
+
+    assert resposta.status_code == 400
+    assert resposta.get_json()["msg"] == "Modo inválido. Use absoluto ou delta."
+
+
+@pytest.mark.parametrize('registro, mensagem', [
+    ({"quantidade": 1}, "Informe ingrediente ou ingrediente_id."),
+    ({"ingrediente_id": "x", "quantidade": 1}, "ingrediente_id inválido."),
+    ({"ingrediente_id": 999999, "quantidade": 1}, "Ingrediente com id 999999 não encontrado."),
+])
+def test_contagem_aponta_linhas_invalidas(cliente, admin, registro, mensagem):
+    resposta = cliente.post('/estoque/contagem', data=json.dumps(registro), headers=admin[1],
+                            content_type='application/x-ndjson')
+
+    assert resposta.get_json()["detalhes_erros"] == [{"linha": 1, "msg": mensagem}]
+
+
+def corpo_gunicorn(dados):
+    # O request.stream que o Flask recebe sob o gunicorn (wsgi.input_terminated):
+    # sem readable()/readinto(), só read() e readline()
+    pytest.importorskip('gunicorn')  # fora do Windows, como no requirements.txt
+    from gunicorn.http.body import Body, LengthReader
+    from gunicorn.http.unreader import IterUnreader
+    pedacos = [dados[inicio:inicio + 7] for inicio in range(0, len(dados), 7)]
+    return Body(LengthReader(IterUnreader(pedacos), len(dados)))
+
+
+def test_contagem_le_o_corpo_do_gunicorn(cliente, db_session, admin, criar_produto):
+    _, (primeiro, segundo) = criar_produto([10.0, 10.0], [1.0, 1.0])
+    dados = ("\ufeffingrediente,ingrediente_id,quantidade\r\n"
+             f"{nome(db_session, primeiro)},,\"1,5\"\r\n,{segundo},8\r\n").encode('utf-8')
+
+    resposta = cliente.post('/estoque/contagem', headers=admin[1], content_type='text/csv', environ_overrides={
+        "wsgi.input": corpo_gunicorn(dados), "wsgi.input_terminated": True})
+
+    assert resposta.status_code == 200
+    assert resposta.get_json()["aplicadas"] == 2
+    assert estoques(db_session, [primeiro, segundo]) == [1.5, 8.0]
@@ -0,0 +1,183 @@
+import json
+import os
+import runpy
+
+import autorizacao
+from conftest import RAIZ
+from eventos import CanalEventos, canal_pedidos, ler_ultimo_id
+from models import Produto
+
+
+def eventos_novos(desde):
+    eventos, _ = canal_pedidos.eventos_desde(desde)
+    return [(tipo, json.loads(dados)) for _, tipo, dados in eventos]
+
+
+def test_canal_continua_do_ultimo_id():
+    canal = CanalEventos(tamanho=8, maximo_conexoes=1)
+    primeiro = canal.publicar('pedido_criado', {"id": 1})
+    canal.publicar_varios('pedido_status', [{"id": 1, "status": "em_preparo"}, {"id": 1, "status": "pronto"}])
+
+    eventos, completo = canal.eventos_desde(primeiro)
+
+    assert completo
+    assert [(evento_id, tipo) for evento_id, tipo, _ in eventos] == [(2, 'pedido_status'), (3, 'pedido_status')]
+    assert json.loads(eventos[-1][2]) == {"id": 1, "status": "pronto"}
+
+
+def test_canal_avisa_quando_o_buffer_ja_descartou_eventos():
+    canal = CanalEventos(tamanho=4, maximo_conexoes=1)
+    canal.publicar_varios('pedido_criado', [{"id": numero} for numero in range(10)])
+
+    eventos, completo = canal.eventos_desde(2)
+    corpo = ''.join(canal.transmitir(2, duracao=0))
+
+    assert not completo
+    assert [evento_id for evento_id, _, _ in eventos] == [7, 8, 9, 10]
+    assert corpo.startswith("retry: 2000\n\nid: 6\nevent: reinicio\n")
+    assert corpo.endswith('id: 10\nevent: pedido_criado\ndata: {"id":9}\n\n')
+
+
+def test_canal_resume_evento_grande_demais():
+    canal = CanalEventos(tamanho=4, tamanho_evento=64, maximo_conexoes=1)
+    canal.publicar('pedido_criado', {"id": 7, "itens": ["x" * 100]})
+
+    eventos, _ = canal.eventos_desde(0)
+
+    assert json.loads(eventos[0][2]) == {"id": 7, "resumido": True}
+
+
+def test_ler_ultimo_id():
+    assert ler_ultimo_id("41") == 41
+    assert ler_ultimo_id("-3") == 0
+    assert ler_ultimo_id("abc") is None
+    assert ler_ultimo_id(None) is None
+
+
+def test_pedido_e_mudanca_de_status_chegam_a_cozinha(cliente, db_session, admin, caixa, criar_produto):
+    produto_id, _ = criar_produto([10.0], [1.0])
+    caixa_id, cabecalhos = caixa
+    antes = canal_pedidos.ultimo_id
+
+    pedido = cliente.post('/pedido', json={"produto_id": produto_id, "quantidade": 2},
+                          headers=cabecalhos).get_json()["pedido"]
+    cliente.put(f"/pedido/{pedido['id']}/status", json={"status": "em_preparo"}, headers=admin[1])
+
+    criado, status = eventos_novos(antes)
+    assert criado[0] == 'pedido_criado'
+    assert (criado[1]["id"], criado[1]["usuario_id"], criado[1]["status"]) == (pedido["id"], caixa_id, "pendente")
+    assert criado[1]["itens"] == [{"produto_id": produto_id, "nome": db_session.get(Produto, produto_id).nome,
+                                   "quantidade": 2}]
+    assert status == ('pedido_status', {"id": pedido["id"], "status": "em_preparo"})
+
+
+def test_pedidos_sincronizados_em_lote_chegam_a_cozinha(cliente, caixa, criar_produto):
+    produto_id, _ = criar_produto([10.0], [1.0])
+    caixa_id, cabecalhos = caixa
+    antes = canal_pedidos.ultimo_id
+
+    resposta = cliente.post('/pedidos/lote', json=[
+        {"produto_id": produto_id, "quantidade": 1, "data": "2025-06-01T12:30:00"},
+        {"produto_id": 999999, "quantidade": 1},
+        {"itens": [{"produto_id": produto_id, "quantidade": 3}]},
+    ], headers=cabecalhos)
+
+    ids = [resultado.get("pedido_id") for resultado in resposta.get_json()["resultados"]]
+    eventos = eventos_novos(antes)
+    assert [tipo for tipo, _ in eventos] == ['pedido_criado', 'pedido_criado']
+    assert [dados["id"] for _, dados in eventos] == [ids[0], ids[2]]
+    assert eventos[0][1]["data"] == "2025-06-01T12:30:00"
+    assert eventos[1][1]["usuario_id"] == caixa_id
+    assert [item["quantidade"] for item in eventos[1][1]["itens"]] == [3]
+
+
+def test_eventos_transmite_a_partir_do_last_event_id(cliente, caixa):
+    _, cabecalhos = caixa
+    anterior = canal_pedidos.publicar('pedido_status', {"id": 1, "status": "pronto"})
+    canal_pedidos.publicar('pedido_status', {"id": 2, "status": "entregue"})
+
+    resposta = cliente.get('/pedidos/eventos', headers=dict(cabecalhos, **{"Last-Event-ID": str(anterior)}),
+                           buffered=False)
+    try:
+        partes = iter(resposta.response)
+        assert next(partes) == b"retry: 2000\n\n"
+        assert next(partes) == (f'id: {anterior + 1}\nevent: pedido_status\n'
+                                f'data: {{"id":2,"status":"entregue"}}\n\n').encode()
+    finally:
+        resposta.close()
+
+    assert resposta.mimetype == 'text/event-stream'
+    assert resposta.headers['Cache-Control'] == 'no-cache'
+
+
+def ticket(cliente, cabecalhos):
+    resposta = cliente.post('/pedidos/eventos/ticket', headers=cabecalhos)
+    assert resposta.status_code == 200
+    return resposta.get_json()["ticket"]
+
+
+def test_eventos_aceita_ticket_na_query_string(cliente, caixa):
+    resposta = cliente.get(f'/pedidos/eventos?ticket={ticket(cliente, caixa[1])}', buffered=False)
+    resposta.close()
+
+    assert resposta.status_code == 200
+
+
+def test_eventos_nao_aceita_mais_o_jwt_na_url(cliente, caixa):
+    token = caixa[1]["Authorization"].split()[1]
+
+    assert cliente.get(f'/pedidos/eventos?jwt={token}').status_code == 401
+
+
+def test_ticket_expirado_ou_alterado_e_recusado(cliente, caixa, monkeypatch):
+    valido = ticket(cliente, caixa[1])
+
+    alterado = cliente.get(f'/pedidos/eventos?ticket={valido[:-2]}xx')
+    monkeypatch.setattr(autorizacao, 'TICKET_TTL', -1)
+    expirado = cliente.get(f'/pedidos/eventos?ticket={valido}')
+
+    assert (alterado.status_code, expirado.status_code) == (401, 401)
+    assert expirado.get_json()["msg"] == "Ticket inválido ou expirado."
+
+
+def test_ticket_so_vale_para_os_eventos(cliente, caixa):
+    valido = ticket(cliente, caixa[1])
+
+    # Nem como JWT no cabeçalho, nem na URL de outro endpoint
+    assert cliente.get('/pedidos/historico', headers={"Authorization": f"Bearer {valido}"}).status_code == 422
+    assert cliente.get(f'/pedidos/historico?ticket={valido}').status_code == 401
+
+
+def test_log_de_acesso_nao_grava_a_query_string():
+    configuracao = runpy.run_path(os.path.join(RAIZ, 'gunicorn.conf.py'))
+
+    assert '%(r)s' not in configuracao['access_log_format']
+    assert '%(q)s' not in configuracao['access_log_format']
+    assert '%(U)s' in configuracao['access_log_format']
+
+
+def test_eventos_recusa_conexoes_acima_do_limite(cliente, caixa):
+    _, cabecalhos = caixa
+    for _ in range(canal_pedidos.maximo_conexoes):
+        canal_pedidos.reservar_conexao()
+    try:
+        resposta = cliente.get('/pedidos/eventos', headers=cabecalhos)
+    finally:
+        for _ in range(canal_pedidos.maximo_conexoes):
+            canal_pedidos.liberar_conexao()
+
+    assert resposta.status_code == 503
+    assert resposta.headers['Retry-After'] == "5"
+
+
+def test_so_cozinha_e_administrador_mudam_o_status(cliente, caixa, cozinha, criar_produto):
+    produto_id, _ = criar_produto([10.0], [1.0])
+    _, cabecalhos_caixa = caixa
+    pedido = cliente.post('/pedido', json={"produto_id": produto_id}, headers=cabecalhos_caixa).get_json()["pedido"]
+
+    recusada = cliente.put(f"/pedido/{pedido['id']}/status", json={"status": "pronto"}, headers=cabecalhos_caixa)
+    aceita = cliente.put(f"/pedido/{pedido['id']}/status", json={"status": "pronto"}, headers=cozinha[1])
+
+    assert recusada.status_code == 403
+    assert aceita.status_code == 200
+    assert aceita.get_json()["pedido"] == {"id": pedido["id"], "status": "pronto"}
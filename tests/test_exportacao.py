@@ -0,0 +1,85 @@
+import csv
+import io
+import json
+
+import pytest
+
+from exportacao import consulta_exportacao, exportar
+
+
+@pytest.fixture
+def pedidos_novos(cliente, caixa, criar_produto):
+    """Dois pedidos recém-criados (o primeiro com dois itens); devolve (ids, produtos)."""
+    pizza, _ = criar_produto([100.0], [1.0], preco=30.0)
+    suco, _ = criar_produto([100.0], [1.0], preco=8.0)
+    ids = [cliente.post('/pedido', json=corpo, headers=caixa[1]).get_json()["pedido"]["id"] for corpo in (
+        {"itens": [{"produto_id": pizza, "quantidade": 2}, {"produto_id": suco, "quantidade": 1}]},
+        {"produto_id": suco, "quantidade": 3},
+    )]
+    return ids, (pizza, suco)
+
+
+def test_exporta_pedidos_em_ndjson_com_os_itens(cliente, admin, pedidos_novos):
+    (primeiro, segundo), (pizza, suco) = pedidos_novos
+
+    resposta = cliente.get(f'/exportar/pedidos?desde_id={primeiro - 1}', headers=admin[1])
+
+    assert resposta.status_code == 200
+    assert resposta.mimetype == 'application/x-ndjson'
+    assert resposta.headers['Content-Disposition'] == 'attachment; filename="pedidos.ndjson"'
+    registros = [json.loads(linha) for linha in resposta.get_data(as_text=True).splitlines()]
+    assert [registro["id"] for registro in registros] == [primeiro, segundo]
+    assert [(item["produto_id"], item["quantidade"], item["valor_total"]) for item in registros[0]["itens"]] == [
+        (pizza, 2, 60.0), (suco, 1, 8.0)]
+    assert [item["produto_id"] for item in registros[1]["itens"]] == [suco]
+
+
+def test_exporta_pedidos_em_csv_com_uma_linha_por_item(cliente, admin, pedidos_novos):
+    (primeiro, segundo), (pizza, suco) = pedidos_novos
+
+    resposta = cliente.get(f'/exportar/pedidos?formato=csv&desde_id={primeiro - 1}', headers=admin[1])
+
+    linhas = list(csv.DictReader(io.StringIO(resposta.get_data(as_text=True))))
+    assert [(int(linha["id"]), int(linha["item_produto_id"])) for linha in linhas] == [
+        (primeiro, pizza), (primeiro, suco), (segundo, suco)]
+    assert linhas[0]["valor_total"] == "68.0"
+
+
+def test_itens_divididos_entre_lotes_ficam_no_mesmo_registro(pedidos_novos):
+    (primeiro, _), _ = pedidos_novos
+    consulta = consulta_exportacao('pedidos', desde_id=primeiro - 1)
+
+    inteiro = ''.join(exportar('pedidos', 'ndjson', consulta))
+    linha_a_linha = ''.join(exportar('pedidos', 'ndjson', consulta, linhas_por_lote=1))
+
+    assert linha_a_linha == inteiro
+    assert len(json.loads(inteiro.splitlines()[0])["itens"]) == 2
+
+
+def test_exporta_movimentos_desde_uma_data(cliente, admin, caixa, criar_produto):
+    produto_id, _ = criar_produto([100.0], [1.0], preco=4.0)
+    cliente.post('/pedidos/lote', json=[{"produto_id": produto_id, "data": "2019-05-01T10:00:00"}],
+                 headers=caixa[1])
+
+    resposta = cliente.get('/exportar/movimentos?desde=2019-05-01T00:00:00', headers=admin[1])
+
+    datas = [json.loads(linha)["data"] for linha in resposta.get_data(as_text=True).splitlines()]
+    assert "2019-05-01T10:00:00" in datas
+    assert min(datas) >= "2019-05-01"
+
+
+@pytest.mark.parametrize('caminho, mensagem', [
+    ('/exportar/usuarios', "Exportação inválida. Use pedidos, movimentos, ingredientes."),
+    ('/exportar/pedidos?formato=xlsx', "Formato inválido. Use ndjson ou csv."),
+    ('/exportar/pedidos?desde_id=abc', "desde_id deve ser inteiro e desde uma data ISO 8601."),
+    ('/exportar/ingredientes?desde=2025-01-01', "A exportação de ingredientes não tem data; use desde_id."),
+])
+def test_parametros_invalidos(cliente, admin, caminho, mensagem):
+    resposta = cliente.get(caminho, headers=admin[1])
+
+    assert resposta.status_code == 400
+    assert resposta.get_json()["msg"] == mensagem
+
+
+def test_exportacao_exige_administrador(cliente, caixa):
+    assert cliente.get('/exportar/pedidos', headers=caixa[1]).status_code == 403
@@ -0,0 +1,43 @@
+import os
+import runpy
+
+from sqlalchemy import text
+
+import banco
+from conftest import RAIZ
+from main import BLUEPRINTS, criar_app
+
+
+def test_criar_app_registra_os_blueprints_e_libera_a_sessao_de_leitura(app):
+    aplicacao = criar_app({'TESTING': True})
+    durante = {}
+
+    @aplicacao.get('/_teste/leitura')
+    def leitura():
+        banco.sessao_leitura().execute(text("SELECT 1"))
+        durante['registrada'] = banco.sessao_leitura.registry.has()
+        durante['conexoes'] = banco.engine_leitura.pool.checkedout()
+        return {}
+
+    antes = banco.engine_leitura.pool.checkedout()
+    resposta = aplicacao.test_client().get('/_teste/leitura')
+
+    assert resposta.status_code == 200
+    assert {blueprint.name for blueprint in BLUEPRINTS} <= set(aplicacao.blueprints)
+    assert durante == {'registrada': True, 'conexoes': antes + 1}
+    # O teardown devolveu a conexão ao pool e descartou a sessão da thread
+    assert not banco.sessao_leitura.registry.has()
+    assert banco.engine_leitura.pool.checkedout() == antes
+
+
+def test_post_fork_descarta_os_pools_sem_fechar_as_conexoes_do_master(monkeypatch):
+    chamadas = []
+    for nome in ('engine', 'engine_leitura'):
+        monkeypatch.setattr(getattr(banco, nome), 'dispose',
+                            lambda close=True, nome=nome: chamadas.append((nome, close)))
+    configuracao = runpy.run_path(os.path.join(RAIZ, 'gunicorn.conf.py'))
+
+    configuracao['post_fork'](None, None)
+
+    assert configuracao['preload_app'] is True
+    assert chamadas == [('engine', False), ('engine_leitura', False)]
@@ -0,0 +1,84 @@
+import multiprocessing
+
+import pytest
+
+import rotas_relatorios
+from metricas import TabelaCompartilhada, metricas
+
+
+def total_requisicoes(endpoint, status=200):
+    return dict(metricas.requisicoes.itens()).get(f"{endpoint}|GET|{status}", 0)
+
+
+def consultas_registradas(endpoint):
+    return [valores for chave, valores in metricas.consultas._tabela.itens() if chave == endpoint]
+
+
+def _somar_no_filho(tabela):
+    tabela.somar('filho', [(0, 2)])
+    tabela.somar('comum', [(0, 1), (1, 0.5)])
+
+
+def test_tabela_soma_entre_processos():
+    tabela = TabelaCompartilhada(2, capacidade=4)
+    tabela.somar('comum', [(0, 1)])
+
+    processo = multiprocessing.get_context('fork').Process(target=_somar_no_filho, args=(tabela,))
+    processo.start()
+    processo.join()
+    tabela.somar('comum', [(0, 1)])
+
+    assert processo.exitcode == 0
+    assert tabela.itens() == [('comum', [3.0, 0.5]), ('filho', [2.0, 0.0])]
+
+
+def test_tabela_descarta_series_alem_da_capacidade():
+    tabela = TabelaCompartilhada(1, capacidade=2, tamanho_chave=8)
+
+    for chave in ('a', 'b', 'c', 'longa-demais'):
+        tabela.somar(chave, [(0, 1)])
+
+    assert [chave for chave, _ in tabela.itens()] == ['a', 'b']
+
+
+def test_metrics_exige_administrador(cliente, admin, caixa):
+    assert cliente.get('/metrics').status_code == 401
+    assert cliente.get('/metrics', headers=caixa[1]).status_code == 403
+
+    resposta = cliente.get('/metrics', headers=admin[1])
+
+    assert resposta.status_code == 200
+    assert resposta.mimetype == 'text/plain'
+    assert '# TYPE smartsell_http_requisicoes_total counter' in resposta.get_data(as_text=True)
+
+
+def test_metrics_aceita_o_token_do_prometheus(cliente, monkeypatch):
+    monkeypatch.setattr(rotas_relatorios, 'METRICAS_TOKEN', 'segredo-prometheus')
+
+    assert cliente.get('/metrics', headers={"Authorization": "Bearer segredo-prometheus"}).status_code == 200
+    # Outro valor é tratado como JWT, e não é um
+    assert cliente.get('/metrics', headers={"Authorization": "Bearer outro"}).status_code == 422
+
+
+def test_requisicao_entra_nas_metricas(cliente):
+    antes = total_requisicoes('cardapio.listar_cardapio')
+
+    cliente.get('/cardapio')
+
+    assert total_requisicoes('cardapio.listar_cardapio') == antes + 1
+
+
+@pytest.mark.parametrize('formato', ['ndjson', 'csv'])
+def test_exportacao_em_streaming_conta_as_consultas_do_gerador(cliente, admin, formato):
+    endpoint = 'relatorios.exportar_tabela'
+    antes = total_requisicoes(endpoint)
+    (consultas_antes,) = consultas_registradas(endpoint) or [[0] * 10]
+
+    resposta = cliente.get(f'/exportar/pedidos?formato={formato}', headers=admin[1])
+    resposta.get_data()
+    resposta.close()
+
+    assert total_requisicoes(endpoint) == antes + 1
+    (consultas_depois,) = consultas_registradas(endpoint)
+    # A soma de consultas da requisição inclui as do gerador (após o teardown)
+    assert consultas_depois[-2] > consultas_antes[-2]
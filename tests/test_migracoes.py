@@ -0,0 +1,102 @@
+import os
+import runpy
+import shutil
+
+import pytest
+from sqlalchemy import text
+
+from banco import criar_engine
+from conftest import RAIZ
+from migracoes import MIGRACOES, migrar, verificar_planos, versao_atual
+from models import Base
+
+# Cópia do SmartSell.sqlite3 de antes das migrações (schema da versão 0)
+BANCO_ANTIGO = os.path.join(RAIZ, 'tests', 'dados', 'smartsell_antigo.sqlite3')
+
+
+@pytest.fixture
+def engine_temporario(tmp_path):
+    engines = []
+
+    def criar(origem=None):
+        caminho = tmp_path / f"migracao{len(engines)}.sqlite3"
+        if origem:
+            shutil.copyfile(origem, caminho)
+        engine = criar_engine(f"sqlite:///{caminho}")
+        engines.append(engine)
+        return engine
+
+    yield criar
+    for engine in engines:
+        engine.dispose()
+
+
+def versao(engine):
+    with engine.connect() as conexao:
+        return versao_atual(conexao)
+
+
+def test_migra_o_banco_antigo(engine_temporario):
+    engine = engine_temporario(BANCO_ANTIGO)
+    assert versao(engine) == 0
+
+    Base.metadata.create_all(engine)
+    aplicadas = migrar(engine)
+
+    assert [numero for numero, _ in aplicadas] == [numero for numero, _, _ in MIGRACOES]
+    assert versao(engine) == MIGRACOES[-1][0]
+    with engine.connect() as conexao:
+        colunas = {linha[1]: linha for linha in conexao.execute(text("PRAGMA table_info(pedido)"))}
+        assert colunas['produto_id'][3] == 0
+        assert conexao.execute(text("SELECT count(*) FROM produto_busca")).scalar() == \
+            conexao.execute(text("SELECT count(*) FROM produto")).scalar()
+    assert verificar_planos(engine) == {}
+
+
+def test_migrar_de_novo_nao_aplica_nada(engine_temporario):
+    engine = engine_temporario(BANCO_ANTIGO)
+    Base.metadata.create_all(engine)
+    migrar(engine)
+
+    assert migrar(engine) == []
+    assert versao(engine) == MIGRACOES[-1][0]
+
+
+def test_migracoes_sao_idempotentes_num_banco_novo(engine_temporario):
+    # Num banco novo o create_all já criou tudo o que as migrações fariam
+    engine = engine_temporario()
+    Base.metadata.create_all(engine)
+
+    assert len(migrar(engine)) == len(MIGRACOES)
+    assert verificar_planos(engine) == {}
+
+
+def test_varredura_pelo_indice_tambem_e_apontada(engine_temporario):
+    from sqlalchemy import select
+    from models import Pedido
+
+    engine = engine_temporario()
+    Base.metadata.create_all(engine)
+    migrar(engine)
+    # Sem filtro, o SQLite lê o índice inteiro: "SCAN pedido USING COVERING INDEX ..."
+    consultas = {"usuarios_com_pedido": select(Pedido.usuario_id).distinct()}
+
+    falhas = verificar_planos(engine, consultas)
+
+    assert list(falhas) == ["usuarios_com_pedido"]
+    assert all(passo.startswith("SCAN pedido") for passo in falhas["usuarios_com_pedido"])
+    assert verificar_planos(engine, consultas, permitidas={"usuarios_com_pedido": {"pedido"}}) == {}
+
+
+def test_gunicorn_migra_o_banco_ao_iniciar(monkeypatch):
+    import banco
+    import models
+
+    chamadas = []
+    monkeypatch.setattr(models, 'init_db', lambda: chamadas.append('init_db'))
+    monkeypatch.setattr(banco.engine, 'dispose', lambda close=True: chamadas.append(('dispose', close)))
+    configuracao = runpy.run_path(os.path.join(RAIZ, 'gunicorn.conf.py'))
+
+    configuracao['on_starting'](None)
+
+    assert chamadas == ['init_db', ('dispose', True)]
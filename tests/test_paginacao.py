@@ -0,0 +1,74 @@
+import base64
+
+import pytest
+
+from paginacao import codificar_cursor
+
+
+def cursor_bruto(texto):
+    return base64.urlsafe_b64encode(texto.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def test_itens_seguem_o_cursor(cliente, admin, criar_produto):
+    criar_produto([1.0, 2.0, 3.0], [1.0, 1.0, 1.0])
+    _, cabecalhos = admin
+
+    primeira = cliente.get('/itens?limit=2&fields=id', headers=cabecalhos).get_json()
+    segunda = cliente.get(f"/itens?limit=2&fields=id&after={primeira['proximo']}", headers=cabecalhos).get_json()
+
+    assert len(primeira["produtos"]) == 2
+    assert primeira["produtos"][-1]["id"] < segunda["produtos"][0]["id"]
+
+
+@pytest.mark.parametrize('consulta, mensagem', [
+    ('after=lixo!!', "Cursor 'after' inválido."),
+    (f"after={cursor_bruto('nao e json')}", "Cursor 'after' inválido."),
+    ('after=' + cursor_bruto('{"id": 1}'), "Cursor 'after' inválido."),
+    (f"after={codificar_cursor([1, 2])}", "Cursor 'after' inválido."),
+    (f"after={codificar_cursor(['um'])}", "Cursor 'after' inválido."),
+    (f"after={codificar_cursor([None])}", "Cursor 'after' inválido."),
+    ('limit=0', "limit deve estar entre 1 e 500."),
+    ('limit=501', "limit deve estar entre 1 e 500."),
+    ('limit=abc', "limit deve ser um número inteiro."),
+    ('fields=id,senha', "Campos inválidos: senha. Use: id, nome, unidade, quantidade_estoque, status."),
+    ('fields=,', "Campos inválidos: -. Use: id, nome, unidade, quantidade_estoque, status."),
+    ('status=talvez', "status deve ser true ou false."),
+])
+def test_itens_parametros_invalidos(cliente, admin, consulta, mensagem):
+    _, cabecalhos = admin
+
+    resposta = cliente.get(f'/itens?{consulta}', headers=cabecalhos)
+
+    assert resposta.status_code == 400
+    assert resposta.get_json() == {"msg": mensagem}
+
+
+@pytest.mark.parametrize('caminho', ['/cardapio', '/pedidos/historico', '/auditoria'])
+@pytest.mark.parametrize('consulta', ['after=lixo!!', f"after={codificar_cursor(['x', 'y', 'z'])}", 'limit=0'])
+def test_listagens_recusam_cursor_e_limite_invalidos(cliente, admin, caminho, consulta):
+    _, cabecalhos = admin
+
+    resposta = cliente.get(f'{caminho}?{consulta}', headers=cabecalhos)
+
+    assert resposta.status_code == 400
+
+
+def test_historico_recusa_data_invalida_no_cursor(cliente, caixa):
+    _, cabecalhos = caixa
+
+    resposta = cliente.get(f"/pedidos/historico?after={codificar_cursor(['ontem', 1])}", headers=cabecalhos)
+
+    assert resposta.status_code == 400
+    assert resposta.get_json() == {"msg": "Cursor 'after' inválido."}
+
+
+def test_itens_dispensam_token(cliente, criar_produto):
+    criar_produto([1.0], [1.0])
+
+    completa = cliente.get('/itens')
+    pagina = cliente.get('/itens?limit=1&fields=id')
+
+    assert completa.status_code == 200
+    assert completa.get_json()["produtos"]
+    assert pagina.status_code == 200
+    assert len(pagina.get_json()["produtos"]) == 1
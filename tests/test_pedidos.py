@@ -0,0 +1,149 @@
+import json
+
+import pytest
+from sqlalchemy import func, select
+
+from models import Ingrediente, Pedido, PedidoItem
+
+
+def estoque(db_session, ingrediente_id):
+    db_session.expire_all()
+    return db_session.get(Ingrediente, ingrediente_id).quantidade_estoque
+
+
+def total_pedidos(db_session):
+    return db_session.execute(select(func.count(Pedido.id))).scalar()
+
+
+def test_pedido_baixa_o_estoque(cliente, db_session, caixa, criar_produto):
+    produto_id, (ingrediente_id,) = criar_produto([1.0], [0.4])
+    usuario_id, cabecalhos = caixa
+
+    resposta = cliente.post('/pedido', json={"itens": [{"produto_id": produto_id, "quantidade": 2}]},
+                            headers=cabecalhos)
+
+    assert resposta.status_code == 201
+    assert estoque(db_session, ingrediente_id) == pytest.approx(0.2)
+
+
+def test_registrar_pedido_sem_estoque_desfaz_tudo(app, db_session, caixa, criar_produto):
+    from pedidos import EstoqueInsuficiente, registrar_pedido
+
+    produto_id, (ingrediente_id,) = criar_produto([1.0], [0.4])
+    usuario_id, _ = caixa
+    antes = total_pedidos(db_session)
+
+    with pytest.raises(EstoqueInsuficiente):
+        registrar_pedido(db_session, usuario_id, [(produto_id, 3)])
+
+    assert estoque(db_session, ingrediente_id) == 1.0
+    assert total_pedidos(db_session) == antes
+
+
+def test_pedido_com_um_ingrediente_em_falta_nao_baixa_os_outros(cliente, db_session, caixa, criar_produto):
+    com_estoque, (ingrediente_com_estoque,) = criar_produto([10.0], [1.0])
+    sem_estoque, (ingrediente_sem_estoque, ingrediente_de_sobra) = criar_produto([0.5, 10.0], [1.0, 1.0])
+    _, cabecalhos = caixa
+    antes = total_pedidos(db_session)
+
+    resposta = cliente.post('/pedido', json={"itens": [{"produto_id": com_estoque, "quantidade": 1},
+                                                       {"produto_id": sem_estoque, "quantidade": 1}]},
+                            headers=cabecalhos)
+
+    assert resposta.status_code == 409
+    assert resposta.get_json() == {"msg": "Estoque insuficiente para atender o pedido."}
+    assert estoque(db_session, ingrediente_com_estoque) == 10.0
+    assert estoque(db_session, ingrediente_sem_estoque) == 0.5
+    assert estoque(db_session, ingrediente_de_sobra) == 10.0
+    assert total_pedidos(db_session) == antes
+
+
+def test_lote_devolve_um_resultado_por_pedido(cliente, db_session, admin, caixa, criar_produto):
+    produto_id, (ingrediente_id,) = criar_produto([10.0], [1.0], preco=5.0)
+    admin_id, cabecalhos = admin
+    caixa_id, _ = caixa
+    pedidos = [
+        {"itens": [{"produto_id": produto_id, "quantidade": 2}], "data": "2025-06-01T12:30:00"},
+        {"produto_id": 999999, "quantidade": 1},
+        "não é um pedido",
+        {"usuario_id": caixa_id, "produto_id": produto_id, "quantidade": 1, "metodo_pagamento": "dinheiro"},
+        {"itens": [{"produto_id": produto_id, "quantidade": 0}]},
+    ]
+
+    resposta = cliente.post('/pedidos/lote', json=pedidos, headers=cabecalhos)
+
+    assert resposta.status_code == 200
+    corpo = resposta.get_json()
+    assert (corpo["total"], corpo["gravados"], corpo["erros"]) == (5, 2, 3)
+    assert [resultado["indice"] for resultado in corpo["resultados"]] == [0, 1, 2, 3, 4]
+    assert [resultado["status"] for resultado in corpo["resultados"]] == ["ok", "erro", "erro", "ok", "erro"]
+    assert corpo["resultados"][1]["msg"] == "Produto com id 999999 não encontrado."
+    assert corpo["resultados"][2]["msg"] == "Cada pedido deve ser um objeto JSON."
+
+    primeiro = db_session.get(Pedido, corpo["resultados"][0]["pedido_id"])
+    quarto = db_session.get(Pedido, corpo["resultados"][3]["pedido_id"])
+    assert (primeiro.usuario_id, primeiro.valor_total) == (admin_id, 10.0)
+    assert primeiro.data.isoformat() == "2025-06-01T12:30:00"
+    assert (quarto.usuario_id, quarto.metodo_pagamento) == (caixa_id, "dinheiro")
+    assert db_session.execute(
+        select(func.count(PedidoItem.id)).where(PedidoItem.pedido_id.in_([primeiro.id, quarto.id]))
+    ).scalar() == 2
+    assert estoque(db_session, ingrediente_id) == 7.0
+
+
+def test_lote_de_usuario_comum_grava_no_proprio_nome(cliente, db_session, admin, caixa, criar_produto):
+    produto_id, _ = criar_produto([10.0], [1.0])
+    admin_id, _ = admin
+    caixa_id, cabecalhos = caixa
+
+    resposta = cliente.post('/pedidos/lote', data="\n".join([
+        json.dumps({"usuario_id": admin_id, "produto_id": produto_id, "quantidade": 1}),
+        json.dumps({"produto_id": produto_id, "quantidade": 1}),
+    ]), headers=cabecalhos, content_type='application/x-ndjson')
+
+    assert resposta.status_code == 200
+    ids = [resultado["pedido_id"] for resultado in resposta.get_json()["resultados"]]
+    assert [db_session.get(Pedido, pedido_id).usuario_id for pedido_id in ids] == [caixa_id, caixa_id]
+
+
+def test_lote_corpo_invalido(cliente, admin):
+    _, cabecalhos = admin
+
+    resposta = cliente.post('/pedidos/lote', data="{não é json", headers=cabecalhos,
+                            content_type='application/json')
+
+    assert resposta.status_code == 400
+    assert resposta.get_json() == {"msg": "Corpo inválido: envie um array JSON ou NDJSON."}
+
+
+@pytest.mark.parametrize('corpo', ['[1]', '"x"', '{não é json'])
+def test_pedido_recusa_corpo_que_nao_e_objeto(cliente, caixa, corpo):
+    _, cabecalhos = caixa
+
+    resposta = cliente.post('/pedido', data=corpo, headers=cabecalhos, content_type='application/json')
+
+    assert resposta.status_code == 400
+    assert resposta.get_json() == {"msg": "Cada pedido deve ser um objeto JSON."}
+
+
+@pytest.mark.parametrize('usuario_id', ['abc', [1], {"id": 1}])
+def test_pedido_recusa_usuario_id_invalido(cliente, admin, criar_produto, usuario_id):
+    produto_id, _ = criar_produto([10.0], [1.0])
+    _, cabecalhos = admin
+
+    resposta = cliente.post('/pedido', json={"usuario_id": usuario_id, "produto_id": produto_id},
+                            headers=cabecalhos)
+
+    assert resposta.status_code == 400
+    assert resposta.get_json() == {"msg": "usuario_id inválido."}
+
+
+def test_administrador_registra_pedido_em_nome_de_outro_usuario(cliente, db_session, admin, caixa, criar_produto):
+    produto_id, _ = criar_produto([10.0], [1.0])
+    caixa_id, _ = caixa
+
+    resposta = cliente.post('/pedido', json={"usuario_id": str(caixa_id), "produto_id": produto_id},
+                            headers=admin[1])
+
+    assert resposta.status_code == 201
+    assert db_session.get(Pedido, resposta.get_json()["pedido"]["id"]).usuario_id == caixa_id
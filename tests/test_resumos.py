@@ -0,0 +1,82 @@
+import itertools
+from datetime import date, timedelta
+
+import pytest
+
+# Um dia por teste: os resumos do banco compartilhado não se misturam
+_dias = (date(2023, 3, 1) + timedelta(days=numero) for numero in itertools.count())
+
+
+def relatorio(cliente, cabecalhos, agrupamento, dia):
+    resposta = cliente.get(f'/relatorios/vendas/{agrupamento}?inicio={dia}&fim={dia}', headers=cabecalhos)
+    assert resposta.status_code == 200
+    return resposta.get_json()["vendas"]
+
+
+@pytest.fixture
+def vendas_do_dia(cliente, caixa, criar_produto):
+    """Três pedidos sincronizados num dia de 2023 (dois às 12h, um às 13h); devolve (dia, pizza, suco)."""
+    dia = next(_dias).isoformat()
+    pizza, _ = criar_produto([100.0], [1.0], preco=30.0)
+    suco, _ = criar_produto([100.0], [1.0], preco=8.0)
+    resposta = cliente.post('/pedidos/lote', json=[
+        {"produto_id": pizza, "quantidade": 2, "data": f"{dia}T12:05:00"},
+        {"itens": [{"produto_id": pizza, "quantidade": 1}, {"produto_id": suco, "quantidade": 3}],
+         "data": f"{dia}T12:40:00"},
+        {"produto_id": suco, "quantidade": 1, "data": f"{dia}T13:15:00"},
+    ], headers=caixa[1])
+    assert [resultado["status"] for resultado in resposta.get_json()["resultados"]] == ["ok"] * 3
+    return dia, pizza, suco
+
+
+def test_resumo_diario_soma_os_pedidos_do_dia(cliente, admin, vendas_do_dia):
+    dia, _, _ = vendas_do_dia
+
+    resumo, = relatorio(cliente, admin[1], 'diario', dia)
+
+    assert resumo == {"dia": dia, "pedidos": 3, "unidades": 7, "receita": 122.0,
+                   "entradas": 122.0, "saidas": 0.0}
+
+
+def test_resumo_horario_separa_as_horas(cliente, admin, vendas_do_dia):
+    dia, _, _ = vendas_do_dia
+
+    horas = relatorio(cliente, admin[1], 'horario', dia)
+
+    assert [(hora["hora"], hora["pedidos"], hora["unidades"], hora["receita"]) for hora in horas] == [
+        (f"{dia}T12:00:00", 2, 6, 114.0),
+        (f"{dia}T13:00:00", 1, 1, 8.0),
+    ]
+
+
+def test_resumo_por_produto_ordena_pela_receita(cliente, admin, vendas_do_dia):
+    dia, pizza, suco = vendas_do_dia
+
+    produtos = relatorio(cliente, admin[1], 'produtos', dia)
+
+    assert [(produto["produto_id"], produto["unidades"], produto["receita"]) for produto in produtos] == [
+        (pizza, 3, 90.0), (suco, 4, 32.0)]
+
+
+def test_reconstruir_chega_aos_mesmos_resumos(app, cliente, admin, vendas_do_dia):
+    dia, _, _ = vendas_do_dia
+    antes = {agrupamento: relatorio(cliente, admin[1], agrupamento, dia)
+             for agrupamento in ('diario', 'horario', 'produtos')}
+
+    resultado = app.test_cli_runner().invoke(args=['reconstruir-resumos'])
+
+    assert resultado.exit_code == 0, resultado.output
+    assert {agrupamento: relatorio(cliente, admin[1], agrupamento, dia)
+            for agrupamento in antes} == antes
+
+
+@pytest.mark.parametrize('caminho, mensagem', [
+    ('/relatorios/vendas/semanal', "Relatório inválido. Use diario, horario ou produtos."),
+    ('/relatorios/vendas/diario?inicio=10/03/2023', "Datas inválidas. Use o formato AAAA-MM-DD."),
+    ('/relatorios/vendas/diario?inicio=2023-03-11&fim=2023-03-10', "A data inicial deve ser anterior à final."),
+])
+def test_parametros_invalidos(cliente, admin, caminho, mensagem):
+    resposta = cliente.get(caminho, headers=admin[1])
+
+    assert resposta.status_code == 400
+    assert resposta.get_json()["msg"] == mensagem
@@ -0,0 +1,71 @@
+import pytest
+from werkzeug.security import generate_password_hash
+
+import senhas
+from models import Usuario
+
+
+@pytest.fixture
+def usuario_com_hash(db_session):
+    def criar(numero, senha_hash):
+        usuario = Usuario(nome=f"Senha Teste {numero}", telefone=f"11960000{numero:03d}",
+                          email=f"senha{numero}@testes.local", senha_hash=senha_hash, papel="usuario")
+        db_session.add(usuario)
+        db_session.commit()
+        return usuario.id
+    return criar
+
+
+def test_normalizar_metodo_completa_os_padroes():
+    assert senhas.normalizar_metodo('scrypt') == 'scrypt:32768:8:1'
+    assert senhas.normalizar_metodo('pbkdf2') == f'pbkdf2:sha256:{senhas.DEFAULT_PBKDF2_ITERATIONS}'
+    assert senhas.normalizar_metodo('pbkdf2:sha256:1000') == 'pbkdf2:sha256:1000'
+
+
+def test_precisa_rehash_so_com_outros_parametros():
+    assert not senhas.precisa_rehash(f"{senhas.METODO_HASH}$salt$0")
+    assert senhas.precisa_rehash("pbkdf2:sha256:1000$salt$0")
+
+
+def test_login_refaz_hash_antigo(cliente, db_session, usuario_com_hash):
+    usuario_id = usuario_com_hash(1, generate_password_hash("senha123", "pbkdf2:sha256:1000"))
+
+    resposta = cliente.post('/login', json={"email": "senha1@testes.local", "senha": "senha123"})
+
+    assert resposta.status_code == 200
+    db_session.expire_all()
+    usuario = db_session.get(Usuario, usuario_id)
+    assert not usuario.precisa_rehash()
+    assert usuario.check_senha("senha123")
+
+
+def test_login_com_senha_errada_nao_refaz_o_hash(cliente, db_session, usuario_com_hash):
+    antigo = generate_password_hash("senha123", "pbkdf2:sha256:1000")
+    usuario_id = usuario_com_hash(2, antigo)
+
+    resposta = cliente.post('/login', json={"email": "senha2@testes.local", "senha": "outra"})
+
+    assert resposta.status_code == 401
+    db_session.expire_all()
+    assert db_session.get(Usuario, usuario_id).senha_hash == antigo
+
+
+def test_pool_recusa_acima_da_fila_maxima():
+    pool = senhas.PoolSenhas(processos=1, fila_maxima=1)
+    pool._vagas.acquire()
+
+    with pytest.raises(senhas.FilaSenhasCheia):
+        pool.executar(generate_password_hash, "senha123")
+
+
+def test_login_com_fila_cheia_responde_503(cliente, usuario_com_hash, monkeypatch):
+    usuario_com_hash(3, generate_password_hash("senha123"))
+    pool = senhas.PoolSenhas(processos=1, fila_maxima=1)
+    pool._vagas.acquire()
+    monkeypatch.setattr(senhas, 'pool_senhas', pool)
+
+    resposta = cliente.post('/login', json={"email": "senha3@testes.local", "senha": "senha123"})
+
+    assert resposta.status_code == 503
+    assert resposta.headers['Retry-After'] == "1"
+    assert resposta.get_json()["msg"] == "Muitas requisições de login no momento. Tente novamente em instantes."
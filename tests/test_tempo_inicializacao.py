@@ -0,0 +1,18 @@
+from tempo_inicializacao import MAXIMO_MODULOS, MODULOS_PROIBIDOS, medir, verificar
+
+
+def test_importar_main_fica_no_orcamento_de_modulos():
+    # O tempo depende da máquina (python tempo_inicializacao.py mede); aqui só
+    # a contagem de módulos e a lista de proibidos, que não dependem
+    _, total, problemas = verificar(rodadas=1, orcamento_ms=float('inf'))
+
+    assert total <= MAXIMO_MODULOS
+    assert problemas == []
+
+
+def test_modulos_proibidos_ficam_fora_da_inicializacao():
+    _, modulos = medir()
+
+    assert 'main' in modulos
+    assert [nome for nome in modulos
+            if any(nome == proibido or nome.startswith(proibido + '.') for proibido in MODULOS_PROIBIDOS)] == []
@@ -0,0 +1,90 @@
+import json
+
+from models import Usuario
+
+
+def test_lote_csv_devolve_um_resultado_por_linha(cliente, db_session, admin):
+    _, cabecalhos = admin
+    existente = db_session.get(Usuario, admin[0]).email
+    arquivo = "\n".join([
+        "nome,telefone,email,senha,papel",
+        "Lote Ana,11988880001,lote.ana@testes.local,senha123,usuario",
+        "Lote Bia,11988880002,lote.bia@testes.local,senha123,",
+        "Lote Repetida,11988880003,lote.ana@testes.local,senha123,usuario",
+        f"Lote Existente,11988880004,{existente},senha123,usuario",
+        "Lote Sem Senha,11988880005,lote.sem@testes.local,,usuario",
+    ])
+
+    resposta = cliente.post('/cadastro/usuarios/lote', data=arquivo, headers=cabecalhos, content_type='text/csv')
+
+    assert resposta.status_code == 200
+    corpo = resposta.get_json()
+    assert (corpo["total"], corpo["criados"], corpo["erros"]) == (5, 2, 3)
+    assert [resultado["linha"] for resultado in corpo["resultados"]] == [2, 3, 4, 5, 6]
+    assert [resultado.get("msg") for resultado in corpo["resultados"][2:]] == [
+        "Campo email repetido no arquivo.",
+        "Já existe usuário com esse email.",
+        "Nome, telefone, email e senha são obrigatórios.",
+    ]
+
+    # Cada id devolvido é o do usuário daquela linha
+    ana = db_session.get(Usuario, corpo["resultados"][0]["user_id"])
+    bia = db_session.get(Usuario, corpo["resultados"][1]["user_id"])
+    assert (ana.email, ana.papel) == ("lote.ana@testes.local", "usuario")
+    assert (bia.email, bia.papel) == ("lote.bia@testes.local", "usuario")
+    assert bia.check_senha("senha123")
+
+
+def test_lote_ndjson_marca_linhas_invalidas(cliente, admin):
+    _, cabecalhos = admin
+    arquivo = "\n".join([
+        json.dumps({"nome": "Lote Caio", "telefone": "11988880011", "email": "lote.caio@testes.local",
+                    "senha": "senha123"}),
+        "{não é json",
+        "[1, 2]",
+    ])
+
+    resposta = cliente.post('/cadastro/usuarios/lote', data=arquivo, headers=cabecalhos,
+                            content_type='application/x-ndjson')
+
+    resultados = resposta.get_json()["resultados"]
+    assert [resultado["status"] for resultado in resultados] == ["ok", "erro", "erro"]
+    assert resultados[1]["msg"] == "Linha não é um JSON válido."
+    assert resultados[2]["msg"] == "Cada linha deve ser um objeto JSON."
+
+
+def test_lote_exige_administrador(cliente, caixa):
+    _, cabecalhos = caixa
+
+    resposta = cliente.post('/cadastro/usuarios/lote', data="nome,telefone,email,senha\n", headers=cabecalhos,
+                            content_type='text/csv')
+
+    assert resposta.status_code == 403
+
+
+def test_criar_admin_pela_linha_de_comando(app, cliente, db_session):
+    resultado = app.test_cli_runner().invoke(args=[
+        'criar-admin', '--nome', 'Primeiro Admin', '--telefone', '11977770001',
+        '--email', 'primeiro.admin@testes.local', '--senha', 'senha123',
+    ])
+
+    assert resultado.exit_code == 0, resultado.output
+    admin = db_session.query(Usuario).filter_by(email='primeiro.admin@testes.local').one()
+    assert admin.papel == 'admin'
+    login = cliente.post('/login', json={"email": "primeiro.admin@testes.local", "senha": "senha123"})
+    assert login.get_json()["papel"] == 'admin'
+    cadastro = cliente.post('/cadastro/usuario', json={
+        "nome": "Cadastrado Pelo Admin", "telefone": "11977770002", "email": "cadastrado@testes.local",
+        "senha": "senha123"}, headers={"Authorization": f"Bearer {login.get_json()['access_token']}"})
+    assert cadastro.status_code == 201
+
+
+def test_criar_admin_recusa_email_existente(app, db_session, admin):
+    email = db_session.get(Usuario, admin[0]).email
+
+    resultado = app.test_cli_runner().invoke(args=[
+        'criar-admin', '--nome', 'Outro Admin', '--telefone', '11977770003', '--email', email, '--senha', 'x',
+    ])
+
+    assert resultado.exit_code != 0
+    assert "Usuário já existente!" in resultado.output
@@ -0,0 +1,113 @@
+import csv
+import io
+import json
+
+from sqlalchemy import select, insert, or_
+
+from models import Usuario
+import senhas
+
+CAMPOS_USUARIO = ('nome', 'telefone', 'email', 'senha', 'papel')
+
+
+def ler_usuarios(texto, formato='csv'):
+    """Converte o arquivo enviado em [(linha, dict ou ValueError)].
+
+    CSV com cabeçalho nome,telefone,email,senha[,papel] ou JSON por linha.
+    """
+    registros = []
+    if formato == 'csv':
+        leitor = csv.DictReader(io.StringIO(texto))
+        for registro in leitor:
+            registros.append((leitor.line_num, registro))
+        return registros
+
+    for numero, linha in enumerate(texto.splitlines(), start=1):
+        if not linha.strip():
+            continue
+        try:
+            registro = json.loads(linha)
+        except ValueError:
+            registro = ValueError("Linha não é um JSON válido.")
+        if not isinstance(registro, (dict, ValueError)):
+            registro = ValueError("Cada linha deve ser um objeto JSON.")
+        registros.append((numero, registro))
+    return registros
+
+
+def _normalizar(registro):
+    if isinstance(registro, Exception):
+        raise registro
+    usuario = {campo: str(registro.get(campo) or '').strip() for campo in CAMPOS_USUARIO}
+    usuario['papel'] = usuario['papel'] or 'usuario'
+    if not usuario['nome'] or not usuario['telefone'] or not usuario['email'] or not usuario['senha']:
+        raise ValueError("Nome, telefone, email e senha são obrigatórios.")
+    return usuario
+
+
+def importar_usuarios(db_session, registros):
+    """Cria vários usuários de uma vez e devolve um resultado por linha.
+
+    A unicidade de email, telefone e nome é verificada para o arquivo
+    inteiro numa única consulta; os hashes são calculados em paralelo no
+    pool de senhas e os válidos entram com um único INSERT em lote.
+    """
+    resultados, validos = [], []
+    vistos = {'nome': set(), 'telefone': set(), 'email': set()}
+    for numero, registro in registros:
+        try:
+            usuario = _normalizar(registro)
+            for campo, valores in vistos.items():
+                if usuario[campo] in valores:
+                    raise ValueError(f"Campo {campo} repetido no arquivo.")
+            for campo, valores in vistos.items():
+                valores.add(usuario[campo])
+            validos.append((numero, usuario))
+        except ValueError as e:
+            resultados.append({"linha": numero, "status": "erro", "msg": str(e)})
+
+    existentes = {'nome': set(), 'telefone': set(), 'email': set()}
+    if validos:
+        for nome, telefone, email in db_session.execute(
+                select(Usuario.nome, Usuario.telefone, Usuario.email).where(or_(
+                    Usuario.email.in_(vistos['email']),
+                    Usuario.telefone.in_(vistos['telefone']),
+                    Usuario.nome.in_(vistos['nome'])))):
+            existentes['nome'].add(nome)
+            existentes['telefone'].add(telefone)
+            existentes['email'].add(email)
+
+    novos = []
+    for numero, usuario in validos:
+        repetido = next((campo for campo in ('email', 'telefone', 'nome')
+                         if usuario[campo] in existentes[campo]), None)
+        if repetido:
+            resultados.append({"linha": numero, "status": "erro", "msg": f"Já existe usuário com esse {repetido}."})
+        else:
+            novos.append((numero, usuario))
+
+    if novos:
+        hashes = senhas.gerar_hashes([usuario['senha'] for _, usuario in novos])
+        linhas = [{
+            "nome": usuario['nome'],
+            "telefone": usuario['telefone'],
+            "email": usuario['email'],
+            "papel": usuario['papel'],
+            "senha_hash": senha_hash,
+            "status": True
+        } for (_, usuario), senha_hash in zip(novos, hashes)]
+        try:
+            # Um único INSERT multi-linha; o RETURNING não garante a ordem das
+            # linhas, então os ids voltam para cada usuário pelo email
+            ids = dict(db_session.execute(
+                insert(Usuario).returning(Usuario.email, Usuario.id), linhas
+            ).all())
+            db_session.commit()
+        except Exception:
+            db_session.rollback()
+            raise
+        for numero, usuario in novos:
+            resultados.append({"linha": numero, "status": "ok", "user_id": ids[usuario['email']]})
+
+    resultados.sort(key=lambda resultado: resultado["linha"])
+    return resultados